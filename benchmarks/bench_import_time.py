@@ -0,0 +1,98 @@
+#!/usr/bin/env python
+"""Measures the import time of the gear modules with `python -X importtime`.
+
+Usage:
+    python benchmarks/bench_import_time.py [--repeat N] [--top N] [--max-ms MS]
+        [modules ...]
+
+Each module is imported in a fresh interpreter, several times, and the best
+cumulative import time is reported along with the slowest modules it
+imported and whether it loaded the Flywheel stack.  With `--max-ms`, the exit
+status is 1 if any module takes longer, so the benchmark can guard the
+startup time in CI.
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+DEFAULT_MODULES = [
+    "fw_gear_file_validator.validator",
+    "fw_gear_file_validator.loader",
+    "fw_gear_file_validator.errors",
+    "fw_gear_file_validator.utils",
+    "fw_gear_file_validator.batch",
+]
+FLYWHEEL_STACK = ("flywheel", "flywheel_gear_toolkit", "pydantic")
+
+
+def import_times(module: str) -> dict:
+    """Imports a module in a fresh interpreter, returns the cumulative time of every import.
+
+    Args:
+        module: the module to import
+
+    Returns:
+        the cumulative import time of each module imported, in microseconds
+
+    """
+    env = {**os.environ, "PYTHONPATH": str(BASE_DIR)}
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        check=True,
+        env=env,
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line.split("|")
+        times[name.strip()] = int(cumulative)
+    return times
+
+
+def main() -> int:
+    """Runs the benchmark, prints the results and returns the exit status."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("modules", nargs="*", default=DEFAULT_MODULES)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--top", type=int, default=5)
+    parser.add_argument("--max-ms", type=float, default=None)
+    args = parser.parse_args()
+
+    # Imported by the interpreter itself (site, .pth files), whatever the module.
+    startup = set(import_times("sys"))
+    status = 0
+    for module in args.modules:
+        runs = [import_times(module) for _ in range(args.repeat)]
+        best = min(runs, key=lambda times: times[module])
+        total_ms = best[module] / 1000
+        flywheel = sorted({name.split(".")[0] for name in best} & set(FLYWHEEL_STACK))
+        print(
+            f"{module}: {total_ms:.1f} ms, "
+            f"flywheel stack: {', '.join(flywheel) or 'not loaded'}"
+        )
+        slowest = sorted(
+            (
+                name
+                for name in best
+                if name != module and "." not in name and name not in startup
+            ),
+            key=best.get,
+            reverse=True,
+        )
+        for name in slowest[: args.top]:
+            print(f"    {name:<32} {best[name] / 1000:7.1f} ms")
+        if args.max_ms is not None and total_ms > args.max_ms:
+            print(f"    over the {args.max_ms} ms budget")
+            status = 1
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,91 @@
+#!/usr/bin/env python
+"""Compares the JSON parser backends on a synthetic JSON file.
+
+Usage:
+    python benchmarks/bench_json_backends.py [--records N] [--repeat N]
+
+The file holds a list of records shaped like extracted file metadata.  Each
+backend available parses it through `JsonLoader.load_object`, the way input
+files are loaded, and the best time of the repetitions is reported along with
+the throughput.  `json.load` with the garbage collector left running, which is
+how files were loaded before the backends were added, is the baseline.
+"""
+
+import argparse
+import json
+import random
+import tempfile
+import time
+from pathlib import Path
+
+from fw_gear_file_validator import jsonio
+from fw_gear_file_validator.loader import JsonLoader
+
+
+def make_document(records: int, seed: int = 0) -> dict:
+    """Returns a deterministic document with the given number of records."""
+    rng = random.Random(seed)
+    return {
+        "records": [
+            {
+                "id": i,
+                "label": f"subject-{i:06d}",
+                "age": rng.randint(18, 90),
+                "weight": round(rng.uniform(40, 120), 2),
+                "tags": rng.sample(["t1", "t2", "dwi", "bold", "qa"], 2),
+                "info": {"site": rng.choice("ABCD"), "score": rng.random()},
+            }
+            for i in range(records)
+        ]
+    }
+
+
+def best_time(function, repeat: int) -> float:
+    """Returns the fastest of several runs of a function, in seconds.
+
+    The result of the function is freed after the clock stops, so freeing
+    the parsed content is not counted.
+    """
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        times.append(time.perf_counter() - start)
+        del result
+    return min(times)
+
+
+def main() -> None:
+    """Runs the benchmark and prints the results."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--records", type=int, default=200_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        file_path = Path(tmp_dir) / "bench.json"
+        file_path.write_text(json.dumps(make_document(args.records)))
+        size_mb = file_path.stat().st_size / 1e6
+
+        def load_stdlib():
+            with open(file_path, "rb") as fp:
+                return json.load(fp)
+
+        results = {"json.load": best_time(load_stdlib, args.repeat)}
+        for backend in jsonio.available_backends():
+            jsonio.set_json_backend(backend)
+            results[f"jsonio ({backend})"] = best_time(
+                lambda: JsonLoader().load_object(file_path), args.repeat
+            )
+
+    print(f"{args.records} records, {size_mb:.1f} MB")
+    baseline = results["json.load"]
+    for name, seconds in results.items():
+        print(
+            f"{name:>16}: {seconds:7.3f} s  {size_mb / seconds:7.1f} MB/s  "
+            f"x{baseline / seconds:.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
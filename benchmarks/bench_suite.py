@@ -0,0 +1,319 @@
+#!/usr/bin/env python
+"""Measures the throughput of loading and validation on synthetic files.
+
+Usage:
+    python benchmarks/bench_suite.py [--scale X] [--repeat N] [--output FILE]
+        [--baseline FILE] [--tolerance T] [cases ...]
+
+The package must be installed in the environment, or the command prefixed
+with `PYTHONPATH=.` from the repository root.
+
+Each case generates its input with the deterministic generators of
+`corpus.py` (tall and wide CSV files, deeply nested JSON documents with a
+`$ref` schema, with and without errors), then times one step of validation:
+
+* csv_load_*: `CsvLoader.load_object`
+* csv_validate_*: `CsvValidator.validate` on rows already loaded
+* json_validate_*: `JsonValidator.validate` on a document already loaded
+* error_to_standard: `errors.validator_error_to_standard` on jsonschema errors
+* flywheel_location: `errors.add_flywheel_location_to_errors`
+
+Every case runs in a fresh process, so that its peak RSS (which includes its
+input) is its own.  The best time of the repetitions is reported, along with
+the items (rows, records or errors) and MB processed per second.
+
+`--output` saves the results as JSON.  A saved file can be given back with
+`--baseline`: any case slower than the baseline by more than `--tolerance`
+(or using that much more memory) is reported as a regression, and the exit
+status is 1.  Baselines are only comparable on the same machine and scale,
+so record one there with `--output` before changing the code.
+"""
+
+import argparse
+import concurrent.futures
+import datetime
+import json
+import multiprocessing
+import platform
+import resource
+import sys
+import tempfile
+import time
+import typing as t
+from dataclasses import dataclass
+from pathlib import Path
+
+import corpus
+
+import fw_gear_file_validator
+from fw_gear_file_validator import errors, validator
+from fw_gear_file_validator.loader import CsvLoader
+from fw_gear_file_validator.utils import PARENT_ORDER, FwReference
+
+DEFAULT_TOLERANCE = 0.2
+
+
+@dataclass
+class Workload:
+    """What a case times.
+
+    Attributes:
+        run: the function timed
+        items: the number of items it processes
+        unit: what the items are (rows, records, errors)
+        size: the size of the input in bytes, 0 if it is not a file
+    """
+
+    run: t.Callable[[], t.Any]
+    items: int
+    unit: str
+    size: int = 0
+
+
+def csv_load(rows: int, columns: int) -> t.Callable[[Path, float], Workload]:
+    """Returns the setup of a case loading a CSV file."""
+
+    def setup(workdir: Path, scale: float) -> Workload:
+        n_rows = max(int(rows * scale), 1)
+        path = corpus.write_csv(workdir / "load.csv", n_rows, columns)
+        loader = CsvLoader()
+        return Workload(
+            lambda: loader.load_object(path), n_rows, "rows", path.stat().st_size
+        )
+
+    return setup
+
+
+def csv_validate(
+    rows: int, columns: int, error_rate: float
+) -> t.Callable[[Path, float], Workload]:
+    """Returns the setup of a case validating the rows of a CSV file."""
+
+    def setup(workdir: Path, scale: float) -> Workload:
+        n_rows = max(int(rows * scale), 1)
+        path = corpus.write_csv(workdir / "validate.csv", n_rows, columns, error_rate)
+        csv_rows, _ = CsvLoader().load_object(path)
+        csv_validator = validator.initialize_validator(
+            "csv", corpus.csv_schema(columns)
+        )
+        return Workload(
+            lambda: csv_validator.validate(csv_rows),
+            n_rows,
+            "rows",
+            path.stat().st_size,
+        )
+
+    return setup
+
+
+def json_validate(
+    records: int, depth: int, error_rate: float
+) -> t.Callable[[Path, float], Workload]:
+    """Returns the setup of a case validating a nested JSON document."""
+
+    def setup(workdir: Path, scale: float) -> Workload:
+        n_records = max(int(records * scale), 1)
+        document = corpus.nested_document(n_records, depth, error_rate)
+        json_validator = validator.initialize_validator("json", corpus.nested_schema())
+        return Workload(
+            lambda: json_validator.validate(document),
+            n_records,
+            "records",
+            len(json.dumps(document).encode()),
+        )
+
+    return setup
+
+
+def raw_errors(scale: float) -> list:
+    """Returns the jsonschema errors of a nested document with many errors."""
+    document = corpus.nested_document(max(int(2000 * scale), 1), 5, error_rate=0.5)
+    json_validator = validator.JsonValidator(corpus.nested_schema())
+    return list(json_validator.iter_schema_errors(document))
+
+
+def setup_error_to_standard(workdir: Path, scale: float) -> Workload:
+    """Times the conversion of jsonschema errors to the standard format."""
+    schema_errors = raw_errors(scale)
+    return Workload(
+        lambda: [errors.validator_error_to_standard(e) for e in schema_errors],
+        len(schema_errors),
+        "errors",
+    )
+
+
+def setup_flywheel_location(workdir: Path, scale: float) -> Workload:
+    """Times adding the Flywheel path and container of errors."""
+    levels = PARENT_ORDER[:5]
+    parents = {level: f"{level}-id" for level in levels}
+    fw_ref = FwReference(
+        id="file-id", type="file", parents=parents, contents="flywheel"
+    )
+    fw_ref.hierarchy_objects = {
+        **{level: {"id": f"{level}-id", "label": level} for level in levels},
+        "file": {"file_id": "file-id", "name": "data.csv"},
+    }
+    standard_errors = [errors.validator_error_to_standard(e) for e in raw_errors(scale)]
+    for i, error in enumerate(standard_errors):
+        error["location"] = {
+            "key_path": f"properties.{(levels + ['file'])[i % 6]}.info"
+        }
+    return Workload(
+        lambda: errors.add_flywheel_location_to_errors(fw_ref, standard_errors),
+        len(standard_errors),
+        "errors",
+    )
+
+
+CASES = {
+    "csv_load_tall": csv_load(rows=100_000, columns=10),
+    "csv_load_wide": csv_load(rows=2_000, columns=500),
+    "csv_validate_tall_valid": csv_validate(rows=50_000, columns=10, error_rate=0),
+    "csv_validate_tall_errors": csv_validate(rows=50_000, columns=10, error_rate=0.05),
+    "csv_validate_wide_valid": csv_validate(rows=1_000, columns=500, error_rate=0),
+    "json_validate_nested_valid": json_validate(records=2_000, depth=20, error_rate=0),
+    "json_validate_nested_errors": json_validate(
+        records=2_000, depth=20, error_rate=0.1
+    ),
+    "error_to_standard": setup_error_to_standard,
+    "flywheel_location": setup_flywheel_location,
+}
+
+
+def peak_rss_mb() -> float:
+    """Returns the peak resident set size of the process, in MB."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS.
+    return round(peak / (1e6 if sys.platform == "darwin" else 1e3), 1)
+
+
+def measure(name: str, scale: float, repeat: int) -> t.Dict[str, t.Any]:
+    """Runs a case, in the current process, and returns its measurements."""
+    with tempfile.TemporaryDirectory() as workdir:
+        workload = CASES[name](Path(workdir), scale)
+        times = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            result = workload.run()
+            times.append(time.perf_counter() - start)
+            del result
+    seconds = min(times)
+    return {
+        "seconds": round(seconds, 6),
+        "items": workload.items,
+        "unit": workload.unit,
+        "items_per_sec": round(workload.items / seconds, 1),
+        "mb_per_sec": round(workload.size / 1e6 / seconds, 3)
+        if workload.size
+        else None,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def run_cases(names: t.List[str], scale: float, repeat: int) -> t.Dict[str, dict]:
+    """Runs every case in a fresh process, returns their measurements."""
+    results = {}
+    context = multiprocessing.get_context("spawn")
+    for name in names:
+        with concurrent.futures.ProcessPoolExecutor(1, mp_context=context) as executor:
+            results[name] = executor.submit(measure, name, scale, repeat).result()
+        print_result(name, results[name])
+    return results
+
+
+def print_result(name: str, result: t.Dict[str, t.Any]) -> None:
+    """Prints the measurements of a case."""
+    mb_per_sec = result["mb_per_sec"]
+    print(
+        f"{name:<28} {result['seconds'] * 1000:9.1f} ms "
+        f"{result['items_per_sec']:12,.0f} {result['unit']}/s "
+        f"{'' if mb_per_sec is None else f'{mb_per_sec:8.1f} MB/s':>13} "
+        f"{result['peak_rss_mb']:8.1f} MB peak RSS"
+    )
+
+
+def compare(
+    results: t.Dict[str, dict], baseline: t.Dict[str, t.Any], tolerance: float
+) -> t.List[str]:
+    """Returns the regressions of results against a baseline.
+
+    Args:
+        results: the measurements of each case
+        baseline: a report saved by an earlier run
+        tolerance: the relative slowdown or memory growth allowed
+
+    Returns:
+        a description of each regression
+
+    """
+    regressions = []
+    for name, result in results.items():
+        reference = baseline["results"].get(name)
+        if reference is None:
+            continue
+        slowdown = result["seconds"] / reference["seconds"] - 1
+        if slowdown > tolerance:
+            regressions.append(
+                f"{name}: {slowdown:.0%} slower "
+                f"({reference['seconds'] * 1000:.1f} -> {result['seconds'] * 1000:.1f} ms)"
+            )
+        growth = result["peak_rss_mb"] / reference["peak_rss_mb"] - 1
+        if growth > tolerance:
+            regressions.append(
+                f"{name}: {growth:.0%} more memory "
+                f"({reference['peak_rss_mb']} -> {result['peak_rss_mb']} MB)"
+            )
+    return regressions
+
+
+def main() -> int:
+    """Runs the benchmark, prints the results and returns the exit status."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("cases", nargs="*", help=f"among {', '.join(CASES)}")
+    parser.add_argument(
+        "--scale", type=float, default=1.0, help="multiplies the size of the inputs"
+    )
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", help="save the results to this JSON file")
+    parser.add_argument("--baseline", help="compare the results to this saved report")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+    args = parser.parse_args()
+
+    unknown = sorted(set(args.cases) - set(CASES))
+    if unknown:
+        parser.error(f"unknown cases {', '.join(unknown)}")
+    baseline = None
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text())
+        if baseline["meta"]["scale"] != args.scale:
+            parser.error(
+                f"the baseline was recorded at scale {baseline['meta']['scale']}"
+            )
+
+    report = {
+        "meta": {
+            "version": getattr(fw_gear_file_validator, "__version__", None),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "machine": platform.machine(),
+            "date": datetime.datetime.now().isoformat(timespec="seconds"),
+            "scale": args.scale,
+            "repeat": args.repeat,
+        },
+        "results": run_cases(args.cases or list(CASES), args.scale, args.repeat),
+    }
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2) + "\n")
+
+    if baseline is None:
+        return 0
+    regressions = compare(report["results"], baseline, args.tolerance)
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+    if not regressions:
+        print(f"No regression against {args.baseline} (tolerance {args.tolerance:.0%})")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
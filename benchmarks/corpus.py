@@ -0,0 +1,126 @@
+"""Deterministic synthetic files and schemas for the benchmarks.
+
+Every generator takes a seed, so that the same arguments always produce the
+same bytes and the timings of two runs are comparable.  Errors are planted at
+a given rate: in CSV files a failing cell is an integer column holding a word
+or a string column too long for its `maxLength`; in JSON documents a node
+holds a negative `value` and a `name` that does not match its pattern.
+"""
+
+import csv
+import random
+import typing as t
+from pathlib import Path
+
+# Every third column is an integer, every third a number, the others strings.
+COLUMN_TYPES = ("integer", "number", "string")
+MAX_LENGTH = 12
+
+
+def csv_schema(columns: int) -> dict:
+    """Returns a flat CSV schema for `columns` columns named c0, c1, ..."""
+    properties = {}
+    for i in range(columns):
+        column_type = COLUMN_TYPES[i % len(COLUMN_TYPES)]
+        if column_type == "string":
+            properties[f"c{i}"] = {"type": "string", "maxLength": MAX_LENGTH}
+        elif column_type == "integer":
+            properties[f"c{i}"] = {"type": "integer", "minimum": 0}
+        else:
+            properties[f"c{i}"] = {"type": "number"}
+    return {
+        "type": "object",
+        "properties": properties,
+        "required": [f"c{i}" for i in range(min(columns, 3))],
+    }
+
+
+def write_csv(
+    path: Path, rows: int, columns: int, error_rate: float = 0.0, seed: int = 0
+) -> Path:
+    """Writes a CSV file matching `csv_schema(columns)`.
+
+    Args:
+        path: where the file is written
+        rows: the number of rows, not counting the header
+        columns: the number of columns
+        error_rate: the fraction of cells failing the schema
+        seed: the seed of the values and errors
+
+    Returns:
+        the path of the file
+
+    """
+    rng = random.Random(seed)
+    with open(path, "w", newline="", encoding="UTF-8") as fp:
+        writer = csv.writer(fp)
+        writer.writerow(f"c{i}" for i in range(columns))
+        for _ in range(rows):
+            row = []
+            for i in range(columns):
+                column_type = COLUMN_TYPES[i % len(COLUMN_TYPES)]
+                failing = error_rate and rng.random() < error_rate
+                if column_type == "integer":
+                    row.append("n/a" if failing else rng.randint(0, 10_000))
+                elif column_type == "number":
+                    row.append(round(rng.uniform(-100, 100), 3))
+                else:
+                    length = MAX_LENGTH + 5 if failing else rng.randint(1, MAX_LENGTH)
+                    row.append("".join(rng.choices("abcdefghij", k=length)))
+            writer.writerow(row)
+    return path
+
+
+def nested_schema() -> dict:
+    """Returns a schema of records holding a chain of nodes, through `$ref`."""
+    return {
+        "type": "object",
+        "definitions": {
+            "name": {"type": "string", "pattern": "^[a-z]+-[0-9]+$"},
+            "node": {
+                "type": "object",
+                "properties": {
+                    "name": {"$ref": "#/definitions/name"},
+                    "value": {"type": "number", "minimum": 0},
+                    "tags": {"type": "array", "items": {"type": "string"}},
+                    "child": {"$ref": "#/definitions/node"},
+                },
+                "required": ["name", "value"],
+            },
+        },
+        "properties": {
+            "records": {"type": "array", "items": {"$ref": "#/definitions/node"}}
+        },
+        "required": ["records"],
+    }
+
+
+def nested_document(
+    records: int, depth: int, error_rate: float = 0.0, seed: int = 0
+) -> t.Dict[str, t.Any]:
+    """Returns a document matching `nested_schema()`.
+
+    Args:
+        records: the number of records
+        depth: the number of nested nodes in each record
+        error_rate: the fraction of nodes failing the schema
+        seed: the seed of the values and errors
+
+    Returns:
+        the document
+
+    """
+    rng = random.Random(seed)
+
+    def node(level: int) -> t.Dict[str, t.Any]:
+        failing = error_rate and rng.random() < error_rate
+        content = {
+            "name": f"Node {level}" if failing else f"node-{level}",
+            "value": -1 if failing else round(rng.uniform(0, 100), 3),
+            "tags": rng.sample(["t1", "t2", "dwi", "bold", "qa"], 2),
+        }
+        if level + 1 < depth:
+            content["child"] = node(level + 1)
+        return content
+
+    return {"records": [node(0) for _ in range(records)]}
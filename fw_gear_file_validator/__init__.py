@@ -1,8 +1,14 @@
 """The fw_gear_{{gear_package}} package."""
 
-from importlib.metadata import version
 
-try:
-    __version__ = version(__package__)
-except Exception:  # pragma: no cover
-    pass
+def __getattr__(name: str) -> str:
+    """Reads the package version on first access, importlib.metadata is slow to import."""
+    if name == "__version__":
+        from importlib.metadata import version
+
+        try:
+            globals()[name] = version(__package__)
+        except Exception:  # pragma: no cover
+            raise AttributeError(name) from None
+        return globals()[name]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
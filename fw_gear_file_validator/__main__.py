@@ -0,0 +1,7 @@
+"""Runs the command line interface, see cli.py."""
+
+import sys
+
+from fw_gear_file_validator.cli import main
+
+sys.exit(main())
@@ -0,0 +1,417 @@
+"""aio.py.
+
+Validates files from asyncio code without blocking the event loop.
+
+    result = await aio.validate_path("visits.csv", schema)
+    async for error in aio.iter_errors("visits.csv", schema):
+        ...
+
+The loaders and validators are synchronous: files are read (memory-mapped)
+and validated on a thread of an executor, the loop's default one unless
+another is given.  Records are validated in chunks of `chunk_size`; after
+each chunk the errors found are handed to the event loop, and the worker
+checks whether it should stop.  At most `max_pending` chunks of errors wait
+for the consumer before validation pauses, so a slow consumer holds back
+validation instead of letting errors pile up in memory.
+
+Cancelling the task, or closing the iterator (e.g. leaving an `async for`
+loop wrapped in `contextlib.aclosing`), stops the worker at the end of its
+current chunk and closes the file.  `validate_paths` and
+the `semaphore` argument limit how many files are validated at once.
+
+A file that turns out to be malformed only reports its format errors with
+`validate_path`, like `validator.validate_object`.  `iter_errors` has already
+yielded the errors found before, and yields the format errors last.
+"""
+
+import asyncio
+import concurrent.futures
+import threading
+import time
+import typing as t
+from pathlib import Path
+
+from fw_gear_file_validator import errors as err
+from fw_gear_file_validator import validator
+from fw_gear_file_validator.cli import FileResult
+from fw_gear_file_validator.limits import ErrorLimits, ErrorSummary
+from fw_gear_file_validator.loader import Loader, RecordStream
+from fw_gear_file_validator.parser import SUPPORTED_FILE_EXTENSIONS
+from fw_gear_file_validator.utils import FwReference, get_loader_type
+
+# Records validated between two hand-offs to the event loop.
+CHUNK_SIZE = 1000
+# Chunks of errors waiting for the consumer before validation pauses.
+MAX_PENDING = 4
+DEFAULT_CONCURRENCY = 4
+
+
+class _Cancelled(Exception):
+    """Raised in the worker when the consumer has stopped."""
+
+
+class _Handoff:
+    """Carries chunks of errors from a worker thread to the event loop.
+
+    The worker collects errors with `add` and hands them over with `flush`,
+    which blocks while `max_pending` chunks are waiting.  The consumer gets
+    them with `get`, and stops the worker with `cancel`.
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, max_pending: int):
+        self.loop = loop
+        self.max_pending = max_pending
+        self.queue = asyncio.Queue()
+        self.slots = threading.Semaphore(max_pending)
+        self.cancelled = threading.Event()
+        self.pending = []
+        self.summary = None
+
+    def add(self, error: t.Dict) -> None:
+        """Collects an error, in the worker."""
+        self.pending.append(error)
+
+    def flush(self) -> None:
+        """Hands the errors collected over, in the worker.
+
+        Raises:
+            _Cancelled: if the consumer has stopped
+        """
+        if self.cancelled.is_set():
+            raise _Cancelled()
+        if not self.pending:
+            return
+        self.slots.acquire()
+        if self.cancelled.is_set():
+            raise _Cancelled()
+        chunk, self.pending = self.pending, []
+        self._put(("errors", chunk))
+
+    def finish(self, format_errors: t.Optional[t.List[t.Dict]]) -> None:
+        """Hands the last errors over and ends the stream, in the worker."""
+        self.flush()
+        self._put(("done", format_errors))
+
+    def fail(self, exception: BaseException) -> None:
+        """Ends the stream with an exception, in the worker."""
+        self._put(("failed", exception))
+
+    def worker_done(self, future: asyncio.Future) -> None:
+        """Ends the stream if the worker raised instead of handing over, in the event loop."""
+        if future.cancelled():
+            self.queue.put_nowait(("failed", asyncio.CancelledError()))
+        elif future.exception() is not None:
+            self.queue.put_nowait(("failed", future.exception()))
+
+    def _put(self, item: t.Tuple[str, t.Any]) -> None:
+        try:
+            self.loop.call_soon_threadsafe(self.queue.put_nowait, item)
+        except RuntimeError:  # pragma: no cover
+            # The loop is closed, nobody is waiting for the errors.
+            self.cancelled.set()
+
+    def checkpoints(self, records: t.Iterable, chunk_size: int) -> "_Checkpoints":
+        """Wraps records so that the errors are handed over after each chunk."""
+        return _Checkpoints(records, self, chunk_size)
+
+    async def get(self) -> t.Tuple[str, t.Any]:
+        """Returns the next chunk of errors, in the event loop."""
+        item = await self.queue.get()
+        if item[0] == "errors":
+            self.slots.release()
+        return item
+
+    def cancel(self) -> None:
+        """Stops the worker at its next chunk, in the event loop."""
+        self.cancelled.set()
+        # Wakes the worker up if it waits for a slot.
+        for _ in range(self.max_pending):
+            self.slots.release()
+
+
+class _Checkpoints:
+    """Records that hand the errors over every `chunk_size` records.
+
+    Other attributes are those of the wrapped records (e.g. `array`).
+    """
+
+    def __init__(self, records: t.Iterable, handoff: _Handoff, chunk_size: int):
+        self.records = records
+        self.handoff = handoff
+        self.chunk_size = max(chunk_size, 1)
+
+    def __iter__(self) -> t.Iterator[t.Any]:
+        for count, record in enumerate(self.records, start=1):
+            yield record
+            if count % self.chunk_size == 0:
+                self.handoff.flush()
+
+    def __getattr__(self, name: str) -> t.Any:
+        return getattr(self.records, name)
+
+
+def _produce(
+    handoff: _Handoff,
+    open_object: t.Callable[[], t.Tuple[t.Any, t.Optional[t.List[t.Dict]]]],
+    file_type: str,
+    schema: dict,
+    limits: t.Optional[ErrorLimits],
+    chunk_size: int,
+) -> None:
+    """Loads and validates an object in a worker, handing the errors over."""
+    try:
+        d, errors = open_object()
+        if errors:
+            handoff.finish(errors)
+            return
+        schema_validator = validator.initialize_validator(file_type, schema)
+        limited = limits is not None and limits.active
+        if not isinstance(d, RecordStream):
+            _, errors = schema_validator.validate(d)
+            if limited:
+                errors, handoff.summary = limits.collect(errors)
+            handoff.pending.extend(errors)
+            handoff.finish(None)
+            return
+
+        with d:
+            records = handoff.checkpoints(d, chunk_size)
+            if limited:
+                handoff.summary = limits.new_summary()
+                found = limits.iter_within(
+                    schema_validator.iter_errors(records, sample=limits.sampler()),
+                    handoff.summary,
+                )
+            else:
+                found = schema_validator.iter_errors(records)
+            for error in found:
+                handoff.add(error)
+        handoff.finish(d.errors)
+    except _Cancelled:
+        # The consumer has stopped, nobody is waiting for the errors.
+        return
+    except asyncio.CancelledError:
+        raise
+    except Exception as e:
+        handoff.fail(e)
+
+
+async def _iter_chunks(
+    open_object: t.Callable[[], t.Tuple[t.Any, t.Optional[t.List[t.Dict]]]],
+    file_type: str,
+    schema: dict,
+    limits: t.Optional[ErrorLimits] = None,
+    executor: t.Optional[concurrent.futures.Executor] = None,
+    chunk_size: int = CHUNK_SIZE,
+    max_pending: int = MAX_PENDING,
+    summaries: t.Optional[t.List[ErrorSummary]] = None,
+) -> t.AsyncIterator[t.Tuple[str, t.Any]]:
+    """Validates an object in an executor and yields its errors as they are handed over.
+
+    Yields ("errors", chunk) for each chunk of errors, then ("done",
+    format_errors).  The summary of the error limits, if any, is appended to
+    `summaries` once validation is done.
+    """
+    loop = asyncio.get_running_loop()
+    handoff = _Handoff(loop, max_pending)
+    future = loop.run_in_executor(
+        executor, _produce, handoff, open_object, file_type, schema, limits, chunk_size
+    )
+    # Exceptions that are not handed over, e.g. a CancelledError, propagate
+    # out of the worker and end the stream once it has stopped.
+    future.add_done_callback(handoff.worker_done)
+    try:
+        while True:
+            kind, value = await handoff.get()
+            if kind == "failed":
+                raise value
+            if kind == "done" and summaries is not None:
+                summaries.append(handoff.summary)
+            yield kind, value
+            if kind == "done":
+                break
+    finally:
+        handoff.cancel()
+        # The worker stops at its next chunk, and closes the file.
+        await asyncio.wait([future])
+
+
+def _open_path(
+    path: t.Union[Path, str], file_type: t.Optional[str]
+) -> t.Tuple[t.Callable, str]:
+    """Returns the function opening a local file, and the type of the file."""
+    path = Path(path)
+    file_type = file_type or SUPPORTED_FILE_EXTENSIONS.get(path.suffix.lower())
+    if not file_type:
+        raise ValueError(f"file type {path.suffix or path.name} is not supported")
+    return (lambda: Loader.factory(file_type).open_object(path)), file_type
+
+
+async def iter_errors(
+    path: t.Union[Path, str],
+    schema: dict,
+    file_type: str = None,
+    limits: ErrorLimits = None,
+    executor: concurrent.futures.Executor = None,
+    chunk_size: int = CHUNK_SIZE,
+    max_pending: int = MAX_PENDING,
+) -> t.AsyncIterator[t.Dict]:
+    """Validates a local file and yields its errors as they are found.
+
+    Args:
+        path: the file to validate
+        schema: the validation JSON schema
+        file_type: the type of the file, guessed from its extension by default
+        limits: limits on the errors collected, if any
+        executor: where the file is read and validated, the loop's default
+            executor by default
+        chunk_size: the records validated between two hand-offs to the loop
+        max_pending: the chunks of errors waiting before validation pauses
+
+    Yields:
+        the errors, in the standard error format
+
+    Raises:
+        ValueError: if the file type is not supported or the file cannot be read
+
+    """
+    open_object, file_type = _open_path(path, file_type)
+    async for kind, value in _iter_chunks(
+        open_object, file_type, schema, limits, executor, chunk_size, max_pending
+    ):
+        for error in value or []:
+            yield error
+
+
+async def iter_reference_errors(
+    fw_ref: FwReference,
+    schema: dict,
+    loader_config: t.Dict[str, t.Any] = None,
+    limits: ErrorLimits = None,
+    executor: concurrent.futures.Executor = None,
+    chunk_size: int = CHUNK_SIZE,
+    max_pending: int = MAX_PENDING,
+) -> t.AsyncIterator[t.Dict]:
+    """Validates a Flywheel reference and yields its errors as they are found.
+
+    The hierarchy is fetched with `FwReference.fetch_hierarchy_objects`, and
+    the errors hold their Flywheel path and container id, like those of the
+    gear.
+
+    Args:
+        fw_ref: the file or container to validate, with its client set
+        schema: the validation JSON schema
+        loader_config: the config of the loader, e.g. `add_parents`
+        limits: limits on the errors collected, if any
+        executor: where the object is loaded and validated
+        chunk_size: the records validated between two hand-offs to the loop
+        max_pending: the chunks of errors waiting before validation pauses
+
+    Yields:
+        the errors, in the standard error format
+
+    """
+    await fw_ref.fetch_hierarchy_objects()
+    loader_type = get_loader_type(fw_ref)
+    loader = Loader.factory(loader_type, config=loader_config or {})
+    location = fw_ref.loc
+    async for kind, value in _iter_chunks(
+        lambda: loader.open_object(location),
+        loader_type,
+        schema,
+        limits,
+        executor,
+        chunk_size,
+        max_pending,
+    ):
+        for error in err.iter_flywheel_location(fw_ref, value or []):
+            yield error
+
+
+async def validate_path(
+    path: t.Union[Path, str],
+    schema: dict,
+    file_type: str = None,
+    limits: ErrorLimits = None,
+    report_mode: str = "errors",
+    executor: concurrent.futures.Executor = None,
+    chunk_size: int = CHUNK_SIZE,
+    semaphore: asyncio.Semaphore = None,
+) -> FileResult:
+    """Validates a local file, see `cli.validate_file`.
+
+    Args:
+        path: the file to validate
+        schema: the validation JSON schema
+        file_type: the type of the file, guessed from its extension by default
+        limits: limits on the errors collected, if any
+        report_mode: "errors" to report every error, "aggregate" to group them
+        executor: where the file is read and validated
+        chunk_size: the records validated between two hand-offs to the loop
+        semaphore: if given, held while the file is validated
+
+    Returns:
+        the result of the validation
+
+    """
+    if semaphore is not None:
+        async with semaphore:
+            return await validate_path(
+                path, schema, file_type, limits, report_mode, executor, chunk_size
+            )
+
+    path = Path(path)
+    result = FileResult(str(path), file_type)
+    start = time.perf_counter()
+    try:
+        open_object, result.file_type = _open_path(path, file_type)
+        result.size = (await asyncio.to_thread(path.stat)).st_size
+        errors = []
+        summaries = []
+        async for kind, value in _iter_chunks(
+            open_object,
+            result.file_type,
+            schema,
+            limits,
+            executor,
+            chunk_size,
+            summaries=summaries,
+        ):
+            if kind == "errors":
+                errors.extend(value)
+            elif value:
+                # A file that cannot be parsed only reports its format errors.
+                errors = value
+                summaries = []
+        result.errors = list(err.make_report(errors, report_mode))
+        result.valid = not result.errors
+        if summaries and summaries[0] is not None:
+            result.summary = summaries[0].to_qc_data()
+    except (ValueError, OSError) as e:
+        result.failure = str(e)
+    result.seconds = time.perf_counter() - start
+    return result
+
+
+async def validate_paths(
+    paths: t.Iterable[t.Union[Path, str]],
+    schema: dict,
+    max_concurrency: int = DEFAULT_CONCURRENCY,
+    **kwargs: t.Any,
+) -> t.List[FileResult]:
+    """Validates local files concurrently, at most `max_concurrency` at once.
+
+    Args:
+        paths: the files to validate
+        schema: the validation JSON schema
+        max_concurrency: the number of files validated at once
+        **kwargs: passed on to validate_path
+
+    Returns:
+        the result of every file, in the order of the paths
+
+    """
+    semaphore = asyncio.Semaphore(max(max_concurrency, 1))
+    return await asyncio.gather(
+        *(validate_path(path, schema, semaphore=semaphore, **kwargs) for path in paths)
+    )
@@ -0,0 +1,407 @@
+"""batch.py.
+
+Validates many files in a single run.
+
+Validating one file per job means paying for the gear start up, the client
+authentication and the schema compilation for every file.  In batch mode the
+loaders, the compiled validator and the Flywheel client are built once and
+reused for every file, while the QC results and tags are still saved on each
+file individually.
+"""
+
+import logging
+import tempfile
+import typing as t
+from dataclasses import dataclass, field
+from pathlib import Path
+
+import flywheel
+from flywheel_gear_toolkit import GearToolkitContext
+
+from fw_gear_file_validator import cache, checkpoint, incremental, validator
+from fw_gear_file_validator.cache import ContainerCache, schema_hash
+from fw_gear_file_validator.errors import iter_flywheel_location, make_report
+from fw_gear_file_validator.limits import ErrorSummary
+from fw_gear_file_validator.loader import CsvRowStream, Loader, RecordStream
+from fw_gear_file_validator.parser import (
+    SUPPORTED_FILE_EXTENSIONS,
+    identify_file_type,
+    validate_filetype,
+)
+from fw_gear_file_validator.sinks import (
+    ErrorSink,
+    MemoryErrorSink,
+    open_error_sink,
+    save_sink_metadata_via_sdk,
+)
+from fw_gear_file_validator.utils import (
+    FwReference,
+    add_tags_via_sdk,
+    get_loader_type,
+)
+
+log = logging.getLogger(__name__)
+
+
+@dataclass
+class BatchResult:
+    """The outcome of validating one file of a batch.
+
+    Attributes:
+        name: the file name, or the file path for local files
+        valid: True if the file is valid, False if it is not, None if it
+            could not be validated
+        errors: the errors found, in the standard error format.  Empty when
+            they were written to an error file instead (`error_output`).
+        file_id: the flywheel file id, for flywheel files
+        summary: what the error limits left out of the errors, if any
+        reused: True if the file was unchanged and its previous result was
+            reused instead of validating it again (`skip_unchanged`)
+    """
+
+    name: str
+    valid: t.Optional[bool] = None
+    errors: t.List[t.Dict] = field(default_factory=list)
+    file_id: t.Optional[str] = None
+    summary: t.Optional[ErrorSummary] = None
+    reused: bool = False
+
+
+class BatchValidator:
+    """Validates many files against the same schema.
+
+    Loaders are built once per loader type, the compiled validators are
+    shared through `validator.initialize_validator`, and the parent containers
+    of flywheel files are shared through a container cache.
+    """
+
+    def __init__(
+        self,
+        schema: dict,
+        validation_level: str = "file",
+        loader_config: t.Dict[str, t.Any] = None,
+        validator_config: t.Dict[str, t.Any] = None,
+        container_cache: ContainerCache = None,
+    ):
+        """Initializes a BatchValidator object.
+
+        Args:
+            schema: the validation JSON schema
+            validation_level: "file" to validate the file contents, "flywheel"
+                to validate the flywheel objects
+            loader_config: the loader config, as returned by parse_batch_config
+            validator_config: the validator config, as returned by parse_batch_config
+            container_cache: the cache of the parent containers, defaults to
+                the process-wide `cache.container_cache`
+        """
+        validator_config = validator_config or {}
+        self.validator_config = validator_config
+        self.schema = schema
+        self.validation_level = validation_level
+        self.container_cache = container_cache or cache.container_cache
+        self.loader_config = {
+            **(loader_config or {}),
+            "container_cache": self.container_cache,
+        }
+        self.workers = validator_config.get("workers", 1)
+        self.limits = validator_config.get("error_limits")
+        self.report_mode = validator_config.get("report_mode", "errors")
+        self.artifact_dir = validator_config.get("schema_cache_dir")
+        self.engine = validator_config.get("engine", "row")
+        self.error_output = validator_config.get("error_output", "metadata")
+        self.skip_unchanged = validator_config.get("skip_unchanged", False)
+        self.state_file = validator_config.get("state_file")
+        self.checkpoint_dir = validator_config.get("checkpoint_dir")
+        if self.checkpoint_dir and self.limits is not None and self.limits.active:
+            log.info("Error limits are set, files are validated without checkpoint")
+            self.checkpoint_dir = None
+        if self.checkpoint_dir and self.loader_config.get("byte_ranges"):
+            log.info("Byte ranges are reported, files are validated without checkpoint")
+            self.checkpoint_dir = None
+        self._state_store = None
+        self._loaders = {}
+
+    def get_loader(self, loader_type: str) -> Loader:
+        """Returns the loader of a loader type, built on first use."""
+        if loader_type not in self._loaders:
+            self._loaders[loader_type] = Loader.factory(
+                loader_type, config=self.loader_config
+            )
+        return self._loaders[loader_type]
+
+    def get_validator(
+        self, loader_type: str
+    ) -> t.Union[validator.JsonValidator, validator.CsvValidator]:
+        """Returns the compiled validator of a loader type."""
+        return validator.initialize_validator(
+            loader_type, self.schema, engine=self.engine, artifact_dir=self.artifact_dir
+        )
+
+    def validate_location(
+        self, loader_type: str, location: t.Union[Path, dict]
+    ) -> t.Tuple[bool, t.List[t.Dict], t.Union[ErrorSummary, None]]:
+        """Loads and validates a single object.
+
+        Args:
+            loader_type: the type of loader needed, as returned by get_loader_type
+            location: the file path, or the flywheel hierarchy to validate
+
+        Returns:
+            valid: True if no errors, False otherwise.
+            errors: Any errors generated during loading or validation.
+            summary: what the error limits left out of the errors, if any
+
+        """
+        d, errors = self.get_loader(loader_type).open_object(location)
+        if errors:
+            return False, errors, None
+        return validator.validate_object(
+            self.get_validator(loader_type), d, location, self.workers, self.limits
+        )
+
+    def validate_directory(self, directory: Path) -> t.List[BatchResult]:
+        """Validates the contents of every supported file in a local directory.
+
+        Args:
+            directory: the directory, files in subdirectories are included
+
+        Returns:
+            the result of every file, in path order
+
+        """
+        results = []
+        for file_path in sorted(Path(directory).rglob("*")):
+            file_type = SUPPORTED_FILE_EXTENSIONS.get(file_path.suffix)
+            if not file_path.is_file() or not file_type:
+                continue
+            try:
+                valid, errors, summary = self.validate_location(file_type, file_path)
+            except ValueError as e:
+                log.error("Could not validate %s: %s", file_path, e)
+                results.append(BatchResult(name=str(file_path)))
+                continue
+            errors = make_report(errors, self.report_mode)
+            results.append(BatchResult(str(file_path), valid, errors, summary=summary))
+        return results
+
+    def validate_file_ids(
+        self,
+        client: flywheel.Client,
+        file_ids: t.Iterable[str],
+        context: GearToolkitContext = None,
+        tag: str = None,
+    ) -> t.List[BatchResult]:
+        """Validates flywheel files, saving a QC result and tags on each one.
+
+        A file that cannot be retrieved or validated is logged and skipped,
+        the rest of the batch still runs.
+
+        Args:
+            client: the flywheel client, shared by every file
+            file_ids: the ids of the files to validate
+            context: the gear toolkit context, used to save the QC results
+                and the error files.  Nothing is saved when it is None.
+            tag: the base to use for the completion tags, no tags when None
+
+        Returns:
+            the result of every file, in file_ids order
+
+        """
+        results = []
+        with tempfile.TemporaryDirectory() as download_dir:
+            for file_id in file_ids:
+                try:
+                    result = self.validate_file_id(
+                        client, file_id, Path(download_dir), context, tag
+                    )
+                except (flywheel.ApiException, ValueError, TypeError, OSError) as e:
+                    log.error("Could not validate file %s: %s", file_id, e)
+                    results.append(BatchResult(name=file_id, file_id=file_id))
+                    continue
+                results.append(result)
+        return results
+
+    def validate_file_id(
+        self,
+        client: flywheel.Client,
+        file_id: str,
+        download_dir: Path,
+        context: GearToolkitContext = None,
+        tag: str = None,
+    ) -> BatchResult:
+        """Validates a single flywheel file, saving its QC result and tags.
+
+        Args:
+            client: the flywheel client
+            file_id: the id of the file to validate
+            download_dir: where the file content is downloaded to, if needed.
+                The downloaded file is removed once validated.
+            context: the gear toolkit context, used to save the QC result and
+                the error file.  Nothing is saved when it is None.
+            tag: the base to use for the completion tags, no tags when None
+
+        Returns:
+            the validation result of the file
+
+        """
+        file_entry = client.get_file(file_id)
+        ext = Path(file_entry.name).suffix
+        mime = file_entry.mimetype
+        file_path = None
+        if self.validation_level == "file":
+            validate_filetype(ext, mime)
+            file_path = download_dir / f"{file_id}{ext}"
+            file_entry.download(str(file_path))
+
+        digest = store = None
+        try:
+            fw_ref = FwReference.init_from_file_entry(
+                client,
+                file_entry,
+                content=self.validation_level,
+                file_path=file_path,
+                file_type=identify_file_type(ext, mime),
+                container_cache=self.container_cache,
+            )
+            loader_type = get_loader_type(fw_ref)
+            d, errors = self.get_loader(loader_type).open_object(fw_ref.loc)
+            if self.skip_unchanged and not errors:
+                gear_name = context.manifest.get("name") if context else None
+                digest = self.validation_hash(d, fw_ref, gear_name)
+                store = self.result_store(file_entry, gear_name)
+                prior = store.get(file_id, digest)
+                if prior is not None:
+                    if isinstance(d, RecordStream):
+                        d.close()
+                    return self.reuse_result(file_entry, prior, context, tag)
+            with self.open_sink(context, file_entry.name) as sink:
+                valid, summary = self.validate_to_sink(
+                    fw_ref, loader_type, d, errors, sink
+                )
+        finally:
+            if file_path:
+                file_path.unlink(missing_ok=True)
+
+        if context is not None:
+            state, meta_dict = save_sink_metadata_via_sdk(
+                sink, file_entry, context, summary, digest
+            )
+        else:
+            state, meta_dict = sink.qc_result(summary)
+        if store is not None:
+            store.put(file_id, digest, state, meta_dict)
+        if tag:
+            add_tags_via_sdk(file_entry, valid, tag)
+        errors = sink.errors if isinstance(sink, MemoryErrorSink) else []
+        return BatchResult(file_entry.name, valid, errors, file_id, summary)
+
+    def validation_hash(self, d: t.Any, fw_ref: FwReference, gear_name: str) -> str:
+        """Returns the validation hash of a loaded file, see `incremental`."""
+        return incremental.validation_hash(
+            incremental.content_hash(d, fw_ref.loc, gear_name),
+            schema_hash(self.schema),
+            incremental.result_options(self.validator_config),
+        )
+
+    def result_store(
+        self, file_entry: flywheel.FileEntry, gear_name: str
+    ) -> incremental.ResultStore:
+        """Returns where the previous result of a file is looked up.
+
+        The local state file, if any, is read once and shared by the batch.
+        """
+        if self.state_file:
+            if self._state_store is None:
+                self._state_store = incremental.open_result_store(
+                    self.state_file, None, gear_name
+                )
+            return self._state_store
+        return incremental.open_result_store(None, file_entry.info, gear_name)
+
+    @staticmethod
+    def reuse_result(
+        file_entry: flywheel.FileEntry,
+        prior: t.Tuple[str, t.Dict],
+        context: GearToolkitContext = None,
+        tag: str = None,
+    ) -> BatchResult:
+        """Saves the previous result of an unchanged file again, with its tags."""
+        state, meta_dict = prior
+        log.info("File %s unchanged since its last validation", file_entry.name)
+        if context is not None:
+            context.metadata.add_qc_result_via_sdk(
+                file_entry, "validation", state=state, **meta_dict
+            )
+        if tag:
+            add_tags_via_sdk(file_entry, state == "PASS", tag)
+        return BatchResult(
+            file_entry.name,
+            state == "PASS",
+            meta_dict.get("data", []),
+            file_entry.file_id,
+            reused=True,
+        )
+
+    def open_sink(self, context: GearToolkitContext, file_name: str) -> ErrorSink:
+        """Returns the sink of the errors of a file, for the `error_output` option.
+
+        Without a context there is no output directory, and the errors are
+        kept in memory.
+        """
+        if context is None:
+            return MemoryErrorSink()
+        return open_error_sink(self.error_output, context.output_dir, file_name)
+
+    def validate_to_sink(
+        self,
+        fw_ref: FwReference,
+        loader_type: str,
+        d: t.Any,
+        errors: t.Optional[t.List[t.Dict]],
+        sink: ErrorSink,
+    ) -> t.Tuple[bool, t.Union[ErrorSummary, None]]:
+        """Validates a loaded flywheel reference, writing its errors to a sink.
+
+        The errors get their flywheel location and are reported in the
+        `report_mode` as they are written, like in single file runs.  With a
+        `checkpoint_dir`, csv files are validated from their last checkpoint.
+
+        Args:
+            fw_ref: the file to validate
+            loader_type: the type of loader it was loaded with
+            d: the loaded object, as returned by `Loader.open_object`
+            errors: the errors found while loading it
+            sink: where the errors are written
+
+        Returns:
+            valid: True if no errors, False otherwise.
+            summary: what the error limits left out of the errors, if any
+
+        """
+
+        def report(errors: t.Iterable[t.Dict]) -> t.Iterable[t.Dict]:
+            return make_report(iter_flywheel_location(fw_ref, errors), self.report_mode)
+
+        if errors:
+            sink.write_all(report(errors))
+            return False, None
+        if self.checkpoint_dir and isinstance(d, CsvRowStream):
+            # Only the rows appended since the file's last checkpoint are read.
+            d.close()
+            valid, errors = checkpoint.validate_csv_in_checkpoint_dir(
+                self.checkpoint_dir,
+                fw_ref.id,
+                fw_ref.loc,
+                self.get_validator(loader_type),
+            )
+            sink.write_all(report(errors))
+            return valid, None
+        return validator.validate_object_to_sink(
+            self.get_validator(loader_type),
+            d,
+            fw_ref.loc,
+            sink,
+            transform=report,
+            workers=self.workers,
+            limits=self.limits,
+        )
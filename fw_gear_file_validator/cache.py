@@ -0,0 +1,320 @@
+"""cache.py.
+
+Process-wide caches used when validating many files in the same process
+(compiled validators and Flywheel containers), and on-disk schema compilation
+artifacts shared between processes.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+import typing as t
+from collections import OrderedDict, namedtuple
+from pathlib import Path
+
+log = logging.getLogger(__name__)
+
+CacheInfo = namedtuple("CacheInfo", ["hits", "misses", "maxsize", "currsize"])
+
+SCHEMA_CACHE_SIZE = 32
+CONTAINER_CACHE_SIZE = 1024
+# Seconds a container is reused for before being fetched again.
+CONTAINER_CACHE_TTL = 300
+
+# Bumped whenever the content of the saved artifacts changes.
+ARTIFACT_VERSION = 1
+
+
+def schema_hash(schema: t.Any) -> str:
+    """Returns a hash of the content of a JSON schema.
+
+    The hash does not depend on the order of the keys of the schema, so the
+    same schema always hashes the same whether it was loaded from a file or
+    built in code.
+
+    Args:
+        schema: the JSON schema
+
+    Returns:
+        the hex digest of the sha256 hash of the canonical JSON representation
+
+    """
+    canonical = json.dumps(
+        schema, sort_keys=True, separators=(",", ":"), ensure_ascii=False
+    )
+    return hashlib.sha256(canonical.encode("UTF-8")).hexdigest()
+
+
+class LRUCache:
+    """A thread-safe, size-bounded, least recently used cache.
+
+    Entries can optionally expire a fixed time after they were created.  Hits
+    and misses are counted, and reported by `cache_info` the same way
+    `functools.lru_cache` does.
+    """
+
+    def __init__(
+        self,
+        maxsize: int = SCHEMA_CACHE_SIZE,
+        ttl: t.Optional[float] = None,
+        timer: t.Callable[[], float] = time.monotonic,
+    ):
+        """Initializes an LRUCache object.
+
+        Args:
+            maxsize: the maximum number of entries kept in the cache
+            ttl: the number of seconds an entry is kept for, None to keep
+                entries until they are evicted
+            timer: returns the current time, in seconds
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._timer = timer
+        # Values are (entry, expiry time or None).
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_create(
+        self, key: t.Hashable, factory: t.Callable[[], t.Any], count: bool = True
+    ) -> t.Any:
+        """Returns the entry for a key, creating it with factory on a miss.
+
+        Args:
+            key: the cache key
+            factory: called without arguments to create a missing entry
+            count: False to leave the hit and miss counters unchanged
+
+        Returns:
+            the cached entry
+
+        """
+        with self._lock:
+            if key in self._entries:
+                value, expires = self._entries[key]
+                if expires is None or self._timer() < expires:
+                    if count:
+                        self.hits += 1
+                    self._entries.move_to_end(key)
+                    return value
+                del self._entries[key]
+            if count:
+                self.misses += 1
+
+        value = factory()
+        expires = None if self.ttl is None else self._timer() + self.ttl
+        with self._lock:
+            self._entries[key] = (value, expires)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return value
+
+    def cache_info(self) -> CacheInfo:
+        """Returns the hit and miss counters and the size of the cache."""
+        with self._lock:
+            return CacheInfo(self.hits, self.misses, self.maxsize, len(self._entries))
+
+    def cache_clear(self) -> None:
+        """Removes every entry and resets the counters."""
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+
+class CachedContainer:
+    """A Flywheel container, and its filtered projection once computed."""
+
+    __slots__ = ("container", "filtered")
+
+    def __init__(self, container: t.Any):
+        """Initializes a CachedContainer object."""
+        self.container = container
+        self.filtered = None
+
+
+class ContainerCache:
+    """Caches Flywheel containers by level and id.
+
+    Files validated in the same run usually share their parent containers, so
+    each parent is fetched (and filtered by `FwLoader`) once and reused until
+    it expires.  The cache is used by passing it to `FwReference` and to
+    `FwLoader` through its config.
+    """
+
+    def __init__(
+        self,
+        maxsize: int = CONTAINER_CACHE_SIZE,
+        ttl: t.Optional[float] = CONTAINER_CACHE_TTL,
+        timer: t.Callable[[], float] = time.monotonic,
+    ):
+        """Initializes a ContainerCache object.
+
+        Args:
+            maxsize: the maximum number of containers kept in the cache
+            ttl: the number of seconds a container is reused for
+            timer: returns the current time, in seconds
+        """
+        self._entries = LRUCache(maxsize, ttl=ttl, timer=timer)
+
+    def get_container(
+        self, level: str, container_id: str, fetch: t.Callable[[str], t.Any]
+    ) -> t.Any:
+        """Returns a container, fetching it on a miss.
+
+        Args:
+            level: the container level, e.g. "session"
+            container_id: the container id
+            fetch: called with the id to fetch a missing container
+
+        Returns:
+            the container
+
+        """
+        entry = self._entries.get_or_create(
+            (level, container_id), lambda: CachedContainer(fetch(container_id))
+        )
+        return entry.container
+
+    def get_filtered(
+        self,
+        level: str,
+        container_id: str,
+        container: t.Any,
+        filter_container: t.Callable[[t.Any], dict],
+    ) -> dict:
+        """Returns the filtered projection of a container, computing it once.
+
+        Args:
+            level: the container level, e.g. "session"
+            container_id: the container id
+            container: the container, cached if it is not already
+            filter_container: called with the container to compute its projection
+
+        Returns:
+            a copy of the filtered projection
+
+        """
+        # The container was just looked up with get_container, counting this
+        # lookup as well would report every fetch as a hit.
+        entry = self._entries.get_or_create(
+            (level, container_id), lambda: CachedContainer(container), count=False
+        )
+        if entry.filtered is None:
+            entry.filtered = filter_container(entry.container)
+        return dict(entry.filtered)
+
+    def cache_info(self) -> CacheInfo:
+        """Returns the get_container hit and miss counters and the cache size."""
+        return self._entries.cache_info()
+
+    def cache_clear(self) -> None:
+        """Removes every container and resets the counters."""
+        self._entries.cache_clear()
+
+
+# Compiled validators, keyed by validator class and schema hash.
+validator_cache = LRUCache(SCHEMA_CACHE_SIZE)
+
+# Flywheel parent containers, keyed by level and id.
+container_cache = ContainerCache(CONTAINER_CACHE_SIZE, CONTAINER_CACHE_TTL)
+
+
+def _package_version() -> t.Union[str, None]:
+    """Returns the installed version of the gear package, if known."""
+    import fw_gear_file_validator
+
+    return getattr(fw_gear_file_validator, "__version__", None)
+
+
+def artifact_path(
+    artifact_dir: t.Union[Path, str], validator_class: type, digest: str
+) -> Path:
+    """Returns the path of the compilation artifact of a schema.
+
+    Args:
+        artifact_dir: the directory holding the artifacts
+        validator_class: the class of the validator compiled from the schema
+        digest: the hash of the schema, as returned by schema_hash
+
+    Returns:
+        the path of the artifact file
+
+    """
+    return Path(artifact_dir) / f"{validator_class.__name__}-{digest}.json"
+
+
+def load_artifact(path: Path, digest: str) -> t.Union[dict, None]:
+    """Loads the validator state saved in a compilation artifact.
+
+    Artifacts written by another version of the package, or for another
+    schema, are ignored.
+
+    Args:
+        path: the artifact file
+        digest: the hash of the schema the artifact must have been built from
+
+    Returns:
+        the validator state, or None if there is no usable artifact
+
+    """
+    try:
+        with open(path, "r", encoding="UTF-8") as fp:
+            artifact = json.load(fp)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        log.warning("Ignoring unreadable schema artifact %s: %s", path, e)
+        return None
+
+    if (
+        not isinstance(artifact, dict)
+        or artifact.get("format_version") != ARTIFACT_VERSION
+        or artifact.get("package_version") != _package_version()
+        or artifact.get("schema_hash") != digest
+        or not isinstance(artifact.get("state"), dict)
+    ):
+        log.info("Ignoring stale schema artifact %s", path)
+        return None
+    log.debug("Loaded schema artifact %s", path)
+    return artifact["state"]
+
+
+def save_artifact(path: Path, digest: str, state: dict) -> None:
+    """Saves the validator state in a compilation artifact.
+
+    The file is written atomically, so concurrent processes never read a
+    partial artifact.  Failing to save the artifact is not an error.
+
+    Args:
+        path: the artifact file
+        digest: the hash of the schema the state was built from
+        state: the validator state, as returned by export_state
+
+    """
+    artifact = {
+        "format_version": ARTIFACT_VERSION,
+        "package_version": _package_version(),
+        "schema_hash": digest,
+        "state": state,
+    }
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="UTF-8") as fp:
+                json.dump(artifact, fp)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+    except (OSError, TypeError, ValueError) as e:
+        log.warning("Could not save schema artifact %s: %s", path, e)
+        return
+    log.debug("Saved schema artifact %s", path)
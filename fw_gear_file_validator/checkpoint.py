@@ -0,0 +1,305 @@
+"""checkpoint.py.
+
+Row-level incremental validation of append-only CSV files.
+
+After a CSV file is validated, a checkpoint records how far the file was
+validated (the byte offset and number of rows), hashes of its header and of
+everything up to that offset, the hash of the schema, and the errors found.
+When the file is validated again and still starts with the same bytes, only
+the rows appended since are validated, and their errors are merged with the
+stored ones, with their line numbers following on from the stored rows.
+"""
+
+import csv
+import dataclasses
+import hashlib
+import io
+import json
+import locale
+import logging
+import os
+import tempfile
+import typing as t
+from pathlib import Path
+
+from fw_gear_file_validator import errors as err
+from fw_gear_file_validator.cache import _package_version, schema_hash
+from fw_gear_file_validator.loader import CsvLoader
+from fw_gear_file_validator.parallel import find_row_boundaries, read_csv_rows
+from fw_gear_file_validator.validator import CsvValidator
+
+log = logging.getLogger(__name__)
+
+# Bumped whenever the content of the checkpoints changes.
+CHECKPOINT_VERSION = 1
+READ_SIZE = 1 << 20
+
+
+@dataclasses.dataclass
+class CsvCheckpoint:
+    """How far a csv file was validated, and what was found.
+
+    Attributes:
+        byte_offset: the end of the last validated row
+        row_count: the number of rows validated, header excluded
+        header_end: the end of the header
+        header_hash: the sha256 hash of the header bytes
+        prefix_hash: the sha256 hash of the bytes up to byte_offset
+        schema_hash: the hash of the schema, as returned by cache.schema_hash
+        options: what else changes the errors (error detail, package version)
+        errors: the errors of the validated rows, in the standard error format
+    """
+
+    byte_offset: int
+    row_count: int
+    header_end: int
+    header_hash: str
+    prefix_hash: str
+    schema_hash: str
+    options: t.Dict[str, t.Any]
+    errors: t.List[t.Dict] = dataclasses.field(default_factory=list)
+
+    def summary(self) -> t.Dict[str, t.Any]:
+        """Returns a summary of the checkpoint, for logging."""
+        return {
+            "row_count": self.row_count,
+            "byte_offset": self.byte_offset,
+            "error_count": len(self.errors),
+        }
+
+
+def checkpoint_options() -> t.Dict[str, t.Any]:
+    """Returns the settings, other than the schema, that change the errors."""
+    return {
+        "error_detail": err.ERROR_DETAIL,
+        "error_detail_length": err.ERROR_DETAIL_LENGTH,
+        "package_version": _package_version(),
+    }
+
+
+def checkpoint_path(checkpoint_dir: t.Union[Path, str], key: str) -> Path:
+    """Returns the path of the checkpoint of a file.
+
+    Args:
+        checkpoint_dir: the directory holding the checkpoints
+        key: identifies the file, e.g. its flywheel id
+
+    Returns:
+        the path of the checkpoint file
+
+    """
+    digest = hashlib.sha256(str(key).encode("UTF-8")).hexdigest()[:32]
+    return Path(checkpoint_dir) / f"{digest}.checkpoint.json"
+
+
+def load_checkpoint(path: Path) -> t.Union[CsvCheckpoint, None]:
+    """Loads a checkpoint, returning None if there is no usable one."""
+    try:
+        with open(path, "r", encoding="UTF-8") as fp:
+            content = json.load(fp)
+        if content.pop("format_version") != CHECKPOINT_VERSION:
+            log.info("Ignoring stale checkpoint %s", path)
+            return None
+        return CsvCheckpoint(**content)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError, TypeError, KeyError, AttributeError) as e:
+        log.warning("Ignoring unreadable checkpoint %s: %s", path, e)
+        return None
+
+
+def save_checkpoint(path: Path, checkpoint: CsvCheckpoint) -> None:
+    """Saves a checkpoint, atomically."""
+    content = {"format_version": CHECKPOINT_VERSION, **dataclasses.asdict(checkpoint)}
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="UTF-8") as fp:
+            json.dump(content, fp, default=str)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    log.debug("Saved checkpoint %s", path)
+
+
+def validate_csv_with_checkpoint(
+    file_path: Path,
+    csv_validator: CsvValidator,
+    checkpoint: CsvCheckpoint = None,
+    drop_empty: bool = True,
+) -> t.Tuple[bool, t.List[t.Dict], t.Union[CsvCheckpoint, None]]:
+    """Validates a csv file, only validating the rows appended since a checkpoint.
+
+    The checkpoint is used if the file still starts with the bytes it was
+    built from, and the schema and error settings are the same.  Otherwise
+    the whole file is validated.
+
+    Args:
+        file_path: the csv file to validate
+        csv_validator: the validator to use
+        checkpoint: the checkpoint of a previous validation, if any
+        drop_empty: if True, remove empty columns from each row before validating
+
+    Returns:
+        valid: True if no errors, False otherwise.
+        errors: Any errors generated during validation, the stored ones included.
+        checkpoint: the checkpoint to save for the next run, or None if the
+            file cannot be checkpointed (format errors, invalid header, or a
+            last row without a newline)
+
+    """
+    digest = schema_hash(csv_validator.validator.schema)
+    options = checkpoint_options()
+    if checkpoint is not None:
+        if checkpoint.schema_hash != digest or checkpoint.options != options:
+            log.info("Schema or settings changed, validating the whole file")
+        else:
+            result = _validate_appended_rows(
+                file_path, csv_validator, checkpoint, drop_empty
+            )
+            if result is not None:
+                return result
+    return _validate_whole_file(file_path, csv_validator, digest, options, drop_empty)
+
+
+def validate_csv_in_checkpoint_dir(
+    checkpoint_dir: t.Union[Path, str],
+    key: str,
+    file_path: Path,
+    csv_validator: CsvValidator,
+) -> t.Tuple[bool, t.List[t.Dict]]:
+    """Validates a csv file with the checkpoint saved under a key, and saves the new one.
+
+    Args:
+        checkpoint_dir: the directory holding the checkpoints
+        key: what identifies the file across runs, e.g. its flywheel id
+        file_path: the csv file to validate
+        csv_validator: the validator to use
+
+    Returns:
+        valid: True if no errors, False otherwise.
+        errors: Any errors generated during validation, the stored ones included.
+
+    """
+    path = checkpoint_path(checkpoint_dir, key)
+    valid, errors, new_checkpoint = validate_csv_with_checkpoint(
+        file_path, csv_validator, load_checkpoint(path)
+    )
+    if new_checkpoint is not None:
+        save_checkpoint(path, new_checkpoint)
+    return valid, errors
+
+
+def _validate_appended_rows(
+    file_path: Path,
+    csv_validator: CsvValidator,
+    checkpoint: CsvCheckpoint,
+    drop_empty: bool,
+) -> t.Union[t.Tuple[bool, t.List[t.Dict], t.Union[CsvCheckpoint, None]], None]:
+    """Validates the rows after the checkpoint, None if the checkpoint does not apply."""
+    if os.path.getsize(file_path) < checkpoint.byte_offset:
+        log.info("File is shorter than its checkpoint, validating the whole file")
+        return None
+
+    with open(file_path, "rb") as fp:
+        header = fp.read(checkpoint.header_end)
+        if hashlib.sha256(header).hexdigest() != checkpoint.header_hash:
+            log.info("Header changed, validating the whole file")
+            return None
+        prefix_hash = hashlib.sha256(header)
+        remaining = checkpoint.byte_offset - checkpoint.header_end
+        while remaining > 0:
+            chunk = fp.read(min(READ_SIZE, remaining))
+            if not chunk:
+                break
+            prefix_hash.update(chunk)
+            remaining -= len(chunk)
+        if prefix_hash.hexdigest() != checkpoint.prefix_hash:
+            log.info("File changed before its checkpoint, validating the whole file")
+            return None
+        appended = fp.read()
+
+    log.info(
+        "Validating %s bytes appended after checkpoint %s",
+        len(appended),
+        checkpoint.summary(),
+    )
+    encoding = locale.getpreferredencoding(False)
+    header_row = next(csv.reader(io.StringIO(header.decode(encoding), newline="")))
+    rows, parsed = read_csv_rows(
+        file_path,
+        checkpoint.byte_offset,
+        checkpoint.byte_offset + len(appended),
+        header_row,
+        encoding,
+        appended,
+    )
+    if not parsed:
+        # Reported with the format errors found by the whole file validation.
+        return None
+
+    new_errors = list(csv_validator.iter_row_errors(rows, drop_empty=drop_empty))
+    for error in new_errors:
+        if isinstance(error["location"], dict) and "line" in error["location"]:
+            error["location"]["line"] += checkpoint.row_count
+    errors = [*checkpoint.errors, *new_errors]
+
+    new_checkpoint = None
+    if not appended or appended.endswith(b"\n"):
+        prefix_hash.update(appended)
+        new_checkpoint = dataclasses.replace(
+            checkpoint,
+            byte_offset=checkpoint.byte_offset + len(appended),
+            row_count=checkpoint.row_count + len(rows),
+            prefix_hash=prefix_hash.hexdigest(),
+            errors=errors,
+        )
+    return not errors, errors, new_checkpoint
+
+
+def _validate_whole_file(
+    file_path: Path,
+    csv_validator: CsvValidator,
+    digest: str,
+    options: t.Dict[str, t.Any],
+    drop_empty: bool,
+) -> t.Tuple[bool, t.List[t.Dict], t.Union[CsvCheckpoint, None]]:
+    """Validates every row of the file, and builds its checkpoint."""
+    with CsvLoader.stream_object(file_path) as stream:
+        valid, errors = csv_validator.validate(stream, drop_empty=drop_empty)
+    if stream.errors:
+        return False, stream.errors, None
+    if not stream.row_count:
+        # A file without rows is reported as empty, which appending rows changes.
+        return valid, errors, None
+    header_valid, _ = csv_validator.validate_header([dict.fromkeys(stream.header)])
+    if not header_valid:
+        return valid, errors, None
+
+    boundaries = find_row_boundaries(file_path, lambda header_end: iter(()))
+    prefix_hash = hashlib.sha256()
+    byte_offset = 0
+    last = b""
+    with open(file_path, "rb") as fp:
+        header_hash = hashlib.sha256(fp.read(boundaries[0])).hexdigest()
+        fp.seek(0)
+        while chunk := fp.read(READ_SIZE):
+            prefix_hash.update(chunk)
+            byte_offset += len(chunk)
+            last = chunk
+    if not last.endswith(b"\n"):
+        log.info("Last row of %s has no newline, no checkpoint saved", file_path)
+        return valid, errors, None
+
+    checkpoint = CsvCheckpoint(
+        byte_offset=byte_offset,
+        row_count=stream.row_count,
+        header_end=boundaries[0],
+        header_hash=header_hash,
+        prefix_hash=prefix_hash.hexdigest(),
+        schema_hash=digest,
+        options=options,
+        errors=errors,
+    )
+    return valid, errors, checkpoint
@@ -0,0 +1,480 @@
+"""cli.py.
+
+Validates local files from the command line, without a Flywheel context.
+
+    python -m fw_gear_file_validator validate --schema schema.json 'data/**/*.csv'
+
+Paths may be files, directories (every supported file inside them is
+validated) or glob patterns, quoted so that `**` is expanded here rather than
+by the shell.  The schema is compiled once per process, and files are
+validated on several processes with `--workers`.  A report line is written
+per file as soon as it is validated, in text or NDJSON, or a single JSON
+document is written at the end.
+
+The exit status is 0 if every file is valid, 1 if any file is invalid, and 2
+if any file could not be validated (unsupported type, unreadable file) or the
+command itself failed (bad arguments, invalid schema).
+
+The `serve` command starts a local validation service instead, see
+`service.py`.
+"""
+
+import argparse
+import concurrent.futures
+import glob
+import json
+import logging
+import os
+import sys
+import time
+import typing as t
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from fw_gear_file_validator import errors as err
+from fw_gear_file_validator import jsonio, validator
+from fw_gear_file_validator.limits import ErrorLimits
+from fw_gear_file_validator.loader import Loader
+from fw_gear_file_validator.parser import SUPPORTED_FILE_EXTENSIONS
+
+log = logging.getLogger(__name__)
+
+EXIT_VALID = 0
+EXIT_INVALID = 1
+EXIT_ERROR = 2
+OUTPUT_FORMATS = ("text", "json", "ndjson")
+# Errors printed per file in the text output, the others are counted.
+TEXT_MAX_ERRORS = 20
+
+
+@dataclass
+class FileResult:
+    """The outcome of validating one local file.
+
+    Attributes:
+        path: the path of the file
+        file_type: the type of the file, None if it is not supported
+        valid: True if the file is valid, False if it is not, None if it
+            could not be validated
+        errors: the errors found, in the standard error format
+        size: the size of the file in bytes
+        seconds: the time spent loading and validating the file
+        records: the number of csv rows or JSON records validated, if known
+        failure: why the file could not be validated, if it could not
+        summary: what the error limits left out of the errors, if any
+    """
+
+    path: str
+    file_type: t.Optional[str] = None
+    valid: t.Optional[bool] = None
+    errors: t.List[t.Dict] = field(default_factory=list)
+    size: int = 0
+    seconds: float = 0.0
+    records: t.Optional[int] = None
+    failure: t.Optional[str] = None
+    summary: t.Optional[t.Dict[str, t.Any]] = None
+
+    @property
+    def state(self) -> str:
+        """PASS, FAIL, or ERROR if the file could not be validated."""
+        if self.valid is None:
+            return "ERROR"
+        return "PASS" if self.valid else "FAIL"
+
+    def throughput(self) -> t.Dict[str, t.Optional[float]]:
+        """Returns the MB and records validated per second."""
+        if not self.seconds:
+            return {"mb_per_sec": None, "records_per_sec": None}
+        records = self.records
+        return {
+            "mb_per_sec": round(self.size / 1e6 / self.seconds, 3),
+            "records_per_sec": (
+                None if records is None else round(records / self.seconds, 1)
+            ),
+        }
+
+    def to_dict(self) -> t.Dict[str, t.Any]:
+        """Returns the result as a JSON serializable dict."""
+        result = {
+            "file": self.path,
+            "file_type": self.file_type,
+            "state": self.state,
+            "error_count": len(self.errors),
+            "errors": self.errors,
+            "bytes": self.size,
+            "records": self.records,
+            "seconds": round(self.seconds, 6),
+            **self.throughput(),
+        }
+        if self.failure:
+            result["failure"] = self.failure
+        if self.summary:
+            result["summary"] = self.summary
+        return result
+
+
+def expand_paths(patterns: t.Iterable[str]) -> t.List[Path]:
+    """Returns the files matched by paths, directories and glob patterns.
+
+    Directories are searched recursively for files of a supported type, glob
+    patterns are expanded with `**` matching any number of directories.  Paths
+    that match nothing are kept, so that they are reported as missing.
+    Duplicates are removed, keeping the first occurrence.
+
+    Args:
+        patterns: the paths, directories and glob patterns
+
+    Returns:
+        the files, in the order they were given, sorted within each pattern
+
+    """
+    paths = []
+    for pattern in patterns:
+        path = Path(pattern)
+        if glob.has_magic(pattern):
+            paths.extend(
+                Path(p)
+                for p in sorted(glob.glob(pattern, recursive=True))
+                if Path(p).is_file()
+            )
+        elif path.is_dir():
+            paths.extend(
+                p
+                for p in sorted(path.rglob("*"))
+                if p.is_file() and p.suffix.lower() in SUPPORTED_FILE_EXTENSIONS
+            )
+        else:
+            paths.append(path)
+    return list(dict.fromkeys(paths))
+
+
+def validate_file(
+    path: Path,
+    schema: dict,
+    file_type: str = None,
+    limits: ErrorLimits = None,
+    report_mode: str = "errors",
+    engine: str = "row",
+    encoding: str = None,
+) -> FileResult:
+    """Loads and validates a single local file.
+
+    Args:
+        path: the file to validate
+        schema: the validation JSON schema
+        file_type: the type of the file, guessed from its extension by default
+        limits: limits on the errors collected, if any
+        report_mode: "errors" to report every error, "aggregate" to group them
+        engine: how csv files are validated, "row" or "columnar"
+        encoding: the encoding of csv files, the locale encoding by default
+
+    Returns:
+        the result of the validation
+
+    """
+    path = Path(path)
+    file_type = file_type or SUPPORTED_FILE_EXTENSIONS.get(path.suffix.lower())
+    result = FileResult(str(path), file_type)
+    if not file_type:
+        result.failure = f"file type {path.suffix or path.name} is not supported"
+        return result
+
+    start = time.perf_counter()
+    try:
+        result.size = path.stat().st_size
+        loader = Loader.factory(file_type, config={"encoding": encoding})
+        d, errors = loader.open_object(path)
+        summary = None
+        if not errors:
+            schema_validator = validator.initialize_validator(
+                file_type, schema, engine=engine
+            )
+            _, errors, summary = validator.validate_object(
+                schema_validator, d, path, limits=limits
+            )
+            result.records = getattr(d, "row_count", None)
+            if result.records is None:
+                result.records = getattr(d, "record_count", None)
+        result.errors = list(err.make_report(errors, report_mode))
+        result.valid = not result.errors
+        if summary is not None:
+            result.summary = summary.to_qc_data()
+    except (ValueError, OSError) as e:
+        result.failure = str(e)
+    result.seconds = time.perf_counter() - start
+    return result
+
+
+def _init_worker(error_detail: str, json_backend: str) -> None:
+    """Applies the error settings in a worker process."""
+    err.set_error_detail(error_detail)
+    jsonio.set_json_backend(json_backend)
+
+
+def validate_files(
+    paths: t.List[Path],
+    schema: dict,
+    workers: int = 1,
+    **kwargs: t.Any,
+) -> t.Iterator[FileResult]:
+    """Validates local files, on several processes if asked to.
+
+    Each process compiles the schema once and reuses it for all its files.
+
+    Args:
+        paths: the files to validate
+        schema: the validation JSON schema
+        workers: the number of processes, 0 for one per CPU
+        **kwargs: passed on to validate_file
+
+    Yields:
+        the result of every file, in the order of the paths
+
+    """
+    workers = min(workers or os.cpu_count() or 1, max(len(paths), 1))
+    if workers == 1:
+        for path in paths:
+            yield validate_file(path, schema, **kwargs)
+        return
+
+    log.info("Validating %s files on %s workers", len(paths), workers)
+    with concurrent.futures.ProcessPoolExecutor(
+        max_workers=workers,
+        initializer=_init_worker,
+        initargs=(err.ERROR_DETAIL, jsonio.JSON_BACKEND),
+    ) as executor:
+        futures = [
+            executor.submit(validate_file, path, schema, **kwargs) for path in paths
+        ]
+        try:
+            for future in futures:
+                yield future.result()
+        finally:
+            executor.shutdown(cancel_futures=True)
+
+
+def format_text(result: FileResult) -> str:
+    """Returns the text report of a file, a status line followed by its errors."""
+    rate = result.throughput()["mb_per_sec"]
+    line = (
+        f"{result.state} {result.path}: {len(result.errors)} errors, "
+        f"{result.size / 1e6:.2f} MB in {result.seconds:.3f} s"
+    )
+    if rate is not None:
+        line += f" ({rate:.1f} MB/s)"
+    lines = [line]
+    if result.failure:
+        lines.append(f"    {result.failure}")
+    for error in result.errors[:TEXT_MAX_ERRORS]:
+        location = error.get("location") or ""
+        if isinstance(location, dict):
+            location = ", ".join(f"{k}={v}" for k, v in location.items())
+        lines.append(f"    [{error.get('code')}] {location}: {error.get('message')}")
+    if len(result.errors) > TEXT_MAX_ERRORS:
+        lines.append(f"    ... {len(result.errors) - TEXT_MAX_ERRORS} more errors")
+    return "\n".join(lines)
+
+
+def build_parser() -> argparse.ArgumentParser:
+    """Returns the parser of the command line arguments."""
+    parser = argparse.ArgumentParser(
+        prog="python -m fw_gear_file_validator",
+        description="Validates files against a JSON schema.",
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    validate = subparsers.add_parser(
+        "validate",
+        help="validate local files",
+        description="Validates local files against a JSON schema.",
+    )
+    validate.add_argument(
+        "paths", nargs="+", help="files, directories or glob patterns to validate"
+    )
+    validate.add_argument("--schema", required=True, help="the JSON schema file")
+    validate.add_argument(
+        "--file-type",
+        choices=sorted(set(SUPPORTED_FILE_EXTENSIONS.values())),
+        help="the type of every file, guessed from their extension by default",
+    )
+    validate.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="number of processes validating files, 0 for one per CPU",
+    )
+    validate.add_argument(
+        "--format",
+        choices=OUTPUT_FORMATS,
+        default="text",
+        help="report format: a text or NDJSON line per file, or one JSON document",
+    )
+    validate.add_argument(
+        "--output", help="write the report to this file instead of stdout"
+    )
+    validate.add_argument("--report-mode", choices=err.REPORT_MODES, default="errors")
+    validate.add_argument(
+        "--error-detail", choices=err.ERROR_DETAIL_MODES, default="full"
+    )
+    validate.add_argument(
+        "--json-backend", choices=jsonio.JSON_BACKENDS, default="auto"
+    )
+    validate.add_argument(
+        "--engine",
+        choices=validator.CSV_ENGINES,
+        default="row",
+        help="validate csv files one row or one column at a time (requires numpy)",
+    )
+    validate.add_argument(
+        "--max-errors", type=int, default=0, help="errors reported per file, 0 for all"
+    )
+    validate.add_argument(
+        "--fail-fast", action="store_true", help="stop at the first error of a file"
+    )
+    validate.add_argument(
+        "-v", "--verbose", action="store_true", help="log progress to stderr"
+    )
+
+    serve = subparsers.add_parser(
+        "serve",
+        help="run a local validation service",
+        description="Validates files sent to a local HTTP endpoint on warm workers.",
+    )
+    serve.add_argument(
+        "--schema",
+        action="append",
+        default=[],
+        metavar="[NAME=]PATH",
+        help="a JSON schema compiled at start up, named after its file by default",
+    )
+    serve.add_argument("--host", default="127.0.0.1")
+    serve.add_argument(
+        "--allow-remote",
+        action="store_true",
+        help="allow a --host other hosts can reach, requests can read any local file",
+    )
+    serve.add_argument("--port", type=int, default=8080)
+    serve.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="number of processes validating files, 0 for one per CPU",
+    )
+    serve.add_argument(
+        "--max-queue",
+        type=int,
+        default=32,
+        help="requests waiting for a worker before new ones are rejected",
+    )
+    serve.add_argument("--error-detail", choices=err.ERROR_DETAIL_MODES, default="full")
+    serve.add_argument("--json-backend", choices=jsonio.JSON_BACKENDS, default="auto")
+    serve.add_argument(
+        "-v", "--verbose", action="store_true", help="log requests to stderr"
+    )
+    return parser
+
+
+def run_validate(args: argparse.Namespace, out: t.TextIO) -> int:
+    """Runs the validate command, returns the exit status."""
+    err.set_error_detail(args.error_detail)
+    jsonio.set_json_backend(args.json_backend)
+    limits = ErrorLimits(max_errors=args.max_errors, fail_fast=args.fail_fast)
+    schema, schema_errors = Loader.load_schema(Path(args.schema))
+    if schema_errors:
+        log.error("Invalid schema file %s", args.schema)
+        return EXIT_ERROR
+
+    # The schema is not validated against itself when it is in a directory given.
+    schema_path = Path(args.schema).resolve()
+    paths = [path for path in expand_paths(args.paths) if path.resolve() != schema_path]
+    if not paths:
+        log.error("No files matched %s", " ".join(args.paths))
+        return EXIT_ERROR
+
+    start = time.perf_counter()
+    counts = {"PASS": 0, "FAIL": 0, "ERROR": 0}
+    results = []
+    for result in validate_files(
+        paths,
+        schema,
+        workers=args.workers,
+        file_type=args.file_type,
+        limits=limits if limits.active else None,
+        report_mode=args.report_mode,
+        engine=args.engine,
+    ):
+        counts[result.state] += 1
+        if args.format == "json":
+            results.append(result.to_dict())
+        elif args.format == "ndjson":
+            out.write(json.dumps(result.to_dict(), default=str) + "\n")
+        else:
+            out.write(format_text(result) + "\n")
+        out.flush()
+
+    summary = {
+        "files": len(paths),
+        "valid": counts["PASS"],
+        "invalid": counts["FAIL"],
+        "failed": counts["ERROR"],
+        "seconds": round(time.perf_counter() - start, 6),
+    }
+    if args.format == "json":
+        json.dump({"files": results, "summary": summary}, out, default=str)
+        out.write("\n")
+    elif args.format == "text":
+        out.write(
+            f"{summary['files']} files: {summary['valid']} valid, "
+            f"{summary['invalid']} invalid, {summary['failed']} not validated "
+            f"in {summary['seconds']:.3f} s\n"
+        )
+
+    if counts["ERROR"]:
+        return EXIT_ERROR
+    return EXIT_INVALID if counts["FAIL"] else EXIT_VALID
+
+
+def run_serve(args: argparse.Namespace) -> int:  # pragma: no cover
+    """Runs the serve command until interrupted, returns the exit status."""
+    from fw_gear_file_validator import service
+
+    err.set_error_detail(args.error_detail)
+    jsonio.set_json_backend(args.json_backend)
+    schemas = {}
+    for spec in args.schema:
+        name, _, path = spec.rpartition("=")
+        path = Path(path)
+        schema, schema_errors = Loader.load_schema(path)
+        if schema_errors:
+            log.error("Invalid schema file %s", path)
+            return EXIT_ERROR
+        schemas[name or path.stem] = schema
+
+    service.serve(
+        service.ValidationService(
+            schemas, workers=args.workers, max_queue=args.max_queue
+        ),
+        host=args.host,
+        port=args.port,
+        allow_remote=args.allow_remote,
+    )
+    return EXIT_VALID
+
+
+def main(argv: t.List[str] = None) -> int:
+    """Runs the command line interface, returns the exit status."""
+    args = build_parser().parse_args(argv)
+    logging.basicConfig(
+        level=logging.INFO if args.verbose else logging.WARNING,
+        format="%(levelname)s %(name)s: %(message)s",
+        stream=sys.stderr,
+    )
+    try:
+        if args.command == "serve":
+            return run_serve(args)
+        if args.output:
+            with open(args.output, "w", encoding="UTF-8") as out:
+                return run_validate(args, out)
+        return run_validate(args, sys.stdout)
+    except (ValueError, OSError, ImportError) as e:
+        log.error("%s", e)
+        return EXIT_ERROR
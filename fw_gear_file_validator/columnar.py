@@ -0,0 +1,311 @@
+"""columnar.py.
+
+A columnar, vectorized validation engine for flat CSV schemas.
+
+Flat schemas check the same constraint on every row, so instead of validating
+one row at a time the rows are gathered in chunks, split into per-column
+arrays, and every constraint is evaluated on a whole column with NumPy.  The
+array operations only flag the cells that may fail; those cells are then
+checked with the compiled checks of the flat schema, which build the actual
+errors.  The error report is therefore identical to the one `CsvValidator`
+produces, and only failing cells ever get an error object.
+
+NumPy is an optional dependency, installed with the `columnar` extra.
+"""
+
+import itertools
+import re
+import typing as t
+from pathlib import Path
+
+from fw_gear_file_validator import utils
+from fw_gear_file_validator.compiler import TYPE_CHECKS
+from fw_gear_file_validator.validator import CsvValidator
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover
+    np = None
+
+CHUNK_SIZE = 50_000
+
+# A value of each python type the csv cells can be cast to, used to find out if
+# a type keyword accepts every successfully cast cell of a column.
+TYPE_SAMPLES = {str: "", int: 0, float: 0.5, bool: True}
+
+_MISSING = object()
+
+
+class ColumnarCsvValidator(CsvValidator):
+    """CSV Validator that checks flat schemas one column at a time.
+
+    Schemas that cannot be compiled into a flat schema are validated one row
+    at a time, exactly like `CsvValidator`.
+    """
+
+    def __init__(
+        self,
+        schema: t.Union[dict, Path, str],
+        state: dict = None,
+        chunk_size: int = CHUNK_SIZE,
+    ):
+        """Initializes a ColumnarCsvValidator object.
+
+        Args:
+            schema: the validation JSON schema
+            state: precomputed state previously returned by export_state
+            chunk_size: the number of rows validated together
+        """
+        if np is None:
+            raise ImportError(
+                "The columnar csv engine requires numpy, "
+                "install fw_gear_file_validator[columnar]"
+            )
+        super().__init__(schema, state=state)
+        self.chunk_size = chunk_size
+
+    def iter_row_errors(
+        self,
+        csv_dicts: t.Iterable[t.Dict],
+        drop_empty: bool = True,
+        sample: t.Callable[[int], bool] = None,
+    ) -> t.Iterator[t.Dict]:
+        """Validates csv rows against the schema, one chunk of rows at a time.
+
+        Sampled rows are validated one at a time, like `CsvValidator` does.
+
+        Args:
+            csv_dicts: the rows to validate, each a dictionary keyed by the csv header
+            drop_empty: if True, empty cells are treated as missing
+            sample: called with each row number, only the rows it returns True
+                for are validated
+
+        Yields:
+            the errors generated during validation, in the standard error format
+
+        """
+        if self.flat_schema is None or sample is not None:
+            yield from super().iter_row_errors(
+                csv_dicts, drop_empty=drop_empty, sample=sample
+            )
+            return
+
+        column_types = self.get_column_dtypes()
+        rows = iter(csv_dicts)
+        row_offset = 0
+        while True:
+            chunk = list(itertools.islice(rows, self.chunk_size))
+            if not chunk:
+                return
+            yield from self.process_chunk(row_offset, chunk, column_types, drop_empty)
+            row_offset += len(chunk)
+
+    def process_chunk(
+        self,
+        row_offset: int,
+        chunk: t.List[t.Dict],
+        column_types: t.Dict[str, type],
+        drop_empty: bool = True,
+    ) -> t.Iterator[t.Dict]:
+        """Validates a chunk of rows column by column.
+
+        Args:
+            row_offset: the row number of the first row of the chunk
+            chunk: the rows to validate
+            column_types: the python type of each column, as returned by get_column_dtypes
+            drop_empty: if True, empty cells are treated as missing
+
+        Yields:
+            the errors of the chunk, in the standard error format and row order
+
+        """
+        flat_schema = self.flat_schema
+        # Each failure is (row, column position, check position, error), so that
+        # sorting them gives the order the row-based validator reports them in.
+        failures = []
+        cells = {}
+        present = {}
+        for column in {*flat_schema.required, *(c for c, _ in flat_schema.columns)}:
+            cells[column] = [row.get(column, _MISSING) for row in chunk]
+            present[column] = np.fromiter(
+                (
+                    cell is not _MISSING and (not drop_empty or bool(cell))
+                    for cell in cells[column]
+                ),
+                dtype=bool,
+                count=len(chunk),
+            )
+
+        for position, column in enumerate(flat_schema.required):
+            for row in np.flatnonzero(~present[column]):
+                error = flat_schema.required_error(column, chunk[row])
+                failures.append((row, -1, position, error))
+
+        for position, (column, checks) in enumerate(flat_schema.columns):
+            rows = np.flatnonzero(present[column])
+            if not checks or not rows.size:
+                continue
+            raw = np.empty(rows.size, dtype=object)
+            raw[:] = [cells[column][row] for row in rows]
+            cast_type = column_types.get(column, str)
+            column_failures = self.process_column(raw, cast_type, checks)
+            for index, check_position, error in column_failures:
+                failures.append((rows[index], position, check_position, error))
+
+        failures.sort(key=lambda failure: failure[:3])
+        for row, row_failures in itertools.groupby(failures, key=lambda f: f[0]):
+            errors = self.handle_errors([failure[3] for failure in row_failures])
+            self.add_csv_location_spec(row_offset + int(row), errors)
+            yield from errors
+
+    def process_column(
+        self, raw: "np.ndarray", cast_type: type, checks: list
+    ) -> t.List[t.Tuple[int, int, t.Any]]:
+        """Evaluates the checks of a column on all of its present cells.
+
+        Args:
+            raw: the cell values, as read from the csv
+            cast_type: the python type the column is cast to
+            checks: the compiled checks of the column
+
+        Returns:
+            (cell index, check position, error) for every failing cell
+
+        """
+        ok, values = self.cast_column(raw, cast_type)
+        cast_cache = {}
+        failures = []
+        for check_position, check in enumerate(checks):
+            candidates = self.candidate_mask(check, raw, cast_type, ok, values)
+            for index in np.flatnonzero(candidates):
+                if index not in cast_cache:
+                    cast_cache[index] = utils.cast_csv_val(raw[index], cast_type)
+                error = check(cast_cache[index])
+                if error is not None:
+                    failures.append((index, check_position, error))
+        return failures
+
+    @staticmethod
+    def cast_column(
+        raw: "np.ndarray", cast_type: type
+    ) -> t.Tuple["np.ndarray", t.Union["np.ndarray", None]]:
+        """Casts a column to its schema type in bulk.
+
+        Casting follows `utils.cast_csv_val`: cells that cannot be cast keep
+        their original value.
+
+        Args:
+            raw: the cell values, as read from the csv
+            cast_type: the python type the column is cast to
+
+        Returns:
+            a mask of the cells that were cast to `cast_type`, and for numeric
+            columns the cast values (undefined where the mask is False)
+
+        """
+        if cast_type is str:
+            ok = np.fromiter(
+                (isinstance(cell, str) for cell in raw), dtype=bool, count=raw.size
+            )
+            return ok, None
+        if cast_type is bool:
+            return np.ones(raw.size, dtype=bool), None
+        if cast_type not in (int, float):
+            return np.zeros(raw.size, dtype=bool), None
+
+        dtype = np.int64 if cast_type is int else np.float64
+        try:
+            return np.ones(raw.size, dtype=bool), raw.astype(dtype)
+        except (ValueError, OverflowError):
+            pass
+
+        # Some cells cannot be cast (or do not fit in the array dtype): find
+        # them one at a time.
+        ok = np.zeros(raw.size, dtype=bool)
+        values = np.zeros(raw.size, dtype=dtype)
+        info = np.iinfo(dtype) if cast_type is int else None
+        for index, cell in enumerate(raw):
+            value = utils.cast_csv_val(cell, cast_type)
+            if not isinstance(value, cast_type) or isinstance(value, bool):
+                continue
+            if info is not None and not info.min <= value <= info.max:
+                continue
+            ok[index] = True
+            values[index] = value
+        return ok, values
+
+    @staticmethod
+    def candidate_mask(
+        check, raw: "np.ndarray", cast_type: type, ok: "np.ndarray", values
+    ) -> "np.ndarray":
+        """Flags the cells of a column that may fail a check.
+
+        The mask may contain false positives, which the check itself rules
+        out, but never misses a failing cell.  Cells that could not be cast
+        are always flagged.
+
+        Args:
+            check: the compiled check, with its `keyword` and `value`
+            raw: the cell values, as read from the csv
+            cast_type: the python type the column is cast to
+            ok: mask of the cells cast to `cast_type`
+            values: the cast values of numeric columns
+
+        Returns:
+            a boolean mask over the cells of the column
+
+        """
+        keyword, value = check.keyword, check.value
+        failed = ~ok
+        if not ok.any():
+            return failed
+        numeric = values is not None
+
+        if keyword == "type":
+            types = [value] if isinstance(value, str) else value
+            sample = TYPE_SAMPLES.get(cast_type)
+            if sample is not None and any(TYPE_CHECKS[typ](sample) for typ in types):
+                return failed
+            return np.ones(raw.size, dtype=bool)
+
+        if keyword == "enum":
+            members = list(value)
+            if cast_type is str and all(isinstance(m, str) for m in members):
+                # Compared as python strings: a numpy string array would drop
+                # trailing NULs, so "a\x00" would match "a".
+                member_set = set(members)
+                strs = np.where(ok, raw, "")
+                return failed | np.fromiter(
+                    (cell not in member_set for cell in strs),
+                    dtype=bool,
+                    count=raw.size,
+                )
+            if numeric and not any(isinstance(m, str) for m in members):
+                return failed | ~np.isin(values, members)
+            return np.ones(raw.size, dtype=bool)
+
+        if keyword in ("minimum", "maximum"):
+            if not numeric:
+                return failed
+            if keyword == "minimum":
+                return failed | (values < value)
+            return failed | (values > value)
+
+        if cast_type is not str:
+            return failed
+
+        # Only cells that are strings can fail the string keywords.
+        strs = np.where(ok, raw, "")
+        if keyword == "pattern":
+            search = re.compile(value).search
+            return failed | np.fromiter(
+                (search(cell) is None for cell in strs), dtype=bool, count=raw.size
+            )
+
+        if keyword in ("maxLength", "minLength"):
+            lengths = np.fromiter(map(len, strs), dtype=np.int64, count=raw.size)
+            if keyword == "maxLength":
+                return failed | (lengths > value)
+            return failed | (lengths < value)
+
+        return np.ones(raw.size, dtype=bool)
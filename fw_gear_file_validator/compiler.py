@@ -0,0 +1,326 @@
+"""compiler.py.
+
+Compiles flat JSON schemas into per-column check functions.
+
+Most CSV schemas are flat: a `properties` object whose columns only use a
+handful of simple keywords.  For those schemas the generic recursive keyword
+dispatch of jsonschema is unnecessary, so each column is turned into a list of
+precompiled checks (regexes, enum sets and numeric bounds) instead.  The
+checks produce the same `ValidationError` objects as `Draft7Validator`, in the
+same order, so the standard error output is unchanged.
+"""
+
+import numbers
+import re
+import typing as t
+from collections import deque
+
+import jsonschema
+from jsonschema.exceptions import ValidationError
+
+# Keywords that do not validate anything (or that the header check already
+# covers) and can safely be ignored at the top level of a flat schema.
+TOP_LEVEL_IGNORED = {"$schema", "$id", "definitions"}
+
+# Keywords supported for each column of a flat schema.
+COLUMN_KEYWORDS = {
+    "type",
+    "enum",
+    "pattern",
+    "minimum",
+    "maximum",
+    "maxLength",
+    "minLength",
+}
+
+Check = t.Callable[[t.Any], t.Union[ValidationError, None]]
+
+
+def _is_number(instance: t.Any) -> bool:
+    return isinstance(instance, numbers.Number) and not isinstance(instance, bool)
+
+
+def _is_integer(instance: t.Any) -> bool:
+    if isinstance(instance, bool):
+        return False
+    if isinstance(instance, float):
+        return instance.is_integer()
+    return isinstance(instance, int)
+
+
+# Mirrors the Draft 7 type checker.
+TYPE_CHECKS = {
+    "string": lambda instance: isinstance(instance, str),
+    "number": _is_number,
+    "integer": _is_integer,
+    "boolean": lambda instance: isinstance(instance, bool),
+    "null": lambda instance: instance is None,
+    "array": lambda instance: isinstance(instance, list),
+    "object": lambda instance: isinstance(instance, dict),
+}
+
+
+class FlatSchema:
+    """A flat JSON schema compiled into per-column checks.
+
+    Attributes:
+        schema: the top level schema
+        required: the columns listed under `required`
+        columns: (column name, checks) pairs, ordered by column name
+    """
+
+    def __init__(
+        self,
+        schema: dict,
+        required: t.List[str],
+        columns: t.List[t.Tuple[str, t.List[Check]]],
+    ):
+        """Initializes a FlatSchema object."""
+        self.schema = schema
+        self.required = required
+        self.columns = columns
+
+    def iter_errors(self, instance: dict) -> t.Iterator[ValidationError]:
+        """Yields the errors Draft7Validator would report for a flat instance.
+
+        Errors are yielded in the order `JsonValidator.handle_errors` sorts
+        them: missing required columns first, then column errors ordered by
+        column name and keyword.
+        """
+        for column in self.required:
+            if column not in instance:
+                yield self.required_error(column, instance)
+        for column, checks in self.columns:
+            if column not in instance:
+                continue
+            value = instance[column]
+            for check in checks:
+                error = check(value)
+                if error is not None:
+                    yield error
+
+    def required_error(self, column: str, instance: dict) -> ValidationError:
+        """Returns the error for a required column missing from an instance."""
+        return ValidationError(
+            f"{column!r} is a required property",
+            validator="required",
+            validator_value=self.required,
+            instance=instance,
+            schema=self.schema,
+            schema_path=["required"],
+        )
+
+
+def compile_flat_schema(
+    schema: dict, properties: t.Dict[str, t.Any]
+) -> t.Union[FlatSchema, None]:
+    """Compiles a flat schema, if possible.
+
+    Args:
+        schema: the top level JSON schema
+        properties: the column subschemas, with any `$ref` already resolved
+
+    Returns:
+        a FlatSchema, or None if the schema uses keywords that are not
+        supported, in which case jsonschema should be used instead.
+
+    """
+    if not isinstance(schema, dict) or not isinstance(schema.get("properties"), dict):
+        return None
+    for keyword, value in schema.items():
+        if keyword not in jsonschema.Draft7Validator.VALIDATORS:
+            continue
+        if keyword in TOP_LEVEL_IGNORED or keyword == "properties":
+            continue
+        if keyword == "type" and "object" in _ensure_list(value):
+            continue
+        if keyword == "required" and _is_list_of(value, str):
+            continue
+        return None
+
+    columns = []
+    for column, subschema in sorted(properties.items()):
+        checks = _compile_column(column, subschema)
+        if checks is None:
+            return None
+        columns.append((column, checks))
+
+    return FlatSchema(schema, list(schema.get("required", [])), columns)
+
+
+def _compile_column(column: str, subschema: t.Any) -> t.Union[t.List[Check], None]:
+    """Compiles the checks of a single column, in schema keyword order."""
+    if not isinstance(subschema, dict):
+        return None
+    checks = []
+    for keyword, value in subschema.items():
+        if keyword not in jsonschema.Draft7Validator.VALIDATORS:
+            continue
+        if keyword not in COLUMN_KEYWORDS:
+            return None
+        check = KEYWORD_COMPILERS[keyword](value)
+        if check is None:
+            return None
+        checks.append(_wrap_check(column, subschema, keyword, value, check))
+    return checks
+
+
+def _wrap_check(
+    column: str,
+    subschema: dict,
+    keyword: str,
+    value: t.Any,
+    check: t.Callable[[t.Any], t.Union[str, None]],
+) -> Check:
+    """Wraps a check returning a message into one returning a ValidationError.
+
+    The keyword and its value are kept on the returned function, so that other
+    engines can evaluate the same constraint in bulk.
+    """
+
+    def wrapped(instance: t.Any) -> t.Union[ValidationError, None]:
+        message = check(instance)
+        if message is None:
+            return None
+        return ValidationError(
+            message,
+            validator=keyword,
+            validator_value=value,
+            instance=instance,
+            schema=subschema,
+            path=deque([column]),
+            schema_path=deque(["properties", column, keyword]),
+        )
+
+    wrapped.keyword = keyword
+    wrapped.value = value
+    return wrapped
+
+
+def _compile_type(types: t.Any):
+    types = _ensure_list(types)
+    if not _is_list_of(types, str) or not all(typ in TYPE_CHECKS for typ in types):
+        return None
+    type_checks = [TYPE_CHECKS[typ] for typ in types]
+    reprs = ", ".join(repr(typ) for typ in types)
+
+    def check(instance):
+        if not any(type_check(instance) for type_check in type_checks):
+            return f"{instance!r} is not of type {reprs}"
+        return None
+
+    return check
+
+
+def _compile_enum(enums: t.Any):
+    # jsonschema compares enum members without letting bools equal ints, so
+    # only enums of strings or of plain numbers are turned into sets.
+    if not isinstance(enums, list):
+        return None
+    if _is_list_of(enums, str):
+
+        def is_member(instance):
+            return isinstance(instance, str) and instance in members
+
+    elif all(_is_number(each) for each in enums):
+
+        def is_member(instance):
+            return _is_number(instance) and instance in members
+
+    else:
+        return None
+    try:
+        members = frozenset(enums)
+    except TypeError:
+        return None
+
+    def check(instance):
+        if not is_member(instance):
+            return f"{instance!r} is not one of {enums!r}"
+        return None
+
+    return check
+
+
+def _compile_pattern(patrn: t.Any):
+    if not isinstance(patrn, str):
+        return None
+    search = re.compile(patrn).search
+
+    def check(instance):
+        if isinstance(instance, str) and not search(instance):
+            return f"{instance!r} does not match {patrn!r}"
+        return None
+
+    return check
+
+
+def _compile_minimum(minimum: t.Any):
+    if not _is_number(minimum):
+        return None
+
+    def check(instance):
+        if _is_number(instance) and instance < minimum:
+            return f"{instance!r} is less than the minimum of {minimum!r}"
+        return None
+
+    return check
+
+
+def _compile_maximum(maximum: t.Any):
+    if not _is_number(maximum):
+        return None
+
+    def check(instance):
+        if _is_number(instance) and instance > maximum:
+            return f"{instance!r} is greater than the maximum of {maximum!r}"
+        return None
+
+    return check
+
+
+def _compile_max_length(max_length: t.Any):
+    if not _is_integer(max_length):
+        return None
+    message = "is expected to be empty" if max_length == 0 else "is too long"
+
+    def check(instance):
+        if isinstance(instance, str) and len(instance) > max_length:
+            return f"{instance!r} {message}"
+        return None
+
+    return check
+
+
+def _compile_min_length(min_length: t.Any):
+    if not _is_integer(min_length):
+        return None
+    message = "should be non-empty" if min_length == 1 else "is too short"
+
+    def check(instance):
+        if isinstance(instance, str) and len(instance) < min_length:
+            return f"{instance!r} {message}"
+        return None
+
+    return check
+
+
+KEYWORD_COMPILERS = {
+    "type": _compile_type,
+    "enum": _compile_enum,
+    "pattern": _compile_pattern,
+    "minimum": _compile_minimum,
+    "maximum": _compile_maximum,
+    "maxLength": _compile_max_length,
+    "minLength": _compile_min_length,
+}
+
+
+def _ensure_list(value: t.Any) -> list:
+    if isinstance(value, str):
+        return [value]
+    return value
+
+
+def _is_list_of(value: t.Any, item_type: type) -> bool:
+    return isinstance(value, list) and all(isinstance(v, item_type) for v in value)
@@ -4,16 +4,19 @@ Functions related to errors.
 """
 
 import logging
+import reprlib
+import sys
 import typing as t
 from datetime import datetime
-from typing import Any, Literal, Optional
 
-from flywheel_gear_toolkit import GearToolkitContext
 from jsonschema.exceptions import ValidationError
-from pydantic import BaseModel, ConfigDict, Field
 
+from fw_gear_file_validator.limits import ErrorSummary
 from fw_gear_file_validator.utils import PARENT_ORDER, FwReference
 
+if t.TYPE_CHECKING:  # pragma: no cover
+    from flywheel_gear_toolkit import GearToolkitContext
+
 log = logging.getLogger(__name__)
 
 # Globals:
@@ -21,35 +24,109 @@ TIMEFORMAT = "%Y-%m-%d %H:%M:%S"
 RUNTIME = datetime.now()
 TIMESTAMP = RUNTIME.strftime(TIMEFORMAT)
 
+# "errors" reports every error, "aggregate" groups them with aggregate_errors.
+REPORT_MODES = ("errors", "aggregate")
+# Examples of failing lines kept per group by aggregate_errors.
+MAX_EXAMPLES = 5
 
-class FileError(BaseModel):
-    """Represents an error that might be found in file."""
-
-    model_config = ConfigDict(populate_by_name=True)
-    type: Literal["alert", "error"] = Field(serialization_alias="type")
-    code: str = Field(serialization_alias="code")
-    location: Optional[Any] = None
-    value: Optional[str] = None
-    expected: Optional[str] = None
-    message: str = None
-    timestamp: Optional[str] = None
-
-    def model_post_init(self, __context) -> None:
-        """Logic to be carried out after initialization."""
-        # handle the error location options
-        if self.location == [""]:
-            self.location = ""
-        else:
-            self.location = {
-                "key_path": ".".join([str(loc) for loc in self.location][:-1])
-            }
+# When True, every error is validated by the FileError model, see set_strict_errors.
+STRICT_ERRORS = False
+
+# How much of the instance and schema each error reports, see set_error_detail.
+ERROR_DETAIL_MODES = ("full", "truncated", "keyword", "schema_path")
+ERROR_DETAIL = "full"
+ERROR_DETAIL_LENGTH = 200
+
+_SHORT_REPR = reprlib.Repr()
+_SHORT_REPR.maxlevel = 3
+_SHORT_REPR.maxdict = _SHORT_REPR.maxlist = _SHORT_REPR.maxset = 10
+_SHORT_REPR.maxstring = _SHORT_REPR.maxother = ERROR_DETAIL_LENGTH
+
+# The `expected` strings already built, keyed by the id of the object they
+# were built from (which is kept alive with them).  Many errors share the
+# same subschema, so the string is built once and shared by all of them.
+_EXPECTED_STRINGS = {}
+_EXPECTED_STRINGS_SIZE = 4096
+
+
+def set_strict_errors(strict: bool) -> None:
+    """Sets whether errors are built through the FileError model.
+
+    Building a pydantic model for every error is slow when a file has millions
+    of them, so errors are built directly as dicts of the same shape unless
+    strict mode is on (e.g. when debugging), in which case every error is
+    validated by FileError.
+    """
+    global STRICT_ERRORS
+    STRICT_ERRORS = strict
+
+
+def set_error_detail(mode: str, max_length: int = ERROR_DETAIL_LENGTH) -> None:
+    """Sets how much of the failing instance and schema errors report.
+
+    Args:
+        mode: one of
+            - "full": `value` and `expected` are the full instance and subschema
+            - "truncated": both are shortened to at most max_length characters
+            - "keyword": `expected` is only the value of the failing keyword
+            - "schema_path": `expected` is a JSON pointer to the failing keyword
+            In every mode but "full", `value` and `message` are shortened as well.
+        max_length: the maximum length of a shortened string
+    """
+    global ERROR_DETAIL, ERROR_DETAIL_LENGTH
+    if mode not in ERROR_DETAIL_MODES:
+        raise ValueError(
+            f"error detail {mode} not supported, use one of {ERROR_DETAIL_MODES}"
+        )
+    ERROR_DETAIL = mode
+    ERROR_DETAIL_LENGTH = max_length
+    _EXPECTED_STRINGS.clear()
 
-        # handle required:
-        if self.code == "required":
-            key = self.message[1 : self.message.find("' is a required property")]
-            self.location["key_path"] = self.location["key_path"] + "." + key
-            self.value = ""
-            self.expected = ""
+
+def _shorten(obj: t.Any) -> str:
+    """Returns str(obj), shortened to at most ERROR_DETAIL_LENGTH characters.
+
+    Containers are summarized with reprlib, so a large instance is never
+    fully serialized.
+    """
+    text = obj if isinstance(obj, str) else _SHORT_REPR.repr(obj)
+    if len(text) <= ERROR_DETAIL_LENGTH:
+        return text
+    return text[: max(ERROR_DETAIL_LENGTH - 3, 0)] + "..."
+
+
+def _shared_str(obj: t.Any, to_str: t.Callable[[t.Any], str]) -> str:
+    """Returns to_str(obj), reusing the string built for the same object."""
+    key = (id(obj), to_str)
+    entry = _EXPECTED_STRINGS.get(key)
+    if entry is not None and entry[0] is obj:
+        return entry[1]
+    text = sys.intern(to_str(obj))
+    if len(_EXPECTED_STRINGS) >= _EXPECTED_STRINGS_SIZE:
+        _EXPECTED_STRINGS.clear()
+    _EXPECTED_STRINGS[key] = (obj, text)
+    return text
+
+
+def error_details(schema_error: ValidationError) -> t.Tuple[str, str, str]:
+    """Returns the value, expected and message of an error, per the error detail mode."""
+    if ERROR_DETAIL == "full":
+        return (
+            str(schema_error.instance),
+            _shared_str(schema_error.schema, str),
+            schema_error.message,
+        )
+
+    value = _shorten(schema_error.instance)
+    message = _shorten(schema_error.message)
+    if ERROR_DETAIL == "truncated":
+        expected = _shared_str(schema_error.schema, _shorten)
+    elif ERROR_DETAIL == "keyword":
+        expected = _shared_str(schema_error.validator_value, _shorten)
+    else:
+        pointer = "/".join(str(part) for part in schema_error.schema_path)
+        expected = sys.intern(f"#/{pointer}")
+    return value, expected, message
 
 
 def validator_error_to_standard(schema_error: ValidationError) -> dict:
@@ -61,19 +138,63 @@ def validator_error_to_standard(schema_error: ValidationError) -> dict:
     Returns:
         a dictionary representation of a flywheel FileError
     """
+    if not STRICT_ERRORS:
+        return _fast_error_to_standard(schema_error)
+
+    code = str(schema_error.validator)
+    value, expected, message = error_details(schema_error)
+    if code == "required":
+        # FileError reads the name of the missing property from the message.
+        message = schema_error.message
+    # pydantic is only imported when strict errors are requested.
+    from fw_gear_file_validator.models import FileError
+
     fwerror = FileError(
         **{
             "type": "error",  # For now, jsonValidaor can only produce errors.
-            "code": str(schema_error.validator),
+            "code": code,
             "location": schema_error.schema_path,
-            "value": str(schema_error.instance),
-            "expected": str(schema_error.schema),
-            "message": schema_error.message,
+            "value": value,
+            "expected": expected,
+            "message": message,
             "timestamp": TIMESTAMP,
         }
     )
 
-    return fwerror.model_dump()
+    standard_error = fwerror.model_dump()
+    if code == "required" and ERROR_DETAIL != "full":
+        standard_error["message"] = _shorten(message)
+    return standard_error
+
+
+def _fast_error_to_standard(schema_error: ValidationError) -> dict:
+    """Builds the same dict as FileError(...).model_dump(), without the model."""
+    code = str(schema_error.validator)
+    schema_path = schema_error.schema_path
+    if schema_path == [""]:
+        location = ""
+    else:
+        location = {"key_path": ".".join([str(loc) for loc in schema_path][:-1])}
+
+    if code == "required":
+        message = schema_error.message
+        key = message[1 : message.find("' is a required property")]
+        location["key_path"] = location["key_path"] + "." + key
+        value = expected = ""
+        if ERROR_DETAIL != "full":
+            message = _shorten(message)
+    else:
+        value, expected, message = error_details(schema_error)
+
+    return {
+        "type": "error",
+        "code": code,
+        "location": location,
+        "value": value,
+        "expected": expected,
+        "message": message,
+        "timestamp": TIMESTAMP,
+    }
 
 
 def make_empty_file_error() -> ValidationError:
@@ -201,12 +322,20 @@ def make_bad_file_error() -> ValidationError:
 
 def add_flywheel_location_to_errors(fw_ref: FwReference, packaged_errors: list):
     """Takes a set of packaged errors and adds flywheel hierarchy info to them."""
+    return list(iter_flywheel_location(fw_ref, packaged_errors))
+
+
+def iter_flywheel_location(
+    fw_ref: FwReference, packaged_errors: t.Iterable[t.Dict]
+) -> t.Iterator[t.Dict]:
+    """Adds flywheel hierarchy info to packaged errors as they are consumed."""
     hierarchy = fw_ref.hierarchy_objects
     fw_url = fw_ref.get_lookup_path()
     if fw_ref.contents == "file":
         for e in packaged_errors:
             e["flywheel_path"] = fw_url
             e["container_id"] = hierarchy["file"]["file_id"]
+            yield e
     else:
         for e in packaged_errors:
             if "key_path" in e["location"]:
@@ -221,21 +350,127 @@ def add_flywheel_location_to_errors(fw_ref: FwReference, packaged_errors: list):
             e["flywheel_path"] = fw_ref.get_lookup_path(level=location)
             id_loc = "file_id" if location == "file" else "id"
             e["container_id"] = hierarchy[location][id_loc]
+            yield e
+
 
+def make_report(
+    packaged_errors: t.Iterable[t.Dict], report_mode: str
+) -> t.Iterable[t.Dict]:
+    """Returns the errors to save in the QC result, per the report mode.
+
+    Lazy error streams stay lazy in the 'errors' mode.
+    """
+    if report_mode == "aggregate":
+        return aggregate_errors(packaged_errors)
     return packaged_errors
 
 
+def aggregate_errors(
+    packaged_errors: t.Iterable[t.Dict], max_examples: int = MAX_EXAMPLES
+) -> t.List[t.Dict]:
+    """Groups errors by code, column and expected value.
+
+    A systematic failure (such as a column with the wrong type) produces one
+    error per row.  Aggregating them keeps the report size bounded by the
+    number of distinct failures instead of the number of failing cells.
+
+    Each group has the code, column_name, expected, message, flywheel_path and
+    container_id of its first error, plus:
+        count: the number of errors in the group
+        first_line, last_line: the first and last csv lines of the group, or
+            None if the errors have no line
+        examples: the line and value of the first max_examples errors
+
+    Args:
+        packaged_errors: the errors, in the standard error format
+        max_examples: the maximum number of examples kept per group
+
+    Returns:
+        the groups, in order of their first error
+
+    """
+    groups = {}
+    for error in packaged_errors:
+        location = error.get("location")
+        line = column = None
+        if isinstance(location, dict):
+            line = location.get("line")
+            column = location.get("column_name", location.get("key_path"))
+        key = (error["code"], column, error.get("expected"))
+        group = groups.get(key)
+        if group is None:
+            group = groups[key] = {
+                "type": error["type"],
+                "code": error["code"],
+                "column_name": column,
+                "expected": error.get("expected"),
+                "message": error.get("message"),
+                "count": 0,
+                "first_line": line,
+                "last_line": line,
+                "examples": [],
+            }
+            for fw_key in ("flywheel_path", "container_id"):
+                if fw_key in error:
+                    group[fw_key] = error[fw_key]
+        group["count"] += 1
+        if line is not None:
+            group["last_line"] = line
+        if len(group["examples"]) < max_examples:
+            group["examples"].append({"line": line, "value": error.get("value")})
+    return list(groups.values())
+
+
+def make_qc_result(
+    errors: t.List[t.Dict], summary: ErrorSummary = None
+) -> t.Tuple[str, t.Dict]:
+    """Returns the state and data of the validation QC result of a set of errors.
+
+    When error limits were applied, the result also records if the errors
+    were truncated and how many were seen.
+    """
+    meta_dict = summary.to_qc_data() if summary is not None else {}
+    if not errors:
+        return "PASS", meta_dict
+    return "FAIL", {"data": errors, **meta_dict}
+
+
 def save_errors_metadata(
-    errors: t.List[t.Dict], input_file: FwReference, gtk_context: GearToolkitContext
+    errors: t.List[t.Dict],
+    input_file: FwReference,
+    gtk_context: "GearToolkitContext",
+    summary: ErrorSummary = None,
 ):
     """Saves the packaged errors to file metadata."""
-    if not errors:
-        state = "PASS"
-        meta_dict = {}
-    else:
-        state = "FAIL"
-        meta_dict = {"data": errors}
+    state, meta_dict = make_qc_result(errors, summary)
 
     gtk_context.metadata.add_qc_result(
         input_file.name, "validation", state=state, **meta_dict
     )
+
+
+def save_errors_metadata_via_sdk(
+    errors: t.List[t.Dict],
+    file_entry: t.Any,
+    gtk_context: "GearToolkitContext",
+    summary: ErrorSummary = None,
+):
+    """Saves the packaged errors to the metadata of a file that is not a gear input.
+
+    The QC result is written immediately with the SDK, since the gear's
+    .metadata.json can only update the gear inputs.
+    """
+    state, meta_dict = make_qc_result(errors, summary)
+
+    gtk_context.metadata.add_qc_result_via_sdk(
+        file_entry, "validation", state=state, **meta_dict
+    )
+
+
+def __getattr__(name: str) -> t.Any:
+    """Imports the FileError model on first access, it requires pydantic."""
+    if name == "FileError":
+        from fw_gear_file_validator.models import FileError
+
+        return FileError
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,199 @@
+"""fileio.py.
+
+Reads input files into a single shared buffer.
+
+Large files are memory-mapped instead of being read through text file
+objects: the format checks and the parser read the same mapping, pages are
+loaded by the OS as they are needed, and nothing is copied up front.  Small
+files are read in one go, which is cheaper than mapping them.  `LineReader`
+decodes a buffer one line at a time, so that the byte range of every row is
+known exactly.
+"""
+
+import functools
+import io
+import locale
+import mmap
+import os
+import typing as t
+from pathlib import Path
+
+# Files at least this large are memory-mapped.
+MMAP_THRESHOLD = 1024 * 1024
+# Bytes looked at to find out how lines end.
+HEAD_SIZE = 64 * 1024
+# Bytes decoded at a time by text streams.
+READ_SIZE = 1024 * 1024
+
+
+class FileBuffer:
+    """The content of a file, memory-mapped or read in full.
+
+    The buffer supports slicing and `find`, whichever way it was loaded.  It
+    is a context manager, closed when the context exits.
+    """
+
+    def __init__(
+        self,
+        file_path: t.Union[Path, str],
+        mmap_threshold: int = MMAP_THRESHOLD,
+        fp: t.BinaryIO = None,
+    ):
+        """Opens the file and loads or maps its content.
+
+        Args:
+            file_path: the file to read
+            mmap_threshold: files at least this large are memory-mapped, None
+                to always read the file in full
+            fp: the file already opened in binary mode, read instead of
+                opening file_path again, and left open
+        """
+        self.file_path = Path(file_path)
+        self.data = b""
+        self.mapped = False
+        self._views = []
+        if fp is not None:
+            self._load(fp, mmap_threshold)
+            return
+        with open(file_path, "rb") as fp:
+            self._load(fp, mmap_threshold)
+
+    def _load(self, fp: t.BinaryIO, mmap_threshold: t.Union[int, None]) -> None:
+        """Maps or reads the content of an open file."""
+        self.size = fp.seek(0, io.SEEK_END)
+        fp.seek(0)
+        if mmap_threshold is not None and 0 < mmap_threshold <= self.size:
+            self.data = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+            self.mapped = True
+        else:
+            self.data = fp.read()
+            self.size = len(self.data)
+
+    def __enter__(self) -> "FileBuffer":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """Releases the views of the buffer and unmaps the file, if it was mapped."""
+        for view in self._views:
+            view.release()
+        self._views = []
+        if self.mapped and not self.data.closed:
+            self.data.close()
+
+    def view(self) -> memoryview:
+        """Returns a zero-copy view of the buffer, released when it is closed."""
+        view = memoryview(self.data)
+        self._views.append(view)
+        return view
+
+    def text_stream(self, encoding: str = None) -> t.TextIO:
+        """Returns a text file object decoding the buffer, as `open` would.
+
+        Args:
+            encoding: the encoding of the file, defaults to the locale encoding
+                like `open` does
+
+        Returns:
+            the text stream, with newlines left untranslated as expected by
+            `csv.reader`
+
+        """
+        return io.TextIOWrapper(
+            io.BufferedReader(_ViewReader(self.view()), READ_SIZE),
+            encoding=encoding or locale.getpreferredencoding(False),
+            newline="",
+        )
+
+    def reader(self, start: int = 0) -> t.BinaryIO:
+        """Returns a binary file object over the buffer, at an offset.
+
+        The mapping is its own file object, so only one reader of a mapped
+        file may be used at a time.
+        """
+        reader = self.data if self.mapped else io.BytesIO(self.data)
+        reader.seek(start)
+        return reader
+
+    def has_cr_newlines(self) -> bool:
+        """True if the first line ends with a lone carriage return."""
+        head = self.data[:HEAD_SIZE]
+        lf = head.find(b"\n")
+        cr = head.find(b"\r", 0, len(head) if lf == -1 else lf)
+        return cr != -1 and cr + 1 != lf
+
+
+class _ViewReader(io.RawIOBase):
+    """A raw file object over a memoryview, copying only what is read."""
+
+    def __init__(self, view: memoryview):
+        self._view = view
+        self._pos = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, b) -> int:
+        chunk = self._view[self._pos : self._pos + len(b)]
+        size = len(chunk)
+        b[:size] = chunk
+        self._pos += size
+        return size
+
+
+def map_text_file(
+    text_file: t.TextIO, mmap_threshold: int = MMAP_THRESHOLD
+) -> t.Union[FileBuffer, None]:
+    """Memory-maps a file opened in text mode, if it is large enough.
+
+    Args:
+        text_file: the file, as returned by `open`
+        mmap_threshold: files at least this large are memory-mapped
+
+    Returns:
+        the mapped buffer, or None if the file is smaller than the threshold
+        or is not backed by a file descriptor (e.g. `io.StringIO`), in which
+        case it is read through the text file itself
+
+    """
+    try:
+        binary_file = text_file.buffer
+        size = os.fstat(binary_file.fileno()).st_size
+    except (AttributeError, OSError, ValueError):
+        return None
+    if not 0 < mmap_threshold <= size:
+        return None
+    return FileBuffer(text_file.name, mmap_threshold, fp=binary_file)
+
+
+class LineReader:
+    """Decodes the lines of a buffer one at a time, tracking their byte offsets.
+
+    Iterating yields the decoded lines, newlines included, as expected by
+    `csv.reader`.  `offset` is the byte offset of the end of the last line
+    read, so once `csv.reader` returns a row it is the end of that row.
+    """
+
+    def __init__(self, buffer: FileBuffer, start: int = 0, encoding: str = None):
+        """Initializes a LineReader object.
+
+        Args:
+            buffer: the buffer to read
+            start: the offset to start reading from
+            encoding: the encoding of the file, defaults to the locale encoding
+                like `open` does
+        """
+        self._reader = buffer.reader(start)
+        self._decode = functools.partial(
+            bytes.decode, encoding=encoding or locale.getpreferredencoding(False)
+        )
+
+    @property
+    def offset(self) -> int:
+        """The byte offset of the end of the last line read."""
+        return self._reader.tell()
+
+    def __iter__(self) -> t.Iterator[str]:
+        return map(self._decode, iter(self._reader.readline, b""))
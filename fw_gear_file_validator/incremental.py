@@ -0,0 +1,303 @@
+"""incremental.py.
+
+Skips the validation of files that have not changed since they were last
+validated.
+
+A validation hash combines a hash of the validated content (the bytes of the
+file, or the filtered Flywheel hierarchy), the hash of the schema and the
+options that change the saved result.  It is recorded with the QC result, and
+when the next run computes the same hash for the same file, the previous
+PASS/FAIL result is reused instead of validating the file again.
+
+Previous results are read from the QC result of the file itself, or from a
+local state file when running without a Flywheel instance.  The state file is
+an append-only log: each result is appended as a line of JSON, holding the
+state, the validation hash and a summary of the result, and the log is
+compacted to one line per file when it is loaded.
+"""
+
+import copy
+import dataclasses
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import typing as t
+from abc import ABC, abstractmethod
+from pathlib import Path
+
+from fw_gear_file_validator.cache import _package_version
+
+log = logging.getLogger(__name__)
+
+# Bumped whenever the content of the state file changes.
+STATE_FILE_VERSION = 2
+READ_SIZE = 1 << 20
+# Updated by every metadata change, including saving the QC result.
+HIERARCHY_EXCLUDE = ("modified",)
+# The validator_config options that change the saved result.
+RESULT_OPTIONS = ("error_detail", "report_mode", "error_output", "error_limits")
+
+
+def content_hash(d: t.Any, location: t.Union[Path, dict], gear_name: str = None) -> str:
+    """Returns a hash of the content being validated.
+
+    Files are hashed from their bytes.  Flywheel hierarchies are hashed from
+    their filtered representation, without the fields that change whenever
+    the QC result is saved (the `modified` timestamps and the QC results of
+    this gear).
+
+    Args:
+        d: the loaded object, as returned by `Loader.open_object`
+        location: where the object was loaded from
+        gear_name: the name of the gear saving the QC results
+
+    Returns:
+        the hex digest of the sha256 hash of the content
+
+    """
+    digest = hashlib.sha256()
+    if isinstance(location, Path):
+        with open(location, "rb") as fp:
+            while chunk := fp.read(READ_SIZE):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    hierarchy = {}
+    for level, container in d.items():
+        container = {k: v for k, v in container.items() if k not in HIERARCHY_EXCLUDE}
+        qc = (container.get("info") or {}).get("qc")
+        if isinstance(qc, dict) and gear_name in qc:
+            container["info"] = copy.copy(container["info"])
+            container["info"]["qc"] = {k: v for k, v in qc.items() if k != gear_name}
+        hierarchy[level] = container
+    canonical = json.dumps(
+        hierarchy, sort_keys=True, separators=(",", ":"), default=str
+    )
+    digest.update(canonical.encode("UTF-8"))
+    return digest.hexdigest()
+
+
+def result_options(validator_config: t.Dict[str, t.Any]) -> t.Dict[str, t.Any]:
+    """Returns the validator options that change the saved result."""
+    options = {}
+    for key in RESULT_OPTIONS:
+        value = validator_config.get(key)
+        if dataclasses.is_dataclass(value):
+            value = dataclasses.asdict(value)
+        options[key] = value
+    return options
+
+
+def validation_hash(
+    content_digest: str, schema_digest: str, options: t.Dict[str, t.Any] = None
+) -> str:
+    """Returns the hash identifying the result of a validation.
+
+    Args:
+        content_digest: the hash of the content, as returned by content_hash
+        schema_digest: the hash of the schema, as returned by cache.schema_hash
+        options: the options that change the result, as returned by result_options
+
+    Returns:
+        the hex digest of the sha256 hash of the content, schema, options and
+        package version
+
+    """
+    key = {
+        "content": content_digest,
+        "schema": schema_digest,
+        "options": options or {},
+        "package_version": _package_version(),
+    }
+    canonical = json.dumps(key, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(canonical.encode("UTF-8")).hexdigest()
+
+
+class ResultStore(ABC):
+    """Where the previous validation results are looked up."""
+
+    @abstractmethod
+    def get(self, file_id: str, digest: str) -> t.Union[t.Tuple[str, dict], None]:
+        """Returns the previous result of a file, if it has the same hash.
+
+        Args:
+            file_id: the id of the validated file
+            digest: the validation hash, as returned by validation_hash
+
+        Returns:
+            the state and data of the previous QC result, or None if the file
+            has no PASS/FAIL result with that hash
+
+        """
+
+    def put(self, file_id: str, digest: str, state: str, data: dict) -> None:
+        """Records the result of a validation."""
+
+
+class QcResultStore(ResultStore):
+    """Reads the previous results from the QC results saved on the files.
+
+    Nothing needs to be recorded, the validation hash is saved with the QC
+    result.
+    """
+
+    def __init__(self, file_info: dict, gear_name: str):
+        """Initializes a QcResultStore object.
+
+        Args:
+            file_info: the info of the validated file
+            gear_name: the name of the gear the QC results are saved under
+        """
+        self.file_info = file_info or {}
+        self.gear_name = gear_name
+
+    def get(self, file_id: str, digest: str) -> t.Union[t.Tuple[str, dict], None]:
+        """Returns the previous QC result of the file, if it has the same hash."""
+        qc = self.file_info.get("qc", {}).get(self.gear_name, {})
+        return _matching_result(qc.get("validation"), digest)
+
+
+class LocalStateStore(ResultStore):
+    """Records the results in a local state file, keyed by file id.
+
+    The first line of the file holds its format version, and every following
+    line a result, the last one of a file replacing the others.  Recording a
+    result appends a line, and the file is rewritten with a single line per
+    file when results were replaced.
+    """
+
+    def __init__(self, state_file: t.Union[Path, str]):
+        """Initializes a LocalStateStore object.
+
+        Args:
+            state_file: the state file, created on the first put
+        """
+        self.state_file = Path(state_file)
+        self._results = None
+        # True when the file must be rewritten before appending to it.
+        self._rewrite = True
+
+    @property
+    def results(self) -> dict:
+        """The results in the state file, read on first use."""
+        if self._results is None:
+            self._results = self._read()
+        return self._results
+
+    def _read(self) -> dict:
+        """Reads the results from the state file, compacting it if needed."""
+        results = {}
+        line_count = 0
+        try:
+            with open(self.state_file, "r", encoding="UTF-8") as fp:
+                header = json.loads(fp.readline())
+                if (
+                    not isinstance(header, dict)
+                    or header.get("format_version") != STATE_FILE_VERSION
+                ):
+                    log.info("Ignoring stale state file %s", self.state_file)
+                    return {}
+                for line in fp:
+                    line_count += 1
+                    try:
+                        record = json.loads(line)
+                        results[record.pop("file_id")] = record
+                    except (ValueError, TypeError, KeyError, AttributeError):
+                        # Left by a run interrupted while appending it.
+                        continue
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            log.warning("Ignoring unreadable state file %s: %s", self.state_file, e)
+            return {}
+        self._rewrite = False
+        if line_count > len(results):
+            self._write(results)
+        return results
+
+    def _write(self, results: dict) -> None:
+        """Rewrites the state file atomically, with one line per file."""
+        self.state_file.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.state_file.parent, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="UTF-8") as fp:
+                fp.write(_dump_line({"format_version": STATE_FILE_VERSION}))
+                for file_id, record in results.items():
+                    fp.write(_dump_line({"file_id": file_id, **record}))
+            os.replace(tmp_path, self.state_file)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+        self._rewrite = False
+
+    def get(self, file_id: str, digest: str) -> t.Union[t.Tuple[str, dict], None]:
+        """Returns the recorded result of the file, if it has the same hash."""
+        return _matching_result(self.results.get(file_id), digest)
+
+    def put(self, file_id: str, digest: str, state: str, data: dict) -> None:
+        """Records the state and a summary of the result of a file.
+
+        The result is appended to the state file, which is only rewritten
+        when it does not exist yet or could not be read.
+        """
+        record = {"state": state, **result_summary(data), "validation_hash": digest}
+        self.results[file_id] = record
+        if self._rewrite:
+            self._write(self.results)
+            return
+        with open(self.state_file, "a", encoding="UTF-8") as fp:
+            fp.write(_dump_line({"file_id": file_id, **record}))
+
+
+def result_summary(data: dict) -> dict:
+    """Returns the summary of a QC result recorded in the state file.
+
+    The errors are left out, replaced by their number in `error_count`: only
+    the scalar fields of the result are kept, such as the error file name or
+    whether the errors were truncated.
+    """
+    summary = {
+        key: value
+        for key, value in data.items()
+        if value is None or isinstance(value, (str, int, float, bool))
+    }
+    if isinstance(data.get("data"), list):
+        summary["error_count"] = len(data["data"])
+    return summary
+
+
+def _dump_line(value: dict) -> str:
+    """Returns a line of the state file."""
+    return json.dumps(value, separators=(",", ":"), default=str) + "\n"
+
+
+def _matching_result(result: t.Any, digest: str) -> t.Union[t.Tuple[str, dict], None]:
+    """Returns the state and data of a saved result if it has the given hash."""
+    if not isinstance(result, dict) or result.get("validation_hash") != digest:
+        return None
+    state = result.get("state")
+    if state not in ("PASS", "FAIL"):
+        return None
+    data = {k: v for k, v in result.items() if k != "state"}
+    return state, data
+
+
+def open_result_store(
+    state_file: t.Union[Path, str, None], file_info: dict, gear_name: str
+) -> ResultStore:
+    """Returns the store of the previous results.
+
+    Args:
+        state_file: the local state file, None to use the QC results
+        file_info: the info of the validated file, holding its QC results
+        gear_name: the name of the gear the QC results are saved under
+
+    Returns:
+        the result store
+
+    """
+    if state_file:
+        return LocalStateStore(state_file)
+    return QcResultStore(file_info, gear_name)
@@ -0,0 +1,130 @@
+"""jsonio.py.
+
+Parses JSON input files and schemas with the fastest backend available.
+
+The backends are the standard library `json` module and `orjson`, several
+times faster on large documents.  `orjson` is installed with the `orjson`
+extra, and used by default when it is installed.  Whatever the backend, the
+parsed content and the errors are the ones `json.loads` would give: a
+document `orjson` rejects is parsed again with `json`, which either accepts it
+(`NaN`, a byte order mark) or raises its usual `json.JSONDecodeError`.
+Documents that may hold integers wider than 64 bits, which `orjson` would
+turn into floats, are parsed with `json` straight away.  Documents can be
+passed as bytes or any buffer, such as a memory-mapped file, and are only
+decoded to `str` when `json` parses them.
+
+The garbage collector is paused while a document is parsed: parsing
+allocates millions of containers, none of them part of a reference cycle, and
+the collections they trigger take longer than the parsing itself.
+"""
+
+import gc
+import json
+import re
+import typing as t
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+# "auto" selects the fastest backend installed.
+JSON_BACKENDS = ("auto", "stdlib", "orjson")
+# The backend in use, see set_json_backend.
+JSON_BACKEND = "stdlib"
+# Integers of 19 digits or more may not fit in 64 bits.
+WIDE_INTEGER_DIGITS = 19
+_DIGITS = bytes(b"0"[0] if b"0"[0] <= i <= b"9"[0] else b" "[0] for i in range(256))
+_WIDE_INTEGER = b"0" * WIDE_INTEGER_DIGITS
+_WIDE_INTEGER_RE = re.compile(rf"[0-9]{{{WIDE_INTEGER_DIGITS}}}")
+# Buffers are scanned for wide integers this many bytes at a time.
+SCAN_SIZE = 1024 * 1024
+
+
+def available_backends() -> t.Tuple[str, ...]:
+    """Returns the backends that are installed, fastest last."""
+    if orjson is None:
+        return ("stdlib",)
+    return ("stdlib", "orjson")
+
+
+def set_json_backend(backend: str) -> None:
+    """Sets the backend parsing JSON files and schemas.
+
+    Args:
+        backend: one of
+            - "auto": the fastest backend installed
+            - "stdlib": the standard library json module
+            - "orjson": orjson, requires the orjson extra
+    """
+    global JSON_BACKEND
+    if backend not in JSON_BACKENDS:
+        raise ValueError(
+            f"json backend {backend} not supported, use one of {JSON_BACKENDS}"
+        )
+    if backend == "auto":
+        backend = available_backends()[-1]
+    if backend == "orjson" and orjson is None:
+        raise ImportError(
+            "the orjson json backend requires orjson, "
+            "install fw_gear_file_validator[orjson]"
+        )
+    JSON_BACKEND = backend
+
+
+def loads(data: t.Union[bytes, str, memoryview], encoding: str = None) -> t.Any:
+    """Parses a JSON document with the selected backend.
+
+    Args:
+        data: the document, as a str, bytes or a memoryview of bytes
+        encoding: the encoding bytes are strictly decoded from when `json`
+            parses them, None to let `json.loads` detect it
+
+    Returns:
+        the parsed content, as json.loads would return it
+
+    Raises:
+        json.JSONDecodeError: if the document is not valid JSON, as raised by
+            json.loads
+        UnicodeDecodeError: if the document cannot be decoded from `encoding`
+
+    """
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        if JSON_BACKEND == "orjson" and not _may_hold_wide_integers(data):
+            try:
+                return orjson.loads(data)
+            except orjson.JSONDecodeError:
+                # orjson is stricter than json, which decides.
+                pass
+        if encoding is not None and not isinstance(data, str):
+            data = str(data, encoding)
+        elif isinstance(data, memoryview):
+            data = bytes(data)
+        return json.loads(data)
+    finally:
+        if gc_enabled:
+            gc.enable()
+
+
+def _may_hold_wide_integers(data: t.Union[bytes, str, memoryview]) -> bool:
+    """True if the document holds a run of digits long enough to exceed 64 bits."""
+    if isinstance(data, str):
+        return _WIDE_INTEGER_RE.search(data) is not None
+    # Scanned in chunks overlapping by a run of digits, so that large
+    # buffers are not copied in full.
+    with memoryview(data) as view:
+        for start in range(0, len(view), SCAN_SIZE):
+            chunk = bytes(view[start : start + SCAN_SIZE + WIDE_INTEGER_DIGITS - 1])
+            if _WIDE_INTEGER in chunk.translate(_DIGITS):
+                return True
+    return False
+
+
+def load(fp: t.IO) -> t.Any:
+    """Parses the JSON document read from a file object, see `loads`."""
+    return loads(fp.read())
+
+
+set_json_backend("auto")
@@ -0,0 +1,177 @@
+"""limits.py.
+
+Limits on the errors collected during validation.
+
+When a file is validated against the wrong schema every row fails, and
+collecting, sorting and uploading millions of errors only to report a failure
+is wasted work.  The limits below stop validation once enough errors have
+been seen, cap the number of errors reported per column or per error code,
+or validate only a sample of the rows of a csv file.
+"""
+
+import random
+import typing as t
+from collections import Counter
+from dataclasses import dataclass
+
+SAMPLE_MODES = ("stride", "random")
+
+
+@dataclass
+class ErrorSummary:
+    """What was left out of an error report.
+
+    Attributes:
+        total: the number of errors seen before validation stopped
+        kept: the number of errors reported
+        truncated: True if errors were left out of the report, or if
+            validation stopped while more errors remained
+        sample_fraction: the fraction of the rows that were validated
+    """
+
+    total: int
+    kept: int
+    truncated: bool
+    sample_fraction: float = 1.0
+
+    def to_qc_data(self) -> t.Dict[str, t.Any]:
+        """Returns the fields recorded in the QC result."""
+        data = {"truncated": self.truncated, "total_errors": self.total}
+        if self.sample_fraction < 1:
+            data["sample_fraction"] = self.sample_fraction
+        return data
+
+
+@dataclass
+class ErrorLimits:
+    """Limits on the errors collected during validation.
+
+    Attributes:
+        max_errors: stop validating once this many errors are reported, 0 for
+            no limit
+        fail_fast: stop validating at the first error
+        max_per_column: report at most this many errors per column (per key
+            path for JSON files), 0 for no limit
+        max_per_code: report at most this many errors per error code, 0 for
+            no limit
+        sample_fraction: the fraction of the csv rows to validate
+        sample_mode: "stride" validates evenly spaced rows, "random" a random
+            subset of the rows
+        seed: the seed of the random sample, so that runs are reproducible
+    """
+
+    max_errors: int = 0
+    fail_fast: bool = False
+    max_per_column: int = 0
+    max_per_code: int = 0
+    sample_fraction: float = 1.0
+    sample_mode: str = "stride"
+    seed: int = 0
+
+    def __post_init__(self) -> None:
+        """Checks the limits."""
+        if min(self.max_errors, self.max_per_column, self.max_per_code) < 0:
+            raise ValueError("error limits must be 0 (no limit) or a positive number")
+        if not 0 < self.sample_fraction <= 1:
+            raise ValueError("sample_fraction must be greater than 0 and at most 1")
+        if self.sample_mode not in SAMPLE_MODES:
+            raise ValueError(
+                f"sample mode {self.sample_mode} not supported, "
+                f"use one of {SAMPLE_MODES}"
+            )
+
+    @property
+    def active(self) -> bool:
+        """True if any limit is set."""
+        return bool(
+            self.max_errors
+            or self.fail_fast
+            or self.max_per_column
+            or self.max_per_code
+            or self.sample_fraction < 1
+        )
+
+    def sampler(self) -> t.Union[t.Callable[[int], bool], None]:
+        """Returns a function telling if a row number is in the sample.
+
+        Returns:
+            None if every row is validated
+
+        """
+        if self.sample_fraction >= 1:
+            return None
+        if self.sample_mode == "stride":
+            stride = max(round(1 / self.sample_fraction), 1)
+            return lambda row_num: row_num % stride == 0
+        rng = random.Random(self.seed)
+        return lambda row_num: rng.random() < self.sample_fraction
+
+    def collect(
+        self, errors: t.Iterable[t.Dict]
+    ) -> t.Tuple[t.List[t.Dict], ErrorSummary]:
+        """Collects errors from a lazy error stream, within the limits.
+
+        The stream is not consumed past the error limit, so validation stops
+        as soon as the report is full.
+
+        Args:
+            errors: the errors, in the standard error format
+
+        Returns:
+            the errors to report, and a summary of what was left out
+
+        """
+        summary = self.new_summary()
+        kept = list(self.iter_within(errors, summary))
+        return kept, summary
+
+    def new_summary(self) -> ErrorSummary:
+        """Returns an empty summary, to be filled by iter_within."""
+        return ErrorSummary(0, 0, False, self.sample_fraction)
+
+    def iter_within(
+        self, errors: t.Iterable[t.Dict], summary: ErrorSummary
+    ) -> t.Iterator[t.Dict]:
+        """Yields the errors of a lazy error stream that are within the limits.
+
+        Args:
+            errors: the errors, in the standard error format
+            summary: updated with the errors seen and kept as they are yielded
+
+        Yields:
+            the errors to report
+
+        """
+        max_errors = 1 if self.fail_fast else self.max_errors
+        errors = iter(errors)
+        per_column = Counter()
+        per_code = Counter()
+        for error in errors:
+            summary.total += 1
+            column = _error_column(error)
+            if self.max_per_column and per_column[column] >= self.max_per_column:
+                summary.truncated = True
+                continue
+            if self.max_per_code and per_code[error["code"]] >= self.max_per_code:
+                summary.truncated = True
+                continue
+            per_column[column] += 1
+            per_code[error["code"]] += 1
+            summary.kept += 1
+            yield error
+            if max_errors and summary.kept >= max_errors:
+                # Only look as far as the next error to know if any were left out.
+                if next(errors, None) is not None:
+                    summary.total += 1
+                    summary.truncated = True
+                return
+
+
+def _error_column(error: t.Dict) -> t.Any:
+    """Returns the column (or JSON key path) an error is located in."""
+    location = error.get("location")
+    if not isinstance(location, dict):
+        return None
+    if "column_name" in location:
+        return location["column_name"]
+    return location.get("key_path")
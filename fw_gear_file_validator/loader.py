@@ -3,16 +3,34 @@
 Functions relating to loading files.
 """
 
+import contextlib
 import csv
 import io
 import json
+import re
 import typing as t
 from abc import ABC, abstractmethod
+from array import array
 from pathlib import Path
 
-from flywheel_gear_toolkit.utils.datatypes import Container
-
 import fw_gear_file_validator.errors as err
+from fw_gear_file_validator import jsonio
+from fw_gear_file_validator.fileio import (
+    READ_SIZE,
+    FileBuffer,
+    LineReader,
+    map_text_file,
+)
+
+if t.TYPE_CHECKING:  # pragma: no cover
+    from flywheel_gear_toolkit.utils.datatypes import Container
+
+# Bytes looked at to find out whether a JSON file holds an array.
+JSON_HEAD_SIZE = 4096
+JSON_WHITESPACE = b" \t\n\r"
+JSON_WHITESPACE_RE = re.compile(r"[ \t\n\r]*")
+# The byte order marks of UTF-8, UTF-16 and UTF-32, not allowed in JSON files.
+BYTE_ORDER_MARKS = (b"\xef\xbb\xbf", b"\xff\xfe", b"\xfe\xff", b"\x00\x00\xfe\xff")
 
 PARENT_INCLUDE = [
     # General values
@@ -52,6 +70,7 @@ class Loader(ABC):
 
     name = None
     has_config = False
+    streaming = False
 
     @classmethod
     def factory(cls, name: str, config: t.Dict[str, t.Any] = None) -> "Loader":
@@ -86,7 +105,16 @@ class Loader(ABC):
     @abstractmethod
     def load_object(self, file: t.Union[Path, dict]) -> t.Tuple[dict, t.List[t.Dict]]:
         """Returns the object to be validated as a dict. Performs file structure validation."""
-        pass
+
+    def open_object(self, file: t.Union[Path, dict]) -> t.Tuple[t.Any, t.List[t.Dict]]:
+        """Returns the object to be validated, as a stream if the loader supports it.
+
+        The format errors of a stream are only known once it has been consumed,
+        see `validator.validate_object`.
+        """
+        if self.streaming:
+            return self.stream_object(file), None
+        return self.load_object(file)
 
     @staticmethod
     def handle_errors(file_errors: list[err.ValidationError]) -> t.List[t.Dict]:
@@ -107,26 +135,88 @@ class JsonLoader(Loader):
         """Yet another extremely complicated function worthy of a docstring."""
         super().__init__()
 
+    def open_object(self, file_path: Path) -> t.Tuple[t.Any, t.List[t.Dict]]:
+        """Returns a stream over the records of a top-level array, else the content.
+
+        Files holding a top-level JSON array are not loaded in memory: their
+        records are parsed one at a time as the stream is iterated.
+        """
+        if self.is_array_file(file_path):
+            return JsonRecordStream(file_path), None
+        return self.load_object(file_path)
+
+    @staticmethod
+    def is_array_file(file_path: Path) -> bool:
+        """True if the first non-whitespace character of the file is '['."""
+        try:
+            with open(file_path, "rb") as fp:
+                while chunk := fp.read(JSON_HEAD_SIZE):
+                    chunk = chunk.lstrip(JSON_WHITESPACE)
+                    if chunk:
+                        return chunk.startswith(b"[")
+        except FileNotFoundError as e:
+            raise ValueError(f"Error loading JSON object: {e}")
+        return False
+
     def load_object(self, file_path: Path) -> t.Tuple[dict, t.List[t.Dict]]:
-        """Returns the content of the JSON file as a dict."""
+        """Returns the content of the JSON file as a dict.
+
+        Files that cannot be parsed are reported with a malformed-file error,
+        as the records of JSON arrays and NDJSON files are.
+        """
         try:
             # Check for empty file
-            format_errors = self.validate_file_format(file_path)
-            if format_errors:
-                return None, format_errors
-            with open(file_path, "r", encoding="UTF-8") as fp:
-                content = json.load(fp)
+            # The file is read once, for the format checks and the parsing,
+            # and large files are parsed straight from their mapping.
+            with FileBuffer(file_path) as buffer:
+                format_errors = self.validate_buffer_format(buffer)
+                if format_errors:
+                    return None, format_errors
+                self.check_utf8(buffer.data[:4])
+                with memoryview(buffer.data) as data:
+                    content = jsonio.loads(data, encoding="UTF-8")
             return content, None
-        except (FileNotFoundError, json.JSONDecodeError) as e:
+        except FileNotFoundError as e:
             raise ValueError(f"Error loading JSON object: {e}")
+        except (json.JSONDecodeError, UnicodeDecodeError) as e:
+            error = err.make_malformed_file_error()
+            error.message = f"JSON parsing error: {e}"
+            return None, self.handle_errors([error])
+
+    @staticmethod
+    def check_utf8(head: bytes) -> None:
+        """Rejects JSON files that are not UTF-8, from their first bytes.
+
+        json.loads would otherwise accept UTF-16 and UTF-32 documents and byte
+        order marks.  A JSON document starts with an ASCII character, so that
+        in UTF-16 or UTF-32 one of its first bytes is null.
+
+        Raises:
+            json.JSONDecodeError: if the file starts with a byte order mark or
+                a null byte, reported as a malformed-file error
+
+        """
+        if head.startswith(BYTE_ORDER_MARKS) or b"\x00" in head:
+            raise json.JSONDecodeError(
+                "JSON files must be UTF-8 encoded, without a byte order mark",
+                repr(head),
+                0,
+            )
 
     def validate_file_format(
         self, file_path: Path
     ) -> t.Union[err.ValidationError, None]:
         """Validates some basic file format items."""
+        with FileBuffer(file_path) as buffer:
+            return self.validate_buffer_format(buffer)
+
+    def validate_buffer_format(
+        self, buffer: FileBuffer
+    ) -> t.Union[err.ValidationError, None]:
+        """Validates some basic file format items of a loaded file."""
         errors = []
 
-        if file_path.stat().st_size == 0:
+        if buffer.size == 0:
             errors.append(err.make_empty_file_error())
 
         if errors:
@@ -150,9 +240,11 @@ class FwLoader(Loader):
         with or without its parents.
 
         Args:
-            config: the loader config
+            config: the loader config.  If it holds a `container_cache`, the
+                filtered parent containers are computed once and reused.
         """
         self.add_parents = config.get("add_parents")
+        self.container_cache = config.get("container_cache")
 
     def load_object(self, fw_hierarchy: dict) -> t.Tuple[dict, t.List[t.Dict]]:
         """Returns the content of the Flywheel reference as a dict."""
@@ -160,64 +252,437 @@ class FwLoader(Loader):
         if not self.add_parents:
             fw_hierarchy = {"file": fw_hierarchy["file"]}
 
+        # A new dict, the hierarchy is still used once loaded (for instance
+        # to locate errors and tag the file).
+        filtered = {}
         for k, container in fw_hierarchy.items():
-            fw_hierarchy[k] = self._filter_container(container)
-        return fw_hierarchy, None
+            container_id = getattr(container, "id", None)
+            if self.container_cache is not None and k != "file" and container_id:
+                filtered[k] = self.container_cache.get_filtered(
+                    k, container_id, container, self._filter_container
+                )
+            else:
+                filtered[k] = self._filter_container(container)
+        return filtered, None
 
     @staticmethod
-    def _filter_container(container: Container):
+    def _filter_container(container: "Container"):
         """Filters the container to remove unwanted fields."""
         cont_f = {k: v for k, v in container.to_dict().items() if k in PARENT_INCLUDE}
         return cont_f
 
 
+class RecordStream:
+    """Base class of the streams over the records of a file.
+
+    A stream is iterated once, yielding the records as they are parsed.
+    Format problems are collected on the stream instead of being raised, and
+    can be retrieved through `errors` once the stream has been consumed.  The
+    stream is a context manager, closing the underlying file when it exits.
+    """
+
+    def __enter__(self) -> "RecordStream":
+        """Returns the stream itself."""
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        """Closes the underlying file."""
+        self.close()
+
+    def close(self) -> None:
+        """Closes the underlying file, if it is still open."""
+
+    @property
+    def errors(self) -> t.Union[t.List[t.Dict], None]:
+        """Returns the format errors found so far, in the standard error format."""
+        return None
+
+
+class JsonRecordStream(RecordStream):
+    """Lazily parses the records of a JSON array or NDJSON file one at a time.
+
+    Records of a top-level JSON array are decoded incrementally from the text
+    of the file, and the text is dropped as soon as a record is decoded, so
+    only one record is held in memory at a time.  NDJSON files hold one JSON
+    value per line, blank lines are skipped.  A file that turns out not to be
+    valid JSON stops the iteration and reports a malformed-file error.
+    """
+
+    def __init__(self, file_path: Path, ndjson: bool = False):
+        """Opens the file.
+
+        Args:
+            file_path: the path of the JSON array or NDJSON file to stream
+            ndjson: True if the file holds one JSON value per line, False if
+                it holds a single JSON array
+        """
+        self.file_path = file_path
+        self.ndjson = ndjson
+        self.record_count = 0
+        self._buffer = None
+        self._syntax_error = None
+        try:
+            self._buffer = FileBuffer(file_path)
+        except FileNotFoundError as e:
+            raise ValueError(f"Error loading JSON object: {e}")
+
+    @property
+    def array(self) -> bool:
+        """True if the records are the items of a single JSON array."""
+        return not self.ndjson
+
+    def __iter__(self) -> t.Iterator[t.Any]:
+        """Yields the records of the file."""
+        if self._buffer is None:
+            return
+        try:
+            text = self._buffer.text_stream("UTF-8")
+            records = self._iter_lines(text) if self.ndjson else self._iter_items(text)
+            for record in records:
+                self.record_count += 1
+                yield record
+        except ValueError as e:
+            error = err.make_malformed_file_error()
+            error.message = f"JSON parsing error: {e}"
+            self._syntax_error = error
+        finally:
+            self.close()
+
+    @staticmethod
+    def _iter_lines(text: t.TextIO) -> t.Iterator[t.Any]:
+        """Yields the value of every non-blank line."""
+        for line_num, line in enumerate(text, start=1):
+            if line.strip():
+                try:
+                    yield jsonio.loads(line)
+                except json.JSONDecodeError as e:
+                    raise ValueError(f"line {line_num}: {e.msg}")
+
+    @staticmethod
+    def _iter_items(text: t.TextIO) -> t.Iterator[t.Any]:
+        """Yields the items of the JSON array, decoding them incrementally."""
+        decoder = json.JSONDecoder()
+        buffer = ""
+        pos = 0
+        eof = False
+
+        def read(size: int = READ_SIZE) -> None:
+            # Drops the text already decoded before reading more.
+            nonlocal buffer, pos, eof
+            chunk = text.read(size)
+            eof = not chunk
+            buffer = buffer[pos:] + chunk
+            pos = 0
+
+        def skip_whitespace() -> str:
+            # Returns the next character, "" at the end of the file.
+            nonlocal pos
+            while True:
+                pos = JSON_WHITESPACE_RE.match(buffer, pos).end()
+                if pos < len(buffer) or eof:
+                    return buffer[pos : pos + 1]
+                read()
+
+        def fail(message: str) -> t.NoReturn:
+            raise json.JSONDecodeError(message, buffer, pos)
+
+        if skip_whitespace() != "[":
+            fail("Expecting '['")
+        pos += 1
+        if skip_whitespace() == "]":
+            pos += 1
+        else:
+            while True:
+                skip_whitespace()
+                size = READ_SIZE
+                while True:
+                    try:
+                        item, end = decoder.raw_decode(buffer, pos)
+                    except json.JSONDecodeError:
+                        if eof:
+                            raise
+                        end = None
+                    # A value ending with the text read so far may go on
+                    # (e.g. a number), it is only complete once more is read.
+                    if end is not None and (end < len(buffer) or eof):
+                        break
+                    read(size)
+                    size *= 2
+                pos = end
+                yield item
+                next_char = skip_whitespace()
+                pos += 1
+                if next_char == "]":
+                    break
+                if next_char != ",":
+                    pos -= 1
+                    fail("Expecting ',' delimiter")
+        if skip_whitespace():
+            fail("Extra data")
+
+    def close(self) -> None:
+        """Closes the underlying file, if it is still open."""
+        if self._buffer is not None:
+            self._buffer.close()
+            self._buffer = None
+
+    @property
+    def errors(self) -> t.Union[t.List[t.Dict], None]:
+        """Returns the format errors found so far, in the standard error format."""
+        if self._syntax_error:
+            return Loader.handle_errors([self._syntax_error])
+        return None
+
+
+class NdjsonLoader(Loader):
+    """Loads a newline-delimited JSON file, one record per line."""
+
+    name = "ndjson"
+    has_config = False
+    streaming = True
+
+    def load_object(self, file_path: Path) -> t.Tuple[t.List[t.Any], t.List[t.Dict]]:
+        """Returns the records of the NDJSON file as a list."""
+        stream = self.stream_object(file_path)
+        records = list(stream)
+        if stream.errors:
+            return None, stream.errors
+        return records, None
+
+    @staticmethod
+    def stream_object(file_path: Path) -> JsonRecordStream:
+        """Returns a stream over the records of the NDJSON file."""
+        return JsonRecordStream(file_path, ndjson=True)
+
+
+class CsvRowStream(RecordStream):
+    """Lazily parses a csv file one row at a time.
+
+    The file is read in a single pass: the header is read when the stream is
+    created, and the field count of every row is checked as the rows are
+    yielded.  Format problems are collected on the stream instead of being
+    raised, and can be retrieved through `errors` once the stream has been
+    consumed.  Rows are yielded as dicts keyed by the header, the same way
+    `csv.DictReader` would produce them.
+    """
+
+    def __init__(
+        self, file_path: Path, track_offsets: bool = False, encoding: str = None
+    ):
+        """Opens the csv file and reads its header.
+
+        Large files are decoded straight from a memory mapping of the file.
+
+        Args:
+            file_path: the path of the csv file to stream
+            track_offsets: if True, the byte offset of every row is recorded
+                in `row_offsets`, see `byte_range`
+            encoding: the encoding of the file, defaults to the locale encoding
+        """
+        self.file_path = file_path
+        self.encoding = encoding
+        self.header = None
+        self.row_count = 0
+        self.header_end = None
+        self.end_offset = None
+        self.row_offsets = None
+        self._buffer = None
+        self._lines = None
+        # Owns the file and its mapping, closed together by close().
+        self._files = contextlib.ExitStack()
+        self._reader = None
+        self._syntax_error = None
+        self._header_error = None
+        try:
+            with contextlib.ExitStack() as files:
+                if track_offsets:
+                    self._open_lines(files)
+                if self._lines is None:
+                    self._open_text(files)
+                # Kept open until the stream is consumed or closed.
+                self._files = files.pop_all()
+            self._read_header()
+            self.header_end = self.end_offset = self._offset()
+        except Exception as e:
+            self._syntax_error = self._make_syntax_error(e)
+            self.close()
+
+    def _open_text(self, files: contextlib.ExitStack) -> None:
+        """Reads the rows through a text file, or a text stream over its mapping."""
+        csv_file = files.enter_context(
+            open(self.file_path, newline="", encoding=self.encoding)
+        )
+        self._buffer = map_text_file(csv_file)
+        if self._buffer is not None:
+            files.enter_context(self._buffer)
+            self._reader = csv.reader(self._buffer.text_stream(csv_file.encoding))
+        else:
+            self._reader = csv.reader(csv_file)
+
+    def _open_lines(self, files: contextlib.ExitStack) -> None:
+        """Reads the rows one line of bytes at a time, tracking their offsets."""
+        self._buffer = files.enter_context(FileBuffer(self.file_path))
+        if self._buffer.has_cr_newlines():
+            # The line reader only splits lines on "\n", the offsets of
+            # files using lone carriage returns are unknown.
+            return
+        self._lines = LineReader(self._buffer, encoding=self.encoding)
+        self._reader = csv.reader(self._lines)
+        self.row_offsets = array("q")
+
+    def _offset(self) -> t.Union[int, None]:
+        """Returns the byte offset of the end of the last row read, if known."""
+        return None if self._lines is None else self._lines.offset
+
+    def _read_header(self):
+        """Reads the first row of the file and checks it is a valid header."""
+        try:
+            header = next(self._reader)
+        except StopIteration:
+            header = []
+        if not header:
+            self._header_error = err.make_empty_file_error()
+            self.close()
+            return
+        if len(header) != len(set(header)):
+            self._header_error = err.make_duplicate_header_error()
+        self.header = header
+
+    @staticmethod
+    def _make_syntax_error(exception: Exception) -> err.ValidationError:
+        """Wraps an exception raised while parsing the file in a malformed-file error."""
+        error = err.make_malformed_file_error()
+        if isinstance(exception, csv.Error):
+            error.message = f"CSV parsing error: {str(exception)}"
+        else:
+            error.message = str(exception)
+        return error
+
+    def __iter__(self) -> t.Iterator[t.Dict]:
+        """Yields the rows of the csv file as dicts.
+
+        Iteration stops at the first row that does not have the same number
+        of fields as the header.  Rows are not yielded at all if the header is
+        invalid, but the file is still scanned so that every format error is
+        reported.
+        """
+        if self.header is None or self._reader is None:
+            return
+        expected_fields = len(self.header)
+        yield_rows = self._header_error is None
+        row_offsets = self.row_offsets
+        try:
+            for line_num, row in enumerate(self._reader, start=1):
+                if len(row) != expected_fields:
+                    error = err.make_malformed_file_error()
+                    error.message = f"Row {line_num} has {len(row)} fields while the header has {expected_fields} fields."
+                    self._syntax_error = error
+                    break
+                self.row_count = line_num
+                if row_offsets is not None:
+                    row_offsets.append(self.end_offset)
+                    self.end_offset = self._offset()
+                if yield_rows:
+                    yield dict(zip(self.header, row))
+        except Exception as e:
+            self._syntax_error = self._make_syntax_error(e)
+        finally:
+            self.close()
+
+    def byte_range(self, line: int) -> t.Tuple[int, int]:
+        """Returns the byte range of a row, the header excluded.
+
+        Requires `track_offsets`, and the row to have been read.
+
+        Args:
+            line: the row number, 1 for the first row after the header
+
+        Returns:
+            the offsets of the start and end of the row
+
+        """
+        start = self.row_offsets[line - 1]
+        end = (
+            self.row_offsets[line] if line < len(self.row_offsets) else self.end_offset
+        )
+        return start, end
+
+    def close(self) -> None:
+        """Closes the underlying file, if it is still open."""
+        self._files.close()
+        self._buffer = None
+        self._lines = None
+        self._reader = None
+
+    @property
+    def errors(self) -> t.Union[t.List[t.Dict], None]:
+        """Returns the format errors found so far, in the standard error format."""
+        errors = [e for e in (self._syntax_error, self._header_error) if e]
+        if errors:
+            return Loader.handle_errors(errors)
+        return None
+
+
 class CsvLoader(Loader):
     """Loads a csv object."""
 
     name = "csv"
-    has_config = False
+    has_config = True
+    streaming = True
 
-    def __init__(self):
-        """Surprisingly this does not initialize this class.  NO, OF COURSE IT DOES, WHY DO I NEED A DOCSTRING?"""
+    def __init__(self, config: t.Dict[str, t.Any] = None):
+        """Surprisingly this does not initialize this class.  NO, OF COURSE IT DOES, WHY DO I NEED A DOCSTRING?
+
+        Args:
+            config: the loader config, `byte_ranges` to record the byte
+                range of every row of the opened streams, and `encoding`, the
+                encoding of the files, the locale encoding by default
+        """
         super().__init__()
+        config = config or {}
+        self.byte_ranges = config.get("byte_ranges", False)
+        self.encoding = config.get("encoding")
+
+    def open_object(self, file_path: Path) -> t.Tuple[CsvRowStream, None]:
+        """Returns a stream over the rows of the csv file, see `stream_object`."""
+        stream = self.stream_object(
+            file_path, track_offsets=self.byte_ranges, encoding=self.encoding
+        )
+        return stream, None
 
     def load_object(self, file_path: Path) -> t.Tuple[t.List[t.Dict], t.List[t.Dict]]:
         """Returns the content of the csv file as a list of dicts."""
         try:
-            format_errors = self.validate_file_format(file_path)
-            if format_errors:
-                return None, format_errors
-            with open(file_path) as csv_file:
-                csv_dict = csv.DictReader(csv_file)
-                return list(csv_dict), None
+            stream = self.stream_object(file_path, encoding=self.encoding)
+            rows = list(stream)
+            if stream.errors:
+                return None, stream.errors
+            return rows, None
         except (FileNotFoundError, TypeError) as e:
             raise ValueError(f"Error loading CSV object: {e}")
 
+    @staticmethod
+    def stream_object(
+        file_path: Path, track_offsets: bool = False, encoding: str = None
+    ) -> CsvRowStream:
+        """Returns a stream over the rows of the csv file.
+
+        Unlike `load_object`, the rows are not held in memory: they are parsed
+        as the stream is iterated, and format errors are available on the
+        stream's `errors` attribute once it has been consumed.  With
+        `track_offsets`, the stream records the byte offset of every row.
+        The file is decoded from `encoding`, the locale encoding by default.
+        """
+        return CsvRowStream(file_path, track_offsets=track_offsets, encoding=encoding)
+
     def validate_file_format(
         self, csv_path: Path
     ) -> t.Union[err.ValidationError, None]:
         """Validates some basic file format items."""
-        errors = []
-        try:
-            with open(csv_path) as csv_file:
-                # First check to see if we have the correct number of commas in each row
-                syntax_errors = self.validate_num_commas(csv_file)
-                if syntax_errors:
-                    errors.append(syntax_errors)
-                # Then check to see if any headers are duplicated
-                csv_file.seek(0)
-                header_errors = self.validate_file_header(csv_file)
-                if header_errors:
-                    errors.append(header_errors)
-        # If we had an error here loading the file or otherwise, captuer that.
-        except Exception as e:
-            unknown_error = err.make_malformed_file_error()
-            unknown_error.message = str(e)
-            errors.append(unknown_error)
-
-        if errors:
-            return self.handle_errors(errors)
-        return None
+        stream = self.stream_object(csv_path, encoding=self.encoding)
+        for _ in stream:
+            pass
+        return stream.errors
 
     @staticmethod
     def validate_num_commas(
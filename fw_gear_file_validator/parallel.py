@@ -0,0 +1,294 @@
+"""parallel.py.
+
+Validates large CSV files on several processes.
+
+The file is split into byte-range shards that start and end on row
+boundaries (newlines outside of quoted fields), each shard is validated by a
+worker process holding its own compiled validator, and the per-shard errors
+are merged back in file order with their global line numbers.
+"""
+
+import concurrent.futures
+import csv
+import io
+import locale
+import logging
+import os
+import typing as t
+from pathlib import Path
+
+from fw_gear_file_validator import validator as val
+from fw_gear_file_validator.loader import CsvLoader
+
+log = logging.getLogger(__name__)
+
+BLOCK_SIZE = 1024 * 1024
+SHARD_SIZE = 16 * 1024 * 1024
+
+# Files smaller than this are not worth the cost of starting worker processes.
+MIN_PARALLEL_SIZE = 1024 * 1024
+
+# Set in each worker process by _init_worker.
+_worker_validator = None
+
+
+def find_row_boundaries(
+    file_path: Path, targets: t.Callable[[int], t.Iterator[int]]
+) -> t.List[int]:
+    """Finds row boundaries at or after a set of byte offsets.
+
+    A row boundary is the offset just after a newline that is not inside a
+    quoted field.  Quotes inside quoted fields are escaped by doubling them,
+    so a newline ends a row when an even number of quotes precedes it.
+
+    Args:
+        file_path: the csv file to scan
+        targets: called with the offset of the end of the header, returns
+            increasing byte offsets to find the next row boundary for
+
+    Returns:
+        the offset of the end of the header, followed by the row boundary
+        found for each target
+
+    """
+    boundaries = []
+    pending = None
+    target = 0
+    quotes = 0
+    offset = 0
+    with open(file_path, "rb") as fp:
+        while target is not None:
+            block = fp.read(BLOCK_SIZE)
+            if not block:
+                break
+            scanned = 0
+            while target is not None:
+                newline = block.find(b"\n", max(scanned, target - offset))
+                if newline == -1:
+                    break
+                quotes += block.count(b'"', scanned, newline)
+                scanned = newline + 1
+                if quotes % 2:
+                    continue
+                boundaries.append(offset + scanned)
+                if pending is None:
+                    pending = targets(offset + scanned)
+                target = _next_target(pending, boundaries[-1])
+            quotes += block.count(b'"', scanned)
+            offset += len(block)
+    return boundaries
+
+
+def _next_target(targets: t.Iterator[int], boundary: int) -> t.Union[int, None]:
+    """Returns the next target past a boundary, or None when there are none left."""
+    for target in targets:
+        if target >= boundary:
+            return target
+    return None
+
+
+def shard_csv(
+    file_path: Path, n_shards: int, shard_size: int = SHARD_SIZE
+) -> t.Tuple[int, t.List[t.Tuple[int, int]]]:
+    """Splits a csv file into byte ranges that start and end on row boundaries.
+
+    Args:
+        file_path: the csv file to split
+        n_shards: the minimum number of shards to split the rows in
+        shard_size: the maximum size of a shard, in bytes, when the file is
+            large enough to need more than n_shards shards
+
+    Returns:
+        the offset of the end of the header, and the (start, end) byte range
+        of each shard
+
+    """
+    size = os.path.getsize(file_path)
+
+    def targets(header_end: int) -> t.Iterator[int]:
+        body = size - header_end
+        count = max(n_shards, -(-body // shard_size))
+        for i in range(1, count):
+            yield header_end + i * body // count
+
+    boundaries = find_row_boundaries(file_path, targets)
+    if not boundaries:
+        return size, []
+    header_end = boundaries[0]
+    edges = sorted({*boundaries, size})
+    shards = [(start, end) for start, end in zip(edges, edges[1:]) if end > start]
+    return header_end, shards
+
+
+def _init_worker(validator_class: type, schema: dict, state: dict = None) -> None:
+    """Builds the validator used by a worker process."""
+    global _worker_validator
+    _worker_validator = validator_class(schema, state=state)
+
+
+def _validate_shard(
+    args: t.Tuple[Path, int, int, t.List[str], bool, str],
+) -> t.Tuple[int, t.List[t.Dict], bool]:
+    """Validates the rows of a single shard.
+
+    Args:
+        args: the file path, the shard byte range, the csv header, the
+            drop_empty option and the encoding of the file
+
+    Returns:
+        the number of rows in the shard, the errors found (with line numbers
+        relative to the start of the shard), and False if the shard could not
+        be parsed.
+
+    """
+    file_path, start, end, header, drop_empty, encoding = args
+    rows, parsed = read_csv_rows(file_path, start, end, header, encoding)
+    if not parsed:
+        return len(rows), [], False
+
+    errors = list(_worker_validator.iter_row_errors(rows, drop_empty=drop_empty))
+    return len(rows), errors, True
+
+
+def read_csv_rows(
+    file_path: Path,
+    start: int,
+    end: int,
+    header: t.List[str],
+    encoding: str,
+    data: bytes = None,
+) -> t.Tuple[t.List[t.Dict], bool]:
+    """Parses the rows of a byte range of a csv file.
+
+    Args:
+        file_path: the csv file
+        start, end: the byte range, starting and ending on row boundaries
+        header: the csv header
+        encoding: the encoding of the file
+        data: the content of the byte range, if already read
+
+    Returns:
+        the rows parsed, as dicts keyed by the header, and False if the range
+        could not be parsed
+
+    """
+    if data is None:
+        with open(file_path, "rb") as fp:
+            fp.seek(start)
+            data = fp.read(end - start)
+
+    rows = []
+    try:
+        reader = csv.reader(io.StringIO(data.decode(encoding), newline=""))
+        for row in reader:
+            if len(row) != len(header):
+                return rows, False
+            rows.append(dict(zip(header, row)))
+    except (csv.Error, UnicodeDecodeError):
+        return rows, False
+    return rows, True
+
+
+def validate_csv_file(
+    file_path: Path,
+    csv_validator: val.CsvValidator,
+    workers: int,
+    drop_empty: bool = True,
+    shard_size: int = SHARD_SIZE,
+) -> t.Tuple[bool, t.List[t.Dict]]:
+    """Validates a csv file by splitting it into shards validated in parallel.
+
+    The result is the same as streaming the file from `CsvLoader.stream_object`
+    into `csv_validator.validate`, format errors included.  If the file
+    cannot be split (for instance because it is malformed), it is validated
+    serially instead.
+
+    Args:
+        file_path: the csv file to validate
+        csv_validator: the validator to use, rebuilt in every worker process
+        workers: the number of worker processes, 0 for one per CPU
+        drop_empty: if True, remove empty columns from each row before validating
+        shard_size: the maximum size of a shard, in bytes
+
+    Returns:
+        valid: True if no errors, False otherwise.
+        errors: Any errors generated during validation.
+
+    """
+    workers = workers or os.cpu_count() or 1
+    stream = CsvLoader.stream_object(file_path)
+    stream.close()
+    if stream.header is None or stream.errors:
+        return _validate_serially(file_path, csv_validator, drop_empty)
+
+    _, shards = shard_csv(file_path, workers, shard_size=shard_size)
+    if not shards:
+        return _validate_serially(file_path, csv_validator, drop_empty)
+
+    valid, header_errors = csv_validator.validate_header([dict.fromkeys(stream.header)])
+    if not valid:
+        return valid, header_errors
+
+    encoding = locale.getpreferredencoding(False)
+    shard_args = [
+        (file_path, start, end, stream.header, drop_empty, encoding)
+        for start, end in shards
+    ]
+    schema = csv_validator.validator.schema
+    state = csv_validator.export_state()
+    if len(shards) == 1 or os.path.getsize(file_path) < MIN_PARALLEL_SIZE:
+        _init_worker(type(csv_validator), schema, state)
+        merged = _merge_shards(map(_validate_shard, shard_args))
+    else:
+        log.info(
+            "Validating %s in %s shards on %s workers", file_path, len(shards), workers
+        )
+        with concurrent.futures.ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=_init_worker,
+            initargs=(type(csv_validator), schema, state),
+        ) as executor:
+            merged = _merge_shards(executor.map(_validate_shard, shard_args))
+            executor.shutdown(cancel_futures=True)
+
+    if merged is None:
+        return _validate_serially(file_path, csv_validator, drop_empty)
+    return merged
+
+
+def _merge_shards(
+    results: t.Iterable[t.Tuple[int, t.List[t.Dict], bool]],
+) -> t.Union[t.Tuple[bool, t.List[t.Dict]], None]:
+    """Merges the shard results in file order, shifting their line numbers.
+
+    Returns:
+        valid and errors as returned by `validate_csv_file`, or None if a
+        shard could not be parsed or the file has no rows.
+
+    """
+    errors = []
+    row_offset = 0
+    for row_count, shard_errors, parsed in results:
+        if not parsed:
+            return None
+        for error in shard_errors:
+            if isinstance(error["location"], dict) and "line" in error["location"]:
+                error["location"]["line"] += row_offset
+        errors.extend(shard_errors)
+        row_offset += row_count
+
+    if not row_offset:
+        return None
+    valid = not errors
+    return valid, errors
+
+
+def _validate_serially(
+    file_path: Path, csv_validator: val.CsvValidator, drop_empty: bool
+) -> t.Tuple[bool, t.List[t.Dict]]:
+    """Streams the file into the validator on the current process."""
+    with CsvLoader.stream_object(file_path) as stream:
+        valid, errors = csv_validator.validate(stream, drop_empty=drop_empty)
+    if stream.errors:
+        return False, stream.errors
+    return valid, errors
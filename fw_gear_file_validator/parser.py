@@ -1,20 +1,36 @@
 """Parser module to parse gear config.json."""
 
+import json
 from pathlib import Path
-from typing import Tuple, Union
-
-from flywheel_gear_toolkit import GearToolkitContext
+from typing import TYPE_CHECKING, List, Tuple, Union
 
+from fw_gear_file_validator.errors import REPORT_MODES
+from fw_gear_file_validator.jsonio import JSON_BACKENDS
+from fw_gear_file_validator.limits import ErrorLimits
+from fw_gear_file_validator.sinks import ERROR_OUTPUTS
 from fw_gear_file_validator.utils import FwReference
+from fw_gear_file_validator.validator import CSV_ENGINES
+
+if TYPE_CHECKING:  # pragma: no cover
+    from flywheel_gear_toolkit import GearToolkitContext
 
 level_dict = {"Validate File Contents": "file", "Validate Flywheel Objects": "flywheel"}
-SUPPORTED_FILE_EXTENSIONS = {".json": "json", ".csv": "csv"}
-SUPPORTED_FLYWHEEL_MIMETYPES = {"application/json": "json", "text/csv": "csv"}
+SUPPORTED_FILE_EXTENSIONS = {
+    ".json": "json",
+    ".csv": "csv",
+    ".ndjson": "ndjson",
+    ".jsonl": "ndjson",
+}
+SUPPORTED_FLYWHEEL_MIMETYPES = {
+    "application/json": "json",
+    "text/csv": "csv",
+    "application/x-ndjson": "ndjson",
+}
 
 
 def parse_config(
-    context: GearToolkitContext,
-) -> Tuple[bool, str, Path, FwReference, dict]:
+    context: "GearToolkitContext",
+) -> Tuple[bool, str, Path, FwReference, dict, dict]:
     """Parses necessary items out of the context object."""
     debug = context.config.get("debug")
     tag = context.config.get("tag")
@@ -23,6 +39,8 @@ def parse_config(
     validation_level = level_dict[context.config.get("validation_level")]
 
     file_to_validate = context.get_input("input_file")
+    if not file_to_validate:
+        raise ValueError("No input file or batch of files provided for validation")
     ext, mime = get_filetype_data(file_to_validate)
 
     fw_ref = FwReference.init_from_gear_input(
@@ -44,9 +62,142 @@ def parse_config(
         # No need to validate file type if we're not validating the file contents.
         validate_filetype(ext, mime)
 
-    loader_config = {"add_parents": add_parents}
+    loader_config = {
+        "add_parents": add_parents,
+        "byte_ranges": context.config.get("error_byte_ranges", False),
+    }
+    validator_config = parse_validator_config(context)
+
+    return debug, tag, schema_file_path, fw_ref, loader_config, validator_config
+
+
+def parse_validator_config(context: "GearToolkitContext") -> dict:
+    """Parses the options controlling how files are validated."""
+    workers = context.config.get("workers", 1)
+    if workers < 0:
+        raise ValueError("workers must be 0 (one per CPU) or a positive number")
+    schema_cache_dir = context.config.get("schema_cache_dir") or None
+    error_detail = context.config.get("error_detail", "full")
+    report_mode = context.config.get("report_mode", "errors")
+    if report_mode not in REPORT_MODES:
+        raise ValueError(
+            f"report mode {report_mode} not supported, use one of {REPORT_MODES}"
+        )
+    error_output = context.config.get("error_output", "metadata")
+    if error_output not in ERROR_OUTPUTS:
+        raise ValueError(
+            f"error output {error_output} not supported, use one of {ERROR_OUTPUTS}"
+        )
+    json_backend = context.config.get("json_backend", "auto")
+    if json_backend not in JSON_BACKENDS:
+        raise ValueError(
+            f"json backend {json_backend} not supported, use one of {JSON_BACKENDS}"
+        )
+    engine = context.config.get("engine", "row")
+    if engine not in CSV_ENGINES:
+        raise ValueError(f"csv engine {engine} not supported, use one of {CSV_ENGINES}")
+    checkpoint_dir = context.config.get("checkpoint_dir") or None
+    skip_unchanged = context.config.get("skip_unchanged", False)
+    state_file = context.config.get("state_file") or None
+    error_limits = ErrorLimits(
+        max_errors=context.config.get("max_errors", 0),
+        fail_fast=context.config.get("fail_fast", False),
+        max_per_column=context.config.get("max_errors_per_column", 0),
+        max_per_code=context.config.get("max_errors_per_code", 0),
+        sample_fraction=context.config.get("sample_fraction", 1.0),
+        sample_mode=context.config.get("sample_mode", "stride"),
+    )
+    return {
+        "workers": workers,
+        "schema_cache_dir": schema_cache_dir,
+        "error_detail": error_detail,
+        "error_limits": error_limits,
+        "report_mode": report_mode,
+        "error_output": error_output,
+        "skip_unchanged": skip_unchanged,
+        "state_file": state_file,
+        "checkpoint_dir": checkpoint_dir,
+        "json_backend": json_backend,
+        "engine": engine,
+    }
+
+
+def get_batch_file_ids(context: "GearToolkitContext") -> List[str]:
+    """Returns the ids of the files to validate in batch mode, if any.
+
+    The ids are read from the `batch_manifest` input and the `batch_file_ids`
+    config option.  Duplicates are removed, keeping the first occurrence.
+    """
+    file_ids = (context.config.get("batch_file_ids") or "").replace(",", " ").split()
+    manifest_path = context.get_input_path("batch_manifest")
+    if manifest_path:
+        file_ids.extend(read_batch_manifest(Path(manifest_path)))
+    return list(dict.fromkeys(file_ids))
+
+
+def read_batch_manifest(manifest_path: Path) -> List[str]:
+    """Reads the file ids listed in a batch manifest.
+
+    The manifest is either a JSON array of file ids (or of objects with a
+    `file_id` key), or a text file with one file id per line.  Blank lines and
+    lines starting with `#` are ignored.
+
+    Args:
+        manifest_path: the manifest file
 
-    return debug, tag, schema_file_path, fw_ref, loader_config
+    Returns:
+        the file ids, in manifest order
+
+    """
+    with open(manifest_path, "r", encoding="UTF-8") as fp:
+        content = fp.read()
+    if content.lstrip().startswith("["):
+        try:
+            entries = json.loads(content)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Invalid batch manifest {manifest_path}: {e}")
+        file_ids = []
+        for entry in entries:
+            if isinstance(entry, dict):
+                entry = entry.get("file_id")
+            if not isinstance(entry, str) or not entry:
+                raise ValueError(
+                    f"Invalid batch manifest {manifest_path}: "
+                    f"entry {entry!r} is not a file id"
+                )
+            file_ids.append(entry)
+        return file_ids
+
+    lines = (line.strip() for line in content.splitlines())
+    return [line for line in lines if line and not line.startswith("#")]
+
+
+def parse_batch_config(
+    context: "GearToolkitContext",
+) -> Tuple[bool, str, Path, str, dict, dict]:
+    """Parses necessary items out of the context object, in batch mode."""
+    debug = context.config.get("debug")
+    tag = context.config.get("tag")
+    add_parents = context.config.get("add_parents")
+    schema_file_path = Path(context.get_input_path("validation_schema"))
+    validation_level = level_dict[context.config.get("validation_level")]
+    if validation_level == "file" and add_parents:
+        raise ValueError("Cannot attach flywheel parents to file-content validation")
+
+    loader_config = {
+        "add_parents": add_parents,
+        "byte_ranges": context.config.get("error_byte_ranges", False),
+    }
+    validator_config = parse_validator_config(context)
+
+    return (
+        debug,
+        tag,
+        schema_file_path,
+        validation_level,
+        loader_config,
+        validator_config,
+    )
 
 
 def get_fw_type_info(input_file: dict) -> tuple[str, str]:
@@ -102,6 +253,7 @@ def identify_file_type(
 ) -> str:
     """Given a flywheel config input file object, identify a valid file type if possible."""
     # see if the input file object has a value
+    input_file_type = None
     if ext:
         input_file_type = SUPPORTED_FILE_EXTENSIONS.get(ext)
     elif mime:
@@ -0,0 +1,385 @@
+"""service.py.
+
+Validates files in a long-running local HTTP service.
+
+Starting the gear for each file means importing its modules and compiling
+the schema every time.  The service keeps worker processes running, each
+holding the compiled validators of the schemas it has seen (through the
+validator cache, warmed at start up with the schemas given), and validates
+the files it is sent on them:
+
+    python -m fw_gear_file_validator serve --schema visits=visits.json --port 8080
+
+Endpoints:
+    POST /validate: validates a file, the JSON body holds
+        - "path": a local file path, or "content": the content of the file
+          as text, with "file_type"
+        - "schema_name": the name of a schema the service was started with,
+          or "schema": a JSON schema
+        - optionally "file_type" and "report_mode"
+        and the response is the result of `cli.validate_file`, whose errors
+        are in the standard error format.
+    GET /metrics: queue depth, request counts and latency percentiles.
+    GET /health: 200 while the service is running.
+
+At most `workers` files are validated at once and `max_queue` more wait for
+a worker.  Requests beyond that are rejected with a 503 and a Retry-After
+header, so that clients back off instead of piling up.
+
+Requests can read any local file the service can, so it only listens on
+loopback addresses unless `allow_remote` is set (`--allow-remote`).
+"""
+
+import collections
+import concurrent.futures
+import contextlib
+import ipaddress
+import json
+import logging
+import os
+import statistics
+import tempfile
+import threading
+import time
+import typing as t
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+from fw_gear_file_validator import errors as err
+from fw_gear_file_validator import jsonio, validator
+from fw_gear_file_validator.cli import validate_file
+from fw_gear_file_validator.parser import SUPPORTED_FILE_EXTENSIONS
+
+log = logging.getLogger(__name__)
+
+DEFAULT_MAX_QUEUE = 32
+# Latencies kept for the percentiles of the metrics.
+LATENCY_WINDOW = 1024
+# Seconds clients are asked to wait when the queue is full.
+RETRY_AFTER = 1
+FILE_SUFFIXES = {file_type: ext for ext, file_type in SUPPORTED_FILE_EXTENSIONS.items()}
+
+
+class Overloaded(Exception):
+    """Raised when every worker is busy and the queue is full."""
+
+
+def _init_worker(schemas: t.List[dict], error_detail: str, json_backend: str) -> None:
+    """Applies the error settings and compiles the schemas in a worker process."""
+    err.set_error_detail(error_detail)
+    jsonio.set_json_backend(json_backend)
+    for schema in schemas:
+        for file_type in ("json", "csv"):
+            try:
+                validator.initialize_validator(file_type, schema)
+            except ValueError as e:
+                log.debug("Schema not usable for %s files: %s", file_type, e)
+
+
+class ValidationService:
+    """Validates files on a bounded pool of warm workers, and keeps metrics."""
+
+    def __init__(
+        self,
+        schemas: t.Dict[str, dict] = None,
+        workers: int = 1,
+        max_queue: int = DEFAULT_MAX_QUEUE,
+        processes: bool = True,
+    ):
+        """Starts the worker pool.
+
+        Args:
+            schemas: the schemas requests can refer to by name, compiled by
+                every worker when it starts
+            workers: the number of files validated at once, 0 for one per CPU
+            max_queue: the number of requests waiting for a worker before
+                new ones are rejected
+            processes: if True the workers are processes, else threads (which
+                only validate one file at a time, but start instantly)
+        """
+        self.schemas = dict(schemas or {})
+        self.workers = workers or os.cpu_count() or 1
+        self.max_queue = max_queue
+        self._slots = threading.BoundedSemaphore(self.workers + max_queue)
+        self._lock = threading.Lock()
+        self._latencies = collections.deque(maxlen=LATENCY_WINDOW)
+        self.started = time.time()
+        self.counts = {"completed": 0, "rejected": 0, "failed": 0}
+        self.in_flight = 0
+        initargs = (list(self.schemas.values()), err.ERROR_DETAIL, jsonio.JSON_BACKEND)
+        if processes:
+            self._executor = concurrent.futures.ProcessPoolExecutor(
+                max_workers=self.workers, initializer=_init_worker, initargs=initargs
+            )
+        else:
+            _init_worker(*initargs)
+            self._executor = concurrent.futures.ThreadPoolExecutor(
+                max_workers=self.workers
+            )
+
+    def validate(self, request: t.Dict[str, t.Any]) -> t.Dict[str, t.Any]:
+        """Validates the file of a request, waiting for a worker if needed.
+
+        Args:
+            request: the body of a /validate request
+
+        Returns:
+            the result of the validation, see `cli.FileResult.to_dict`
+
+        Raises:
+            Overloaded: if every worker is busy and the queue is full
+            ValueError: if the request is invalid
+
+        """
+        schema = self._request_schema(request)
+        file_type = request.get("file_type")
+        if file_type is not None and file_type not in FILE_SUFFIXES:
+            raise ValueError(f"file type {file_type} is not supported")
+        report_mode = request.get("report_mode", "errors")
+        if report_mode not in err.REPORT_MODES:
+            raise ValueError(f"report mode {report_mode} not supported")
+        if "path" not in request and "content" not in request:
+            raise ValueError("the request needs a 'path' or a 'content'")
+        if "content" in request and not file_type:
+            raise ValueError("a 'file_type' is needed with a 'content'")
+
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.counts["rejected"] += 1
+            raise Overloaded()
+        start = time.perf_counter()
+        with self._lock:
+            self.in_flight += 1
+        try:
+            # Contents are written to the temporary file as UTF-8.
+            encoding = "UTF-8" if "content" in request else None
+            with _request_file(request, file_type) as path:
+                result = self._executor.submit(
+                    validate_file,
+                    path,
+                    schema,
+                    file_type,
+                    report_mode=report_mode,
+                    encoding=encoding,
+                ).result()
+            result = result.to_dict()
+            if "content" in request:
+                result["file"] = None
+            outcome = "failed" if result["state"] == "ERROR" else "completed"
+            return result
+        except BaseException:
+            outcome = "failed"
+            raise
+        finally:
+            latency = time.perf_counter() - start
+            with self._lock:
+                self.in_flight -= 1
+                self.counts[outcome] += 1
+                self._latencies.append(latency)
+            self._slots.release()
+
+    def _request_schema(self, request: t.Dict[str, t.Any]) -> dict:
+        """Returns the schema a request refers to."""
+        if "schema" in request:
+            if not isinstance(request["schema"], dict):
+                raise ValueError("'schema' must be a JSON object")
+            return request["schema"]
+        name = request.get("schema_name")
+        if name is None and len(self.schemas) == 1:
+            return next(iter(self.schemas.values()))
+        if name not in self.schemas:
+            raise ValueError(
+                f"unknown schema {name}, use one of {sorted(self.schemas)}"
+            )
+        return self.schemas[name]
+
+    def metrics(self) -> t.Dict[str, t.Any]:
+        """Returns the queue depth, request counts and latencies of the service."""
+        with self._lock:
+            latencies = sorted(self._latencies)
+            in_flight = self.in_flight
+            counts = dict(self.counts)
+        metrics = {
+            "workers": self.workers,
+            "max_queue": self.max_queue,
+            "in_flight": in_flight,
+            "queue_depth": max(in_flight - self.workers, 0),
+            **counts,
+            "uptime_seconds": round(time.time() - self.started, 3),
+            "latency_ms": None,
+        }
+        if latencies:
+            metrics["latency_ms"] = {
+                "count": len(latencies),
+                "mean": round(statistics.fmean(latencies) * 1000, 3),
+                "p50": round(_percentile(latencies, 0.5) * 1000, 3),
+                "p95": round(_percentile(latencies, 0.95) * 1000, 3),
+                "p99": round(_percentile(latencies, 0.99) * 1000, 3),
+                "max": round(latencies[-1] * 1000, 3),
+            }
+        return metrics
+
+    def close(self) -> None:
+        """Stops the workers, cancelling the files waiting for one."""
+        self._executor.shutdown(cancel_futures=True)
+
+
+def _percentile(sorted_values: t.List[float], fraction: float) -> float:
+    """Returns the nearest-rank percentile of sorted values."""
+    index = max(int(round(fraction * len(sorted_values) + 0.5)) - 1, 0)
+    return sorted_values[min(index, len(sorted_values) - 1)]
+
+
+@contextlib.contextmanager
+def _request_file(
+    request: t.Dict[str, t.Any], file_type: t.Optional[str]
+) -> t.Iterator[Path]:
+    """Yields the path of the file of a request, a temporary file for a 'content'."""
+    if "content" not in request:
+        yield Path(request["path"])
+        return
+    content = request["content"]
+    if not isinstance(content, str):
+        content = json.dumps(content)
+    fd, tmp_path = tempfile.mkstemp(suffix=FILE_SUFFIXES[file_type])
+    try:
+        with os.fdopen(fd, "w", encoding="UTF-8") as fp:
+            fp.write(content)
+        yield Path(tmp_path)
+    finally:
+        os.unlink(tmp_path)
+
+
+class ServiceRequestHandler(BaseHTTPRequestHandler):
+    """Serves the endpoints of the validation service."""
+
+    server_version = "fw-file-validator"
+    protocol_version = "HTTP/1.1"
+
+    @property
+    def service(self) -> ValidationService:
+        """The service of the server."""
+        return self.server.service
+
+    def do_GET(self) -> None:
+        """Serves /health and /metrics."""
+        if self.path == "/health":
+            self._send(HTTPStatus.OK, {"status": "ok"})
+        elif self.path == "/metrics":
+            self._send(HTTPStatus.OK, self.service.metrics())
+        else:
+            self._send(HTTPStatus.NOT_FOUND, {"error": f"unknown path {self.path}"})
+
+    def do_POST(self) -> None:
+        """Serves /validate."""
+        if self.path != "/validate":
+            self._send(HTTPStatus.NOT_FOUND, {"error": f"unknown path {self.path}"})
+            return
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            request = json.loads(self.rfile.read(length) or b"null")
+            if not isinstance(request, dict):
+                raise ValueError("the request body must be a JSON object")
+            self._send(HTTPStatus.OK, self.service.validate(request))
+        except Overloaded:
+            self._send(
+                HTTPStatus.SERVICE_UNAVAILABLE,
+                {"error": "every worker is busy and the queue is full"},
+                {"Retry-After": str(RETRY_AFTER)},
+            )
+        except ValueError as e:
+            self._send(HTTPStatus.BAD_REQUEST, {"error": str(e)})
+        except Exception as e:
+            log.exception("Validation failed")
+            self._send(HTTPStatus.INTERNAL_SERVER_ERROR, {"error": str(e)})
+
+    def _send(
+        self, status: HTTPStatus, body: t.Any, headers: t.Dict[str, str] = None
+    ) -> None:
+        """Sends a JSON response."""
+        payload = json.dumps(body, default=str).encode("UTF-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, message_format: str, *args: t.Any) -> None:
+        """Logs requests through the module logger instead of stderr."""
+        log.debug("%s %s", self.address_string(), message_format % args)
+
+
+class ValidationServer(ThreadingHTTPServer):
+    """An HTTP server handing its requests to a validation service."""
+
+    daemon_threads = True
+
+    def __init__(
+        self,
+        address: t.Tuple[str, int],
+        service: ValidationService,
+        allow_remote: bool = False,
+    ):
+        """Binds the server to an address, port 0 picks a free port.
+
+        The service is closed if the server cannot be started.
+
+        Args:
+            address: the host and port to listen on
+            service: the service handling the requests
+            allow_remote: if True, the server may listen on an address other
+                hosts can reach
+
+        Raises:
+            ValueError: if the host is not a loopback address and
+                `allow_remote` is not set
+
+        """
+        self.service = service
+        host = address[0]
+        try:
+            if not is_loopback(host):
+                if not allow_remote:
+                    raise ValueError(
+                        f"refusing to listen on {host or 'every address'}: "
+                        "requests can read any local file, set allow_remote "
+                        "to listen on non-loopback addresses"
+                    )
+                log.warning("Listening on %s, reachable from other hosts", host)
+            super().__init__(address, ServiceRequestHandler)
+        except BaseException:
+            service.close()
+            raise
+
+    def server_close(self) -> None:
+        """Closes the socket and stops the service workers."""
+        super().server_close()
+        self.service.close()
+
+
+def is_loopback(host: str) -> bool:
+    """True if a host name or address only accepts connections from this host."""
+    if host == "localhost":
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+
+def serve(
+    service: ValidationService,
+    host: str = "127.0.0.1",
+    port: int = 8080,
+    allow_remote: bool = False,
+) -> None:  # pragma: no cover
+    """Serves requests until interrupted, see `ValidationServer`."""
+    with ValidationServer((host, port), service, allow_remote) as server:
+        log.info("Validation service listening on http://%s:%s", *server.server_address)
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            log.info("Stopping the validation service")
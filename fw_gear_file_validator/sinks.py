@@ -0,0 +1,262 @@
+"""sinks.py.
+
+Destinations for the errors found during validation.
+
+Errors are written to a sink one at a time, as the validator produces them.
+`MemoryErrorSink` keeps them in a list and saves them in the QC result, like
+the gear always did.  `NdjsonErrorSink` streams them to a compressed NDJSON
+file in the gear output directory instead, and only a summary of the errors
+and the name of the file go into the QC result, so memory use does not depend
+on the number of errors.
+
+The zstd compression requires the `zstandard` package, installed with the
+`zstd` extra.
+"""
+
+import contextlib
+import gzip
+import io
+import json
+import typing as t
+from abc import ABC, abstractmethod
+from pathlib import Path
+
+from fw_gear_file_validator.errors import make_qc_result
+from fw_gear_file_validator.limits import ErrorSummary
+from fw_gear_file_validator.utils import FwReference
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover
+    zstandard = None
+
+if t.TYPE_CHECKING:  # pragma: no cover
+    from flywheel_gear_toolkit import GearToolkitContext
+
+# "metadata" saves the errors in the QC result, the others in a sidecar file.
+ERROR_OUTPUTS = ("metadata", "ndjson-gzip", "ndjson-zstd")
+COMPRESSIONS = {"gzip": ".ndjson.gz", "zstd": ".ndjson.zst"}
+GZIP_LEVEL = 6
+
+
+class ErrorSink(ABC):
+    """Receives the errors of a validation, one at a time.
+
+    Sinks are context managers, and are closed when the context exits.
+    """
+
+    def __init__(self):
+        """Initializes an ErrorSink object."""
+        self.count = 0
+
+    def write(self, error: t.Dict) -> None:
+        """Writes one error, in the standard error format."""
+        self.count += 1
+
+    def write_all(self, errors: t.Iterable[t.Dict]) -> None:
+        """Writes every error of an iterable, consuming it lazily."""
+        for error in errors:
+            self.write(error)
+
+    def discard(self) -> None:
+        """Drops the errors written so far."""
+        self.count = 0
+
+    def close(self) -> None:
+        """Flushes and closes the sink."""
+
+    @abstractmethod
+    def qc_result(self, summary: ErrorSummary = None) -> t.Tuple[str, t.Dict]:
+        """Returns the state and data of the validation QC result."""
+
+    def __enter__(self) -> "ErrorSink":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+class MemoryErrorSink(ErrorSink):
+    """Keeps the errors in a list, saved in full in the QC result."""
+
+    def __init__(self):
+        """Initializes a MemoryErrorSink object."""
+        super().__init__()
+        self.errors = []
+
+    def write(self, error: t.Dict) -> None:
+        """Appends one error to the list."""
+        super().write(error)
+        self.errors.append(error)
+
+    def discard(self) -> None:
+        """Drops the errors written so far."""
+        super().discard()
+        self.errors = []
+
+    def qc_result(self, summary: ErrorSummary = None) -> t.Tuple[str, t.Dict]:
+        """Returns the state and data of the validation QC result."""
+        return make_qc_result(self.errors, summary)
+
+
+class NdjsonErrorSink(ErrorSink):
+    """Streams the errors to a compressed file, one JSON object per line.
+
+    The file is written even when there are no errors, so that downstream
+    tools always find it.
+    """
+
+    def __init__(self, file_path: t.Union[Path, str], compression: str = "gzip"):
+        """Initializes a NdjsonErrorSink object.
+
+        Args:
+            file_path: the file the errors are written to
+            compression: "gzip" or "zstd"
+        """
+        if compression not in COMPRESSIONS:
+            raise ValueError(
+                f"compression {compression} not supported, "
+                f"use one of {tuple(COMPRESSIONS)}"
+            )
+        if compression == "zstd" and zstandard is None:
+            raise ImportError(
+                "zstd compressed error files require zstandard, "
+                "install fw_gear_file_validator[zstd]"
+            )
+        super().__init__()
+        self.file_path = Path(file_path)
+        self.compression = compression
+        self._fp = self._open()
+
+    def _open(self) -> t.TextIO:
+        """Opens the file for writing, truncating it.
+
+        The file is closed again if the compressed stream cannot be set up.
+        """
+        with contextlib.ExitStack() as stack:
+            if self.compression == "gzip":
+                fp = stack.enter_context(
+                    gzip.open(
+                        self.file_path, "wt", encoding="UTF-8", compresslevel=GZIP_LEVEL
+                    )
+                )
+            else:
+                raw = stack.enter_context(open(self.file_path, "wb"))
+                writer = zstandard.ZstdCompressor().stream_writer(raw, closefd=True)
+                fp = io.TextIOWrapper(writer, encoding="UTF-8")
+            stack.pop_all()
+        return fp
+
+    def write(self, error: t.Dict) -> None:
+        """Writes one error as a line of JSON."""
+        super().write(error)
+        self._fp.write(json.dumps(error, separators=(",", ":"), default=str))
+        self._fp.write("\n")
+
+    def discard(self) -> None:
+        """Drops the errors written so far, by truncating the file."""
+        super().discard()
+        self._fp.close()
+        self._fp = self._open()
+
+    def close(self) -> None:
+        """Flushes and closes the file."""
+        if not self._fp.closed:
+            self._fp.close()
+
+    def qc_result(self, summary: ErrorSummary = None) -> t.Tuple[str, t.Dict]:
+        """Returns the state and data of the validation QC result.
+
+        The QC result points to the error file instead of holding the errors.
+        """
+        meta_dict = {
+            "error_file": self.file_path.name,
+            "error_format": f"ndjson+{self.compression}",
+            "error_count": self.count,
+        }
+        if summary is not None:
+            meta_dict.update(summary.to_qc_data())
+        return ("FAIL" if self.count else "PASS"), meta_dict
+
+
+def open_error_sink(
+    error_output: str, output_dir: t.Union[Path, str, None], file_name: str
+) -> ErrorSink:
+    """Returns the sink for an error output option.
+
+    Args:
+        error_output: one of ERROR_OUTPUTS
+        output_dir: where the error files are written
+        file_name: the name of the validated file, the error file is named after it
+
+    Returns:
+        the error sink
+
+    """
+    if error_output not in ERROR_OUTPUTS:
+        raise ValueError(
+            f"error output {error_output} not supported, use one of {ERROR_OUTPUTS}"
+        )
+    if error_output == "metadata":
+        return MemoryErrorSink()
+    compression = error_output.split("-", 1)[1]
+    file_path = (
+        Path(output_dir) / f"{file_name}.validation-errors{COMPRESSIONS[compression]}"
+    )
+    return NdjsonErrorSink(file_path, compression)
+
+
+def save_sink_metadata(
+    sink: ErrorSink,
+    input_file: FwReference,
+    gtk_context: "GearToolkitContext",
+    summary: ErrorSummary = None,
+    validation_hash: str = None,
+) -> t.Tuple[str, t.Dict]:
+    """Saves the QC result of the errors written to a sink.
+
+    Args:
+        sink: the sink the errors were written to
+        input_file: the validated file
+        gtk_context: the gear context
+        summary: what the error limits left out of the errors, if any
+        validation_hash: recorded with the result when set, see
+            `incremental.validation_hash`
+
+    Returns:
+        the state and data of the saved QC result
+
+    """
+    state, meta_dict = sink.qc_result(summary)
+    if validation_hash is not None:
+        meta_dict["validation_hash"] = validation_hash
+
+    gtk_context.metadata.add_qc_result(
+        input_file.name, "validation", state=state, **meta_dict
+    )
+    return state, meta_dict
+
+
+def save_sink_metadata_via_sdk(
+    sink: ErrorSink,
+    file_entry: t.Any,
+    gtk_context: "GearToolkitContext",
+    summary: ErrorSummary = None,
+    validation_hash: str = None,
+) -> t.Tuple[str, t.Dict]:
+    """Saves the QC result of the errors written to a sink, on a file that is not a gear input.
+
+    See `save_sink_metadata` and `errors.save_errors_metadata_via_sdk`.
+
+    Returns:
+        the state and data of the saved QC result
+
+    """
+    state, meta_dict = sink.qc_result(summary)
+    if validation_hash is not None:
+        meta_dict["validation_hash"] = validation_hash
+
+    gtk_context.metadata.add_qc_result_via_sdk(
+        file_entry, "validation", state=state, **meta_dict
+    )
+    return state, meta_dict
@@ -1,17 +1,25 @@
 """utils.py.
 
 Commonly used functions to aid in the execution of the main code.
+
+The Flywheel SDK is only imported by the code that talks to Flywheel, so
+validating local files does not load it.
 """
 
+import asyncio
 import logging
 import typing as t
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
 from functools import cached_property
 from pathlib import Path
 
-import flywheel
-import flywheel_gear_toolkit
-from flywheel_gear_toolkit.utils.datatypes import Container
+from fw_gear_file_validator.cache import ContainerCache
+
+if t.TYPE_CHECKING:  # pragma: no cover
+    import flywheel
+    import flywheel_gear_toolkit
+    from flywheel_gear_toolkit.utils.datatypes import Container
 
 PARENT_ORDER = [
     "group",
@@ -45,6 +53,8 @@ class FwReference:
         is_file: bool, True if the object is a file, False otherwise
         ref: dict, the reference to the object, basically the parent dictionary plus the object itself.
         _client: flywheel.Client, the flywheel client
+        container_cache: ContainerCache, if set the parent containers are
+            fetched through it
 
     Properties (cached):
         parent_type: str, container type of the object's parent
@@ -56,9 +66,9 @@ class FwReference:
 
     id: str = None
     input_object: t.Union[
-        flywheel.ContainerReference,
-        flywheel.FileReference,
-        flywheel.JobFileInput,
+        "flywheel.ContainerReference",
+        "flywheel.FileReference",
+        "flywheel.JobFileInput",
         dict,
     ] = None
     type: str = None
@@ -66,15 +76,17 @@ class FwReference:
     name: str = None
     file_type: str = None
     ref: dict = None
-    _client: flywheel.Client = None
+    _client: "flywheel.Client" = None
     contents: str = None
+    container_cache: ContainerCache = None
 
     @classmethod
     def init_from_gear_input(
         cls,
-        fw_client: flywheel.Client,
-        gear_input: t.Union[dict, flywheel.models.JobFileInput],
+        fw_client: "flywheel.Client",
+        gear_input: t.Union[dict, "flywheel.models.JobFileInput"],
         content: str = None,
+        container_cache: ContainerCache = None,
     ):
         """Initialize a flywheel reference object from a gear input file.
 
@@ -83,6 +95,7 @@ class FwReference:
             gear_input: a JobFileInput
             content: "file" or "flywheel", indicating if the desire is to load a file's content,
                 or the flywheel object.
+            container_cache: a cache to fetch the parent containers through
 
         Returns:
             FwReference
@@ -101,6 +114,45 @@ class FwReference:
             _client=fw_client,
             parents=dict(file_object.parents),
             contents=content,
+            container_cache=container_cache,
+        )
+
+    @classmethod
+    def init_from_file_entry(
+        cls,
+        fw_client: "flywheel.Client",
+        file_entry: "flywheel.FileEntry",
+        content: str = None,
+        file_path: Path = None,
+        file_type: str = None,
+        container_cache: ContainerCache = None,
+    ):
+        """Initialize a flywheel reference object from a flywheel file.
+
+        Args:
+            fw_client: a flywheel client
+            file_entry: the flywheel file
+            content: "file" or "flywheel", indicating if the desire is to load a file's content,
+                or the flywheel object.
+            file_path: where the file content was downloaded, if it was
+            file_type: the type of the file content, defaults to the flywheel file type
+            container_cache: a cache to fetch the parent containers through
+
+        Returns:
+            FwReference
+
+        """
+        input_object = {"location": {"path": str(file_path)}} if file_path else None
+        return cls(
+            input_object=input_object,
+            id=file_entry["file_id"],
+            type="file",
+            name=file_entry.name,
+            file_type=file_type or file_entry.type,
+            _client=fw_client,
+            parents=dict(file_entry.parents),
+            contents=content,
+            container_cache=container_cache,
         )
 
     def __post_init__(self) -> None:
@@ -149,13 +201,13 @@ class FwReference:
             return self.hierarchy_objects
 
     @property
-    def client(self) -> flywheel.Client:
+    def client(self) -> "flywheel.Client":
         """Returns the Flywheel client."""
         if not self._client:
             raise ValueError("Client not set. Use set_client() to set the client.")
         return self._client
 
-    def set_client(self, client: flywheel.Client):
+    def set_client(self, client: "flywheel.Client"):
         """Sets the Flywheel client as attribute."""
         self._client = client
 
@@ -173,36 +225,78 @@ class FwReference:
         return "fw://" + "/".join(hierarchy_parts)
 
     @cached_property
-    def fw_object(self) -> Container:
-        """Returns the container for the provided Flywheel reference."""
+    def fw_object(self) -> "Container":
+        """Returns the container for the provided Flywheel reference.
+
+        If the hierarchy has already been loaded, the container is taken from
+        it instead of being fetched again.
+        """
+        if "hierarchy_objects" in self.__dict__ and self.type in self.hierarchy_objects:
+            return self.hierarchy_objects[self.type]
         return self.get_level_object(self.type)
 
     @cached_property
     def hierarchy_objects(self) -> dict:
-        """Loads the full representation of fw objects in a hierarchy."""
+        """Loads the full representation of fw objects in a hierarchy.
+
+        The levels do not depend on each other, so they are fetched
+        concurrently and the wall time is about that of a single request.
+        """
+        levels = list(self.ref.keys())
+        with ThreadPoolExecutor(max_workers=max(len(levels), 1)) as executor:
+            fw_objects = list(executor.map(self.get_level_object, levels))
+        return self._build_hierarchy(levels, fw_objects)
+
+    async def fetch_hierarchy_objects(self) -> dict:
+        """Loads the hierarchy like `hierarchy_objects`, without blocking the event loop.
+
+        The SDK is synchronous, so each level is fetched on a thread of the
+        loop's default executor, all of them concurrently.  The hierarchy is
+        stored as `hierarchy_objects`, which later accesses (such as `loc` or
+        the error locations) reuse.
+        """
+        if "hierarchy_objects" in self.__dict__:
+            return self.hierarchy_objects
+        levels = list(self.ref.keys())
+        fw_objects = await asyncio.gather(
+            *(asyncio.to_thread(self.get_level_object, level) for level in levels)
+        )
+        hierarchy = self._build_hierarchy(levels, fw_objects)
+        self.__dict__["hierarchy_objects"] = hierarchy
+        return hierarchy
+
+    @staticmethod
+    def _build_hierarchy(levels: t.List[str], fw_objects: t.List[t.Any]) -> dict:
+        """Returns the hierarchy of the levels that were found."""
         hierarchy = {}
-        for level in self.ref.keys():
-            fw_object = self.get_level_object(level)
+        for level, fw_object in zip(levels, fw_objects):
             if fw_object is None:
                 continue
             hierarchy[level] = fw_object
         return hierarchy
 
-    def get_level_object(self, level) -> t.Union[dict, Container, flywheel.Group, None]:
+    def get_level_object(
+        self, level
+    ) -> t.Union[dict, "Container", "flywheel.Group", None]:
         """Returns all the parent containers."""
         if level not in self.ref.keys():
             return None
         if level == "group":
+            import flywheel
+
             return flywheel.Group(label=self.parents["group"])
 
         p_id = self.ref[level]
         getter = getattr(self.client, f"get_{level}")
+        # The file itself is always fetched, its metadata is what gets validated.
+        if self.container_cache is not None and level != "file":
+            return self.container_cache.get_container(level, p_id, getter)
         fw_object = getter(p_id)
         return fw_object
 
 
 def add_tags_metadata(
-    context: flywheel_gear_toolkit.GearToolkitContext,
+    context: "flywheel_gear_toolkit.GearToolkitContext",
     fw_ref: FwReference,
     valid,
     tag,
@@ -239,6 +333,28 @@ def add_tags_metadata(
     context.metadata.add_file_tags(input_object, str(tag))
 
 
+def add_tags_via_sdk(file_entry: "flywheel.FileEntry", valid: bool, tag: str) -> None:
+    """Add gear completion tags to a file that is not a gear input.
+
+    Same as `add_tags_metadata`, but the tags are updated immediately with the
+    SDK instead of through the gear's .metadata.json, which only covers the
+    gear inputs.
+
+    Args:
+        file_entry: the flywheel file to tag
+        valid: True if validation passed, else False
+        tag: the base to use for the tag
+
+    """
+    state = "PASS" if valid else "FAIL"
+    other_state = "FAIL" if valid else "PASS"
+    tags = file_entry.tags or []
+    if f"{tag}-{other_state}" in tags:
+        file_entry.delete_tag(f"{tag}-{other_state}")
+    if f"{tag}-{state}" not in tags:
+        file_entry.add_tag(f"{tag}-{state}")
+
+
 def cast_csv_val(val: t.Any, cast_type: type) -> t.Union[int, float, str, bool]:
     """Attempt to cast a type.  Return original value if unsuccessful.
 
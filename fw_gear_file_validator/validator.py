@@ -3,7 +3,8 @@
 Creates validators for different object/file types
 """
 
-import json
+import itertools
+import logging
 import typing as t
 from pathlib import Path
 
@@ -11,23 +12,99 @@ import jsonschema
 from jsonschema.exceptions import ValidationError
 
 from fw_gear_file_validator import errors as err
-from fw_gear_file_validator import utils
+from fw_gear_file_validator import jsonio, utils
+from fw_gear_file_validator.cache import (
+    artifact_path,
+    load_artifact,
+    save_artifact,
+    schema_hash,
+    validator_cache,
+)
+from fw_gear_file_validator.compiler import FlatSchema, compile_flat_schema
+from fw_gear_file_validator.limits import ErrorLimits, ErrorSummary
+from fw_gear_file_validator.loader import CsvRowStream, JsonRecordStream, RecordStream
+from fw_gear_file_validator.sinks import ErrorSink
 
 # We are not supporting array, object, or null.
 JSON_TYPES = {"string": str, "number": float, "integer": int, "boolean": bool}
+PYTHON_TYPES = {python_type: json_type for json_type, python_type in JSON_TYPES.items()}
+# How csv files are validated: one row at a time, or one column at a time.
+CSV_ENGINES = ("row", "columnar")
+# Keywords of an array schema that can be checked one item at a time.
+STREAMABLE_ARRAY_KEYWORDS = {
+    "type",
+    "items",
+    "minItems",
+    "maxItems",
+    "$schema",
+    "$id",
+    "$comment",
+    "title",
+    "description",
+    "default",
+    "examples",
+    "definitions",
+}
+
+log = logging.getLogger(__name__)
+
+
+def read_schema(schema: t.Union[dict, Path, str]) -> dict:
+    """Returns the schema as a dict, loading it first if given a path."""
+    if isinstance(schema, str):
+        schema = Path(schema)
+    if isinstance(schema, Path):
+        with open(schema, "r", encoding="UTF-8") as schema_instance:
+            schema = jsonio.load(schema_instance)
+    return schema
 
 
 class JsonValidator:
     """Json Validator class."""
 
-    def __init__(self, schema: t.Union[dict, Path, str]):
-        """Initializes a JsonValidator Object."""
-        if isinstance(schema, str):
-            schema = Path(schema)
-        if isinstance(schema, Path):
-            with open(schema, "r", encoding="UTF-8") as schema_instance:
-                schema = json.load(schema_instance)
-        self.validator = jsonschema.Draft7Validator(schema)
+    def __init__(self, schema: t.Union[dict, Path, str], state: dict = None):
+        """Initializes a JsonValidator Object.
+
+        Args:
+            schema: the validation JSON schema
+            state: precomputed state previously returned by export_state for
+                the same schema, to skip recomputing it
+        """
+        self.validator = jsonschema.Draft7Validator(read_schema(schema))
+        self.items_schema = self.streamable_items_schema(self.validator.schema)
+
+    @staticmethod
+    def streamable_items_schema(schema: t.Any) -> t.Union[dict, bool, None]:
+        """Returns the schema of the items, if an array can be validated item by item.
+
+        Arrays can be validated one item at a time when the schema only
+        constrains the type of the array, the schema of every item, and the
+        number of items.
+
+        Args:
+            schema: the validation JSON schema
+
+        Returns:
+            the schema every item is validated against, or None if the array
+            has to be validated as a whole
+
+        """
+        if not isinstance(schema, dict) or not set(schema) <= STREAMABLE_ARRAY_KEYWORDS:
+            return None
+        if schema.get("type", "array") not in ("array", ["array"]):
+            return None
+        items = schema.get("items", {})
+        if not isinstance(items, (dict, bool)):
+            return None
+        return items
+
+    def export_state(self) -> dict:
+        """Returns the state precomputed from the schema, in a JSON serializable form.
+
+        The Draft7Validator itself resolves references lazily, so there is
+        nothing to precompute for JSON files.
+        """
+        return {}
 
     def validate_file_not_empty(
         self, file_contents: t.Union[dict, list, None]
@@ -51,13 +128,17 @@ class JsonValidator:
         """Performs validation on a dict.
 
         Args:
-            d: the dictionary to process
+            d: the dictionary to process, or a JsonRecordStream
 
         Returns:
             valid: True if valid, False otherwise
             errors: any errors reported during validation
 
         """
+        if isinstance(d, JsonRecordStream):
+            errors = list(self.iter_errors(d))
+            return not errors, errors
+
         valid, empty_error = self.validate_file_not_empty(d)
         if not valid:
             return valid, empty_error
@@ -77,12 +158,87 @@ class JsonValidator:
             (list[dict] or None): a list of errors or and empty list
 
         """
-        errors = list(self.validator.iter_errors(d))
+        errors = list(self.iter_schema_errors(d))
         if errors:
             errors = self.handle_errors(errors)
         valid = False if errors else True
         return valid, errors
 
+    def iter_schema_errors(self, d: dict) -> t.Iterator[ValidationError]:
+        """Yields the raw jsonschema errors found in a dict."""
+        return self.validator.iter_errors(d)
+
+    def iter_errors(
+        self, records: JsonRecordStream, sample: t.Callable[[int], bool] = None
+    ) -> t.Iterator[t.Dict]:
+        """Validates the records of a JSON array or NDJSON file as they arrive.
+
+        Every item of an array is validated against the `items` schema, and
+        the number of items against `minItems`/`maxItems` once they have all
+        been read.  If the schema constrains the array in any other way, the
+        records are loaded and the array is validated as a whole.  Every
+        record of an NDJSON file is validated against the whole schema.
+
+        The errors differ from those of an array validated as a whole in two
+        ways, as the records are not kept: the location of each record error
+        also holds the index of its record in `record`, and the errors of the
+        number of items report the count as their value, with their own
+        message, instead of the whole array.
+
+        Args:
+            records: the records to validate
+            sample: called with each record index, only the records it returns
+                True for are validated
+
+        Yields:
+            the errors generated during validation, in the standard error format
+
+        """
+        array = getattr(records, "array", False)
+        if array and self.items_schema is None:
+            _, errors = JsonValidator.validate(self, list(records))
+            yield from errors
+            return
+
+        schema = self.items_schema if array else self.validator.schema
+        count = 0
+        for index, record in enumerate(records):
+            count += 1
+            if sample is not None and not sample(index):
+                continue
+            errors = self.validator.descend(
+                record, schema, path=index, schema_path="items" if array else None
+            )
+            for error in self.handle_errors(list(errors)):
+                error["location"]["record"] = index
+                yield error
+
+        if not count:
+            yield from self.handle_errors([err.make_empty_file_error()])
+        elif array:
+            yield from self.handle_errors(list(self.iter_count_errors(count)))
+
+    def iter_count_errors(self, count: int) -> t.Iterator[ValidationError]:
+        """Yields the errors of the number of items of a streamed array.
+
+        jsonschema reports the whole array, which is not kept when the array
+        is streamed, so the errors report the number of items instead.
+        """
+        schema = self.validator.schema
+        for keyword, message, failed in (
+            ("minItems", "at least", lambda limit: count < limit),
+            ("maxItems", "at most", lambda limit: count > limit),
+        ):
+            if keyword in schema and failed(schema[keyword]):
+                yield ValidationError(
+                    f"The array has {count} items, expected {message} {schema[keyword]}",
+                    validator=keyword,
+                    validator_value=schema[keyword],
+                    instance=count,
+                    schema=schema,
+                    schema_path=[keyword],
+                )
+
     @staticmethod
     def handle_errors(file_errors: list[ValidationError]) -> t.List[t.Dict]:
         """Processes errors into a standard output format.
@@ -134,25 +290,124 @@ class JsonValidator:
 class CsvValidator(JsonValidator):
     """CSV Validator class."""
 
-    def __init__(self, schema: t.Union[dict, Path, str]):
-        """Initializes a CsvValidator object."""
+    def __init__(self, schema: t.Union[dict, Path, str], state: dict = None):
+        """Initializes a CsvValidator object.
+
+        Args:
+            schema: the validation JSON schema
+            state: precomputed state previously returned by export_state for
+                the same schema, to skip recomputing it
+        """
         super().__init__(schema)
+        self._properties = None
+        self._column_dtypes = None
+        self._expected_columns = None
+        if state:
+            self.restore_state(state)
+        self.flat_schema = self.compile_schema()
+
+    def export_state(self) -> dict:
+        """Returns the state precomputed from the schema, in a JSON serializable form.
+
+        This is the resolved subschema of every column, the header expected in
+        the csv file, and the JSON type of every column.
+        """
+        state = super().export_state()
+        schema = self.validator.schema
+        if not isinstance(schema, dict) or not isinstance(
+            schema.get("properties"), dict
+        ):
+            return state
+        state["properties"] = self.resolve_properties()
+        state["header"] = sorted(self.expected_columns)
+        try:
+            column_types = self.get_column_dtypes()
+        except ValueError:
+            # Reported when the csv is validated, not when the state is saved.
+            return state
+        state["column_dtypes"] = {
+            column: PYTHON_TYPES[python_type]
+            for column, python_type in column_types.items()
+        }
+        return state
+
+    def restore_state(self, state: dict) -> None:
+        """Restores the state returned by export_state."""
+        if "properties" in state:
+            self._properties = state["properties"]
+        if "header" in state:
+            self._expected_columns = frozenset(state["header"])
+        if "column_dtypes" in state:
+            self._column_dtypes = {
+                column: JSON_TYPES[json_type]
+                for column, json_type in state["column_dtypes"].items()
+            }
+
+    @property
+    def expected_columns(self) -> t.FrozenSet[str]:
+        """The columns specified in the schema."""
+        if self._expected_columns is None:
+            self._expected_columns = frozenset(self.validator.schema["properties"])
+        return self._expected_columns
+
+    def resolve_properties(self) -> t.Dict[str, t.Any]:
+        """Returns the column subschemas of the schema, with any `$ref` resolved.
+
+        The references are resolved once and reused for every later call.
+        """
+        if self._properties is None:
+            properties = {}
+            schema = self.validator.schema
+            for schema_property, property_val in schema["properties"].items():
+                if isinstance(property_val, dict) and "$ref" in property_val:
+                    _, property_val = self.validator.resolver.resolve(
+                        property_val["$ref"]
+                    )
+                properties[schema_property] = property_val
+            self._properties = properties
+        return self._properties
+
+    def compile_schema(self) -> t.Union[FlatSchema, None]:
+        """Compiles the schema into per-column checks if it is flat.
+
+        Returns:
+            a FlatSchema, or None if the schema must be validated by jsonschema
+
+        """
+        schema = self.validator.schema
+        if not isinstance(schema, dict) or not isinstance(
+            schema.get("properties"), dict
+        ):
+            return None
+        return compile_flat_schema(schema, self.resolve_properties())
+
+    def iter_schema_errors(self, d: dict) -> t.Iterator[ValidationError]:
+        """Yields the raw jsonschema errors found in a csv row.
+
+        Rows are checked by the compiled flat schema when there is one.
+        """
+        if self.flat_schema is None:
+            return super().iter_schema_errors(d)
+        return self.flat_schema.iter_errors(d)
 
     def get_column_dtypes(self) -> dict[str:type]:
         """Get the specified datatypes of each csv column from a Json Schema.
 
+        The datatypes are resolved once and reused for every later call.
+
         Returns:
             A dictionary containing {column-name : python type} for every column
 
         """
-        column_types = {}
-        schema = self.validator.schema
-        for schema_property, property_val in schema["properties"].items():
-            if "$ref" in property_val:
-                _, property_val = self.validator.resolver.resolve(property_val["$ref"])
-            json_type = property_val.get("type")
-            column_types[schema_property] = self.convert_json_types_to_python(json_type)
-        return column_types
+        if self._column_dtypes is None:
+            column_types = {}
+            for schema_property, property_val in self.resolve_properties().items():
+                json_type = property_val.get("type")
+                column_types[schema_property] = self.convert_json_types_to_python(
+                    json_type
+                )
+            self._column_dtypes = column_types
+        return dict(self._column_dtypes)
 
     @staticmethod
     def convert_json_types_to_python(json_type: str) -> type:
@@ -181,12 +436,12 @@ class CsvValidator(JsonValidator):
         return JSON_TYPES.get(json_type, str)  # default to type str if not supported
 
     def validate(
-        self, csv_dicts: t.List[t.Dict], drop_empty: bool = True
+        self, csv_dicts: t.Iterable[t.Dict], drop_empty: bool = True
     ) -> t.Tuple[bool, t.List[t.Dict]]:
         """Performs the validation of a CSV file.
 
         Args:
-            csv_dicts: the list of dicts generated by csv.DictReader
+            csv_dicts: the rows generated by csv.DictReader or a CsvRowStream
             drop_empty: if True, remove empty columns from the csv_dicts before validating
 
         Returns:
@@ -195,20 +450,100 @@ class CsvValidator(JsonValidator):
 
 
         """
-        valid, empty_error = self.validate_file_not_empty(csv_dicts)
+        errors = list(self.iter_errors(csv_dicts, drop_empty=drop_empty))
+        valid = False if errors else True
+        return valid, errors
+
+    def iter_errors(
+        self,
+        csv_dicts: t.Iterable[t.Dict],
+        drop_empty: bool = True,
+        sample: t.Callable[[int], bool] = None,
+    ) -> t.Iterator[t.Dict]:
+        """Validates the rows of a CSV file as they arrive and yields any errors.
+
+        The rows are consumed one at a time, so any iterable (such as a
+        CsvRowStream) can be validated without holding the full table in
+        memory.  The header is checked against the first row.
+
+        Args:
+            csv_dicts: the rows to validate, each a dictionary keyed by the csv header
+            drop_empty: if True, remove empty columns from each row before validating
+            sample: called with each row number, only the rows it returns True
+                for are validated.  The header is always checked.
+
+        Yields:
+            the errors generated during validation, in the standard error format
+
+        """
+        rows = iter(csv_dicts)
+        first_row = next(rows, None)
+        valid, empty_error = self.validate_file_not_empty(
+            [] if first_row is None else [first_row]
+        )
         if not valid:
-            return valid, empty_error
+            yield from empty_error
+            return
 
-        valid, header_errors = self.validate_header(csv_dicts)
+        valid, header_errors = self.validate_header([first_row])
         if not valid:
-            return valid, header_errors
+            yield from header_errors
+            return
 
-        if drop_empty:
-            csv_dicts = [{k: v for k, v in row.items() if v} for row in csv_dicts]
+        errors = self.iter_row_errors(
+            itertools.chain([first_row], rows), drop_empty=drop_empty, sample=sample
+        )
+        if getattr(csv_dicts, "row_offsets", None) is not None:
+            errors = self.add_byte_ranges(errors, csv_dicts)
+        yield from errors
 
-        valid, errors = self.process_file(csv_dicts)
+    @staticmethod
+    def add_byte_ranges(
+        errors: t.Iterable[t.Dict], stream: CsvRowStream
+    ) -> t.Iterator[t.Dict]:
+        """Adds the byte range of their row to the location of row errors.
 
-        return valid, errors
+        Args:
+            errors: the errors of the rows of a stream tracking its row offsets
+            stream: the stream, whose rows are read as the errors are yielded
+
+        Yields:
+            the errors, with `byte_range`, the start and end offsets of the
+            row in the file, added to their location
+
+        """
+        for error in errors:
+            location = error.get("location")
+            if isinstance(location, dict) and "line" in location:
+                location["byte_range"] = list(stream.byte_range(location["line"]))
+            yield error
+
+    def iter_row_errors(
+        self,
+        csv_dicts: t.Iterable[t.Dict],
+        drop_empty: bool = True,
+        sample: t.Callable[[int], bool] = None,
+    ) -> t.Iterator[t.Dict]:
+        """Validates csv rows against the schema, without any header check.
+
+        Args:
+            csv_dicts: the rows to validate, each a dictionary keyed by the csv header
+            drop_empty: if True, remove empty columns from each row before validating
+            sample: called with each row number, only the rows it returns True
+                for are validated
+
+        Yields:
+            the errors generated during validation, in the standard error format
+
+        """
+        column_types = self.get_column_dtypes()
+        for row_num, row_contents in enumerate(csv_dicts):
+            if sample is not None and not sample(row_num):
+                continue
+            if drop_empty:
+                row_contents = {k: v for k, v in row_contents.items() if v}
+            _, errors = self.process_row(row_num, row_contents, column_types)
+            yield from errors
 
     def validate_header(self, csv_dicts: t.List[t.Dict]) -> t.Tuple[bool, list]:
         """Checks that the header is valid.
@@ -231,7 +566,7 @@ class CsvValidator(JsonValidator):
 
         """
         actual_columns = csv_dicts[0].keys()
-        expected_columns = self.validator.schema["properties"].keys()
+        expected_columns = self.expected_columns
         column_is_in_schema = [ac in expected_columns for ac in actual_columns]
 
         # If all the present columns are in the schema, no need to continue checking.
@@ -251,14 +586,14 @@ class CsvValidator(JsonValidator):
 
         return False, self.handle_errors(column_errors)
 
-    def process_file(self, csv_dicts: t.List[t.Dict]):
+    def process_file(self, csv_dicts: t.Iterable[t.Dict]):
         """Processes the csv file one row at a time.
 
         Since each row can be considered its own little json file, we need to call the Parent JsonValidator's
         "process_item" once for each row and concatenate all errors.
 
         Args:
-            csv_dicts: the list of csv row dictionaries to process
+            csv_dicts: the csv row dictionaries to process
 
         Returns:
             (bool): True if valid (no errors), false otherwise
@@ -272,16 +607,34 @@ class CsvValidator(JsonValidator):
             row_num,
             row_contents,
         ) in enumerate(csv_dicts):
-            cast_row = {
-                key: utils.cast_csv_val(value, column_types.get(key, str))
-                for key, value in row_contents.items()
-            }
-            valid, errors = self.process_item(cast_row)
+            valid, errors = self.process_row(row_num, row_contents, column_types)
             csv_valid = csv_valid & valid
-            self.add_csv_location_spec(row_num, errors)
             csv_errors.extend(errors)
         return csv_valid, csv_errors
 
+    def process_row(
+        self, row_num: int, row_contents: t.Dict, column_types: t.Dict[str, type]
+    ) -> t.Tuple[bool, t.List[t.Dict]]:
+        """Casts a single csv row to the schema types and validates it.
+
+        Args:
+            row_num: the index of the row in the file, not counting the header
+            row_contents: the row dictionary to process
+            column_types: the python type of each column, as returned by get_column_dtypes
+
+        Returns:
+            (bool): True if valid (no errors), false otherwise
+            (list(dict)): the errors detected in this row, with their csv location
+
+        """
+        cast_row = {
+            key: utils.cast_csv_val(value, column_types.get(key, str))
+            for key, value in row_contents.items()
+        }
+        valid, errors = self.process_item(cast_row)
+        self.add_csv_location_spec(row_num, errors)
+        return valid, errors
+
     @staticmethod
     def add_csv_location_spec(
         row_num: int, row_errors: t.Union[t.List[t.Dict], None]
@@ -304,26 +657,192 @@ class CsvValidator(JsonValidator):
 
 
 def initialize_validator(
-    file_type: str, schema: t.Union[dict, Path, str]
+    file_type: str,
+    schema: t.Union[dict, Path, str],
+    engine: str = "row",
+    artifact_dir: t.Union[Path, str, None] = None,
 ) -> t.Union[JsonValidator, CsvValidator]:
     """Initialize the validator.
 
     In the future we may implement a recursive subclass factory (or something),
     but for two validators the code does not require that complexity.
 
+    Validators are cached for the lifetime of the process, keyed by their
+    class and the content hash of the schema, so validating many files with
+    the same schema only compiles it once.  See `cache.validator_cache` for
+    the hit and miss counters.
+
+    When an artifact directory is given, the state precomputed from the schema
+    is also saved there, and reloaded by later processes using the same schema.
+
     Args:
         file_type: the type of file we're validating
         schema: the validation JSON schema file.
+        engine: how csv files are validated, "row" (one row at a time) or
+            "columnar" (one column at a time, requires numpy)
+        artifact_dir: a directory where schema compilation artifacts are kept
 
     Returns:
         JsonValidator | CsvValidator
 
     """
-    if file_type == "json":
-        return JsonValidator(schema)
+    if file_type in ("json", "ndjson"):
+        validator_class = JsonValidator
     elif file_type == "csv":
-        return CsvValidator(schema)
+        if engine == "columnar":
+            # Imported here so numpy is only needed when the engine is used.
+            from fw_gear_file_validator.columnar import ColumnarCsvValidator
+
+            validator_class = ColumnarCsvValidator
+        elif engine == "row":
+            validator_class = CsvValidator
+        else:
+            raise ValueError("csv engine " + engine + " Not supported")
     elif file_type == "flywheel":
-        return JsonValidator(schema)
+        validator_class = JsonValidator
     else:
         raise ValueError("file type " + file_type + " Not supported")
+
+    schema = read_schema(schema)
+    digest = schema_hash(schema)
+
+    def build_validator():
+        if not artifact_dir:
+            return validator_class(schema)
+        path = artifact_path(artifact_dir, validator_class, digest)
+        state = load_artifact(path, digest)
+        if state is not None:
+            return validator_class(schema, state=state)
+        schema_validator = validator_class(schema)
+        save_artifact(path, digest, schema_validator.export_state())
+        return schema_validator
+
+    return validator_cache.get_or_create((validator_class, digest), build_validator)
+
+
+def validate_object(
+    schema_validator: t.Union[JsonValidator, CsvValidator],
+    d: t.Any,
+    location: t.Union[Path, dict],
+    workers: int = 1,
+    limits: ErrorLimits = None,
+) -> t.Tuple[bool, t.List[t.Dict], t.Union[ErrorSummary, None]]:
+    """Validates an object returned by `Loader.open_object`.
+
+    Args:
+        schema_validator: the validator returned by initialize_validator
+        d: the loaded object, or a record stream
+        location: where the object was loaded from
+        workers: the number of processes validating a csv file, 0 for one per CPU.
+            Other record streams, and csv streams tracking their row offsets,
+            are always validated serially.
+        limits: limits on the errors collected, if any
+
+    Returns:
+        valid: True if no errors, False otherwise.
+        errors: Any errors generated during validation.
+        summary: what the limits left out of the errors, None without limits
+
+    """
+    if limits is not None and limits.active:
+        return _validate_object_within_limits(schema_validator, d, workers, limits)
+    if not isinstance(d, RecordStream):
+        return (*schema_validator.validate(d), None)
+
+    if workers != 1 and isinstance(d, CsvRowStream) and d.row_offsets is None:
+        from fw_gear_file_validator import parallel
+
+        # The file is split in shards validated on several processes instead.
+        d.close()
+        return (*parallel.validate_csv_file(location, schema_validator, workers), None)
+
+    with d:
+        valid, errors = schema_validator.validate(d)
+    if d.errors:
+        # A file that cannot be parsed only reports its format errors.
+        return False, d.errors, None
+    return valid, errors, None
+
+
+def _validate_object_within_limits(
+    schema_validator: t.Union[JsonValidator, CsvValidator],
+    d: t.Any,
+    workers: int,
+    limits: ErrorLimits,
+) -> t.Tuple[bool, t.List[t.Dict], ErrorSummary]:
+    """Validates an object, stopping once the error limits are reached."""
+    if not isinstance(d, RecordStream):
+        _, errors = schema_validator.validate(d)
+        errors, summary = limits.collect(errors)
+        return not errors, errors, summary
+
+    if workers != 1 and isinstance(d, CsvRowStream):
+        log.info("Validating serially, error limits stop at the first errors found")
+    with d:
+        errors, summary = limits.collect(
+            schema_validator.iter_errors(d, sample=limits.sampler())
+        )
+    if d.errors:
+        # Only the rows read before stopping have been checked for format errors.
+        return False, d.errors, None
+    return not errors, errors, summary
+
+
+def validate_object_to_sink(
+    schema_validator: t.Union[JsonValidator, CsvValidator],
+    d: t.Any,
+    location: t.Union[Path, dict],
+    sink: ErrorSink,
+    transform: t.Callable[[t.Iterable[t.Dict]], t.Iterable[t.Dict]] = None,
+    workers: int = 1,
+    limits: ErrorLimits = None,
+) -> t.Tuple[bool, t.Union[ErrorSummary, None]]:
+    """Validates an object returned by `Loader.open_object` into an error sink.
+
+    The errors of a record stream validated serially are written to the sink
+    as they are found, without being collected in a list.  If the file turns
+    out to be malformed, the errors already written are discarded and only
+    the format errors are reported, like `validate_object` does.
+
+    Args:
+        schema_validator: the validator returned by initialize_validator
+        d: the loaded object, or a record stream
+        location: where the object was loaded from
+        sink: where the errors are written
+        transform: applied to the errors before they are written, e.g. to add
+            their flywheel location
+        workers: the number of processes validating a csv file, 0 for one per CPU,
+            see `validate_object`
+        limits: limits on the errors collected, if any
+
+    Returns:
+        valid: True if no errors, False otherwise.
+        summary: what the limits left out of the errors, None without limits
+
+    """
+    transform = transform or (lambda errors: errors)
+    limited = limits is not None and limits.active
+    in_parallel = workers != 1 and isinstance(d, CsvRowStream) and d.row_offsets is None
+    if not isinstance(d, RecordStream) or (in_parallel and not limited):
+        valid, errors, summary = validate_object(
+            schema_validator, d, location, workers, limits
+        )
+        sink.write_all(transform(errors))
+        return valid, summary
+
+    with d:
+        if limited:
+            summary = limits.new_summary()
+            errors = limits.iter_within(
+                schema_validator.iter_errors(d, sample=limits.sampler()), summary
+            )
+        else:
+            summary = None
+            errors = schema_validator.iter_errors(d)
+        sink.write_all(transform(errors))
+    if d.errors:
+        # A file that cannot be parsed only reports its format errors.
+        sink.discard()
+        sink.write_all(transform(d.errors))
+        return False, None
+    return not sink.count, summary
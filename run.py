@@ -2,16 +2,27 @@
 """The run script."""
 
 import logging
+from collections import Counter
 
 from flywheel_gear_toolkit import GearToolkitContext
 
-from fw_gear_file_validator import validator
+from fw_gear_file_validator import checkpoint, incremental, validator
+from fw_gear_file_validator.batch import BatchValidator
+from fw_gear_file_validator.cache import schema_hash
 from fw_gear_file_validator.errors import (
-    add_flywheel_location_to_errors,
-    save_errors_metadata,
+    iter_flywheel_location,
+    make_report,
+    set_error_detail,
+    set_strict_errors,
 )
-from fw_gear_file_validator.loader import Loader
-from fw_gear_file_validator.parser import parse_config
+from fw_gear_file_validator.jsonio import set_json_backend
+from fw_gear_file_validator.loader import CsvRowStream, Loader, RecordStream
+from fw_gear_file_validator.parser import (
+    get_batch_file_ids,
+    parse_batch_config,
+    parse_config,
+)
+from fw_gear_file_validator.sinks import open_error_sink, save_sink_metadata
 from fw_gear_file_validator.utils import add_tags_metadata, get_loader_type
 
 log = logging.getLogger(__name__)
@@ -19,15 +30,41 @@ log = logging.getLogger(__name__)
 
 def main(context: GearToolkitContext) -> None:  # pragma: no cover
     """Parses gear config, runs main algorithm, and performs flywheel-specific actions."""
-    (debug, tag, schema_file_path, fw_ref, loader_config) = parse_config(context)
+    file_ids = get_batch_file_ids(context)
+    if file_ids:
+        run_batch(context, file_ids)
+        return
+
+    (debug, tag, schema_file_path, fw_ref, loader_config, validator_config) = (
+        parse_config(context)
+    )
+    # Errors are only checked against the FileError model when debugging.
+    set_strict_errors(debug)
+    set_error_detail(validator_config["error_detail"])
+    set_json_backend(validator_config["json_backend"])
+    workers = validator_config["workers"]
+    report_mode = validator_config["report_mode"]
+
+    def report(errors):
+        return make_report(iter_flywheel_location(fw_ref, errors), report_mode)
 
     loader_type = get_loader_type(fw_ref)
     loader = Loader.factory(loader_type, config=loader_config)
-    d, errors = loader.load_object(fw_ref.loc)
+    # Csv rows and the records of JSON arrays are parsed as the validator
+    # consumes them, format errors are only known once the stream has been read.
+    d, errors = loader.open_object(fw_ref.loc)
+
+    # Errors are written to the sink as they are found, either kept for the
+    # QC result or streamed to a file in the output directory.
+    def open_sink():
+        return open_error_sink(
+            validator_config["error_output"], context.output_dir, fw_ref.name
+        )
 
     if errors:
-        errors = add_flywheel_location_to_errors(fw_ref, errors)
-        save_errors_metadata(errors, fw_ref, context)
+        with open_sink() as sink:
+            sink.write_all(report(errors))
+        save_sink_metadata(sink, fw_ref, context)
         add_tags_metadata(context, fw_ref, False, tag)
         return
 
@@ -35,14 +72,108 @@ def main(context: GearToolkitContext) -> None:  # pragma: no cover
     if errors:
         log.error("Invalid schema file.")
         return
-    schema_validator = validator.initialize_validator(loader_type, schema)
-    valid, errors = schema_validator.validate(d)
 
-    errors = add_flywheel_location_to_errors(fw_ref, errors)
-    save_errors_metadata(errors, fw_ref, context)
+    digest = store = None
+    if validator_config["skip_unchanged"]:
+        gear_name = context.manifest.get("name")
+        digest = incremental.validation_hash(
+            incremental.content_hash(d, fw_ref.loc, gear_name),
+            schema_hash(schema),
+            incremental.result_options(validator_config),
+        )
+        store = incremental.open_result_store(
+            validator_config["state_file"],
+            getattr(fw_ref.hierarchy_objects.get("file"), "info", None),
+            gear_name,
+        )
+        prior = store.get(fw_ref.id, digest)
+        if prior is not None:
+            state, meta_dict = prior
+            log.info("File unchanged since its last validation, reusing %s", state)
+            if isinstance(d, RecordStream):
+                d.close()
+            context.metadata.add_qc_result(
+                fw_ref.name, "validation", state=state, **meta_dict
+            )
+            add_tags_metadata(context, fw_ref, state == "PASS", tag)
+            return
+
+    schema_validator = validator.initialize_validator(
+        loader_type,
+        schema,
+        engine=validator_config["engine"],
+        artifact_dir=validator_config["schema_cache_dir"],
+    )
+    checkpoint_dir = validator_config["checkpoint_dir"]
+    if checkpoint_dir and validator_config["error_limits"].active:
+        log.info("Error limits are set, the file is validated without checkpoint")
+        checkpoint_dir = None
+    if checkpoint_dir and loader_config.get("byte_ranges"):
+        log.info("Byte ranges are reported, the file is validated without checkpoint")
+        checkpoint_dir = None
+
+    with open_sink() as sink:
+        if checkpoint_dir and isinstance(d, CsvRowStream):
+            d.close()
+            valid, errors = checkpoint.validate_csv_in_checkpoint_dir(
+                checkpoint_dir, fw_ref.id or fw_ref.name, fw_ref.loc, schema_validator
+            )
+            sink.write_all(report(errors))
+            summary = None
+        else:
+            valid, summary = validator.validate_object_to_sink(
+                schema_validator,
+                d,
+                fw_ref.loc,
+                sink,
+                transform=report,
+                workers=workers,
+                limits=validator_config["error_limits"],
+            )
+
+    state, meta_dict = save_sink_metadata(sink, fw_ref, context, summary, digest)
+    if store is not None:
+        store.put(fw_ref.id, digest, state, meta_dict)
     add_tags_metadata(context, fw_ref, valid, tag)
 
 
+def run_batch(context: GearToolkitContext, file_ids: list) -> None:  # pragma: no cover
+    """Validates a batch of flywheel files, saving QC results and tags on each."""
+    (
+        debug,
+        tag,
+        schema_file_path,
+        validation_level,
+        loader_config,
+        validator_config,
+    ) = parse_batch_config(context)
+    set_strict_errors(debug)
+    set_error_detail(validator_config["error_detail"])
+    set_json_backend(validator_config["json_backend"])
+    schema, errors = Loader.load_schema(schema_file_path)
+    if errors:
+        log.error("Invalid schema file.")
+        return
+
+    batch_validator = BatchValidator(
+        schema, validation_level, loader_config, validator_config
+    )
+    results = batch_validator.validate_file_ids(
+        context.client, file_ids, context=context, tag=tag
+    )
+    counts = Counter(result.valid for result in results)
+    log.info(
+        "Validated %s files: %s valid, %s invalid, %s not validated, "
+        "%s unchanged results reused",
+        len(results),
+        counts[True],
+        counts[False],
+        counts[None],
+        sum(result.reused for result in results),
+    )
+    log.info("Container cache: %s", batch_validator.container_cache.cache_info())
+
+
 if __name__ == "__main__":  # pragma: no cover
     with GearToolkitContext() as gear_context:
         gear_context.init_logging()
@@ -0,0 +1,60 @@
+"""Fixtures shared by the test modules."""
+
+import copy
+
+import pytest
+
+# A flat csv schema using every keyword the compiled validators support.
+FLAT_SCHEMA = {
+    "$schema": "http://json-schema.org/draft-07/schema",
+    "type": "object",
+    "required": ["id", "score"],
+    "definitions": {"code": {"type": "string", "pattern": "^[A-Z]{3}$"}},
+    "properties": {
+        "id": {"type": "integer", "minimum": 1, "description": "row id"},
+        "score": {"type": "number", "minimum": 0, "maximum": 5.5},
+        "site": {"$ref": "#/definitions/code"},
+        "status": {"type": "string", "enum": ["ok", "bad"], "maxLength": 2},
+        "level": {"type": "integer", "enum": [1, 2, 3]},
+        "flag": {"type": "boolean"},
+        "note": {"maxLength": 0},
+        "name": {"type": "string", "minLength": 2},
+    },
+}
+
+# Cells of each column, valid and invalid.
+CELLS = {
+    "id": ["", "0", "7", "1.5", "x"],
+    "score": ["", "-1", "2.5", "9", "nan", "abc"],
+    "site": ["", "ABC", "abcd"],
+    "status": ["", "ok", "okay", "no"],
+    "level": ["", "2", "4", "two"],
+    "flag": ["", "yes"],
+    "note": ["", "text"],
+    "name": ["", " "],
+}
+
+
+def _make_rows(n_rows):
+    columns = list(CELLS)
+    rows = []
+    for i in range(n_rows):
+        rows.append(
+            {
+                col: CELLS[col][(i * (j + 3) + j) % len(CELLS[col])]
+                for j, col in enumerate(columns)
+            }
+        )
+    return rows
+
+
+@pytest.fixture
+def flat_schema():
+    """Returns a flat csv schema using every supported keyword."""
+    return copy.deepcopy(FLAT_SCHEMA)
+
+
+@pytest.fixture
+def flat_rows():
+    """Returns 300 csv rows mixing valid and invalid cells of `flat_schema`."""
+    return _make_rows(300)
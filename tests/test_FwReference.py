@@ -1,3 +1,5 @@
+import asyncio
+import threading
 from pathlib import Path
 from unittest.mock import MagicMock
 
@@ -45,6 +47,89 @@ def test_parents():
     client.get_session.assert_called_once()
 
 
+def test_hierarchy_fetched_concurrently():
+    parents = {
+        "group": "test_group",
+        "project": "p",
+        "subject": "sub",
+        "session": "ses",
+        "acquisition": "acq",
+    }
+    file = FileEntry(name="a.csv", file_id="f", type="tabular data", parents=parents)
+    client = MagicMock()
+    client.get_file.return_value = file
+    ref = FwReference.init_from_gear_input(client, file)
+
+    # Every getter waits for all the others: a serial walk would time out.
+    barrier = threading.Barrier(5, timeout=5)
+
+    def getter(container):
+        def get(container_id):
+            barrier.wait()
+            if container is FileEntry:
+                return file
+            return container(id=container_id, label=container_id)
+
+        return get
+
+    client.get_project.side_effect = getter(Project)
+    client.get_subject.side_effect = getter(Subject)
+    client.get_session.side_effect = getter(Session)
+    client.get_acquisition.side_effect = getter(Acquisition)
+    client.get_file.side_effect = getter(FileEntry)
+
+    hierarchy = ref.hierarchy_objects
+    assert list(hierarchy) == PARENT_ORDER[:5] + ["file"]
+    assert hierarchy["session"].label == "ses"
+    assert hierarchy["group"].label == "test_group"
+
+    # The file container is reused for tagging.
+    assert ref.fw_object is file
+    assert client.get_file.call_count == 2
+
+
+def test_fetch_hierarchy_objects_without_blocking():
+    parents = {"project": "p", "session": "ses"}
+    file = FileEntry(name="a.csv", file_id="f", type="tabular data", parents=parents)
+    client = MagicMock()
+    client.get_file.return_value = file
+    ref = FwReference.init_from_gear_input(client, file)
+    barrier = threading.Barrier(3, timeout=5)
+
+    def getter(container):
+        def get(container_id):
+            barrier.wait()
+            return file if container is FileEntry else container(id=container_id)
+
+        return get
+
+    client.get_project.side_effect = getter(Project)
+    client.get_session.side_effect = getter(Session)
+    client.get_file.side_effect = getter(FileEntry)
+
+    async def fetch():
+        ticks = 0
+
+        async def tick():
+            nonlocal ticks
+            while True:
+                ticks += 1
+                await asyncio.sleep(0)
+
+        ticker = asyncio.create_task(tick())
+        hierarchy = await ref.fetch_hierarchy_objects()
+        ticker.cancel()
+        return hierarchy, ticks
+
+    hierarchy, ticks = asyncio.run(fetch())
+    assert list(hierarchy) == ["project", "session", "file"]
+    # The event loop kept running while the containers were fetched.
+    assert ticks > 0
+    # The hierarchy is cached for the synchronous accesses.
+    assert ref.hierarchy_objects is hierarchy
+    assert client.get_file.call_count == 2
+
+
 def test_get_lookup_path():
     group = Group()
     group.label = "test_group"
@@ -0,0 +1,164 @@
+"""Module to test aio.py"""
+
+import asyncio
+import concurrent.futures
+import contextlib
+import threading
+from unittest.mock import MagicMock
+
+import pytest
+
+from fw_gear_file_validator import aio, cli, validator
+from fw_gear_file_validator.limits import ErrorLimits
+from fw_gear_file_validator.utils import FwReference
+
+SCHEMA = {
+    "type": "object",
+    "properties": {"a": {"type": "integer"}, "b": {"type": "string", "maxLength": 3}},
+    "required": ["a"],
+}
+
+
+@pytest.fixture
+def bad_csv(tmp_path):
+    path = tmp_path / "bad.csv"
+    path.write_text(
+        "a,b\n" + "".join(f"{i},{'long' if i % 2 else 'ok'}\n" for i in range(100))
+    )
+    return path
+
+
+async def collect(iterator):
+    return [item async for item in iterator]
+
+
+def test_iter_errors_matches_sync_validation(bad_csv):
+    errors = asyncio.run(collect(aio.iter_errors(bad_csv, SCHEMA, chunk_size=7)))
+    expected = cli.validate_file(bad_csv, SCHEMA).errors
+
+    assert len(errors) == 50
+    for error, sync_error in zip(errors, expected):
+        error.pop("timestamp"), sync_error.pop("timestamp")
+        assert error == sync_error
+
+
+def test_validate_path(bad_csv, tmp_path):
+    result = asyncio.run(aio.validate_path(bad_csv, SCHEMA, report_mode="aggregate"))
+    assert result.state == "FAIL"
+    assert result.errors[0]["count"] == 50
+
+    limits = ErrorLimits(max_errors=3)
+    result = asyncio.run(aio.validate_path(bad_csv, SCHEMA, limits=limits))
+    assert len(result.errors) == 3
+    assert result.summary["truncated"] is True
+
+    json_file = tmp_path / "data.json"
+    json_file.write_text('{"a": "x"}')
+    result = asyncio.run(aio.validate_path(json_file, SCHEMA))
+    assert result.errors[0]["location"] == {"key_path": "properties.a"}
+
+    malformed = tmp_path / "malformed.csv"
+    malformed.write_text("a,b\n1,long\n2,x,y\n")
+    result = asyncio.run(aio.validate_path(malformed, SCHEMA))
+    assert [e["code"] for e in result.errors] == ["malformed-file"]
+
+    result = asyncio.run(aio.validate_path(tmp_path / "missing.csv", SCHEMA))
+    assert result.state == "ERROR"
+    result = asyncio.run(aio.validate_path(tmp_path / "notes.txt", SCHEMA))
+    assert "not supported" in result.failure
+
+
+def test_validate_paths_limits_concurrency(bad_csv, tmp_path):
+    good = tmp_path / "good.csv"
+    good.write_text("a\n1\n")
+    running = 0
+    peak = 0
+    lock = threading.Lock()
+    original = validator.initialize_validator
+
+    def initialize_validator(*args, **kwargs):
+        nonlocal running, peak
+        with lock:
+            running += 1
+            peak = max(peak, running)
+        threading.Event().wait(0.05)
+        with lock:
+            running -= 1
+        return original(*args, **kwargs)
+
+    validator.initialize_validator = initialize_validator
+    try:
+        results = asyncio.run(
+            aio.validate_paths([bad_csv, good] * 3, SCHEMA, max_concurrency=2)
+        )
+    finally:
+        validator.initialize_validator = original
+
+    assert [r.state for r in results] == ["FAIL", "PASS"] * 3
+    assert peak == 2
+
+
+def test_early_exit_stops_the_worker(bad_csv):
+    executor = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+
+    async def first_errors():
+        errors = []
+        iterator = aio.iter_errors(
+            bad_csv, SCHEMA, executor=executor, chunk_size=2, max_pending=1
+        )
+        async with contextlib.aclosing(iterator):
+            async for error in iterator:
+                errors.append(error)
+                if len(errors) == 2:
+                    break
+        return errors
+
+    assert len(asyncio.run(first_errors())) == 2
+    # The worker has stopped and released the executor.
+    assert executor.submit(lambda: "free").result(timeout=5) == "free"
+    executor.shutdown()
+
+
+def test_cancellation(bad_csv):
+    async def cancel_consumer():
+        task = asyncio.create_task(
+            collect(aio.iter_errors(bad_csv, SCHEMA, chunk_size=1, max_pending=1))
+        )
+        await asyncio.sleep(0)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(cancel_consumer())
+
+
+@pytest.mark.parametrize(
+    "exception", [ValueError("bad schema"), asyncio.CancelledError()]
+)
+def test_worker_exceptions_reach_the_consumer(bad_csv, mocker, exception):
+    mocker.patch.object(validator, "initialize_validator", side_effect=exception)
+    with pytest.raises(type(exception)):
+        asyncio.run(collect(aio.iter_errors(bad_csv, SCHEMA)))
+
+
+def test_iter_reference_errors():
+    client = MagicMock()
+    client.get_file.return_value = MagicMock(
+        to_dict=lambda: {"name": "a.csv", "size": 5},
+        __getitem__=lambda self, key: {"file_id": "f1", "name": "a.csv"}[key],
+        get=lambda key: {"name": "a.csv"}.get(key),
+    )
+    ref = FwReference(
+        id="f1", type="file", parents={}, contents="flywheel", _client=client
+    )
+    schema = {
+        "type": "object",
+        "properties": {
+            "file": {"type": "object", "properties": {"size": {"minimum": 10}}}
+        },
+    }
+
+    errors = asyncio.run(collect(aio.iter_reference_errors(ref, schema)))
+    assert [e["code"] for e in errors] == ["minimum"]
+    assert errors[0]["container_id"] == "f1"
+    assert errors[0]["flywheel_path"] == "fw://a.csv"
@@ -0,0 +1,199 @@
+"""Module to test batch.py"""
+
+import gzip
+import json
+import shutil
+from pathlib import Path
+from unittest.mock import MagicMock
+
+import flywheel
+
+from fw_gear_file_validator import checkpoint
+from fw_gear_file_validator.batch import BatchValidator
+from fw_gear_file_validator.cache import ContainerCache
+
+ASSETS = Path(__file__).parent / "assets"
+
+with open(ASSETS / "test_schema_csv.json") as fp:
+    CSV_SCHEMA = json.load(fp)
+
+
+def make_file_entry(file_id, name, source):
+    file_entry = flywheel.FileEntry(
+        name=name,
+        file_id=file_id,
+        type="tabular data",
+        mimetype="text/csv",
+        parents={"session": "ses"},
+        tags=["file-validator-PASS"],
+    )
+    file_entry.download = MagicMock(side_effect=lambda dest: shutil.copy(source, dest))
+    file_entry.add_tag = MagicMock()
+    file_entry.delete_tag = MagicMock()
+    return file_entry
+
+
+def test_validate_directory(tmp_path):
+    shutil.copy(ASSETS / "test_input_valid.csv", tmp_path / "a.csv")
+    shutil.copy(ASSETS / "test_input_invalid.csv", tmp_path / "b.csv")
+    (tmp_path / "notes.txt").write_text("ignored")
+
+    results = BatchValidator(CSV_SCHEMA).validate_directory(tmp_path)
+
+    assert [Path(result.name).name for result in results] == ["a.csv", "b.csv"]
+    assert results[0].valid is True and results[0].errors == []
+    assert results[1].valid is False
+    assert [e["location"] for e in results[1].errors] == [
+        {"line": 2, "column_name": "Col2"}
+    ]
+
+
+def test_validate_file_ids():
+    files = {
+        "good": make_file_entry("good", "good.csv", ASSETS / "test_input_valid.csv"),
+        "bad": make_file_entry("bad", "bad.csv", ASSETS / "test_input_invalid.csv"),
+    }
+
+    def get_file(file_id):
+        if file_id not in files:
+            raise flywheel.ApiException(status=404, reason="Not Found")
+        return files[file_id]
+
+    client = MagicMock()
+    client.get_file.side_effect = get_file
+    client.get_session.return_value = flywheel.Session(label="ses")
+    context = MagicMock()
+
+    batch_validator = BatchValidator(CSV_SCHEMA, container_cache=ContainerCache())
+    results = batch_validator.validate_file_ids(
+        client, ["good", "missing", "bad"], context=context, tag="file-validator"
+    )
+
+    assert [(r.file_id, r.valid) for r in results] == [
+        ("good", True),
+        ("missing", None),
+        ("bad", False),
+    ]
+    assert results[2].errors[0]["container_id"] == "bad"
+    qc_calls = context.metadata.add_qc_result_via_sdk.call_args_list
+    assert [call.args[0] for call in qc_calls] == [files["good"], files["bad"]]
+    assert [call.kwargs["state"] for call in qc_calls] == ["PASS", "FAIL"]
+    files["good"].add_tag.assert_not_called()
+    files["bad"].delete_tag.assert_called_once_with("file-validator-PASS")
+    files["bad"].add_tag.assert_called_once_with("file-validator-FAIL")
+    # One loader for the whole batch.
+    assert list(batch_validator._loaders) == ["csv"]
+
+
+def test_validate_file_ids_error_file(tmp_path):
+    bad = make_file_entry("bad", "bad.csv", ASSETS / "test_input_invalid.csv")
+    client = MagicMock()
+    client.get_file.return_value = bad
+    client.get_session.return_value = flywheel.Session(label="ses")
+    context = MagicMock(output_dir=tmp_path)
+
+    batch_validator = BatchValidator(
+        CSV_SCHEMA,
+        validator_config={"error_output": "ndjson-gzip"},
+        container_cache=ContainerCache(),
+    )
+    (result,) = batch_validator.validate_file_ids(client, ["bad"], context=context)
+
+    assert result.valid is False
+    assert result.errors == []
+    error_file = tmp_path / "bad.csv.validation-errors.ndjson.gz"
+    with gzip.open(error_file, "rt") as fp:
+        errors = [json.loads(line) for line in fp]
+    assert errors[0]["container_id"] == "bad"
+    qc_call = context.metadata.add_qc_result_via_sdk.call_args
+    assert qc_call.kwargs["state"] == "FAIL"
+    assert qc_call.kwargs["error_file"] == error_file.name
+    assert qc_call.kwargs["error_count"] == 1
+    assert "data" not in qc_call.kwargs
+
+
+def test_validate_file_ids_skip_unchanged(tmp_path):
+    bad = make_file_entry("bad", "bad.csv", ASSETS / "test_input_invalid.csv")
+    client = MagicMock()
+    client.get_file.return_value = bad
+    client.get_session.return_value = flywheel.Session(label="ses")
+    context = MagicMock(manifest={"name": "file-validator"})
+    validator_config = {"skip_unchanged": True, "state_file": tmp_path / "state.json"}
+
+    def run():
+        batch_validator = BatchValidator(
+            CSV_SCHEMA,
+            validator_config=validator_config,
+            container_cache=ContainerCache(),
+        )
+        (result,) = batch_validator.validate_file_ids(client, ["bad"], context=context)
+        return result
+
+    first = run()
+    second = run()
+
+    assert (first.reused, second.reused) == (False, True)
+    assert second.valid is False
+    # The state file only keeps a summary of the result, not the errors.
+    assert second.errors == []
+    qc_calls = context.metadata.add_qc_result_via_sdk.call_args_list
+    assert qc_calls[1].kwargs == {
+        "state": "FAIL",
+        "error_count": len(first.errors),
+        "validation_hash": qc_calls[0].kwargs["validation_hash"],
+    }
+    lines = (tmp_path / "state.json").read_text().splitlines()
+    assert [json.loads(line).get("file_id") for line in lines] == [None, "bad"]
+
+
+def test_validate_file_ids_checkpoint(tmp_path):
+    source = tmp_path / "growing.csv"
+    shutil.copy(ASSETS / "test_input_invalid.csv", source)
+    bad = make_file_entry("bad", "bad.csv", source)
+    client = MagicMock()
+    client.get_file.return_value = bad
+    client.get_session.return_value = flywheel.Session(label="ses")
+    checkpoint_dir = tmp_path / "checkpoints"
+    batch_validator = BatchValidator(
+        CSV_SCHEMA,
+        validator_config={"checkpoint_dir": checkpoint_dir},
+        container_cache=ContainerCache(),
+    )
+
+    (first,) = batch_validator.validate_file_ids(client, ["bad"])
+    saved = checkpoint.load_checkpoint(
+        checkpoint.checkpoint_path(checkpoint_dir, "bad")
+    )
+    assert saved is not None
+
+    rows = source.read_text().splitlines()
+    with open(source, "a") as fp:
+        fp.write(rows[2] + "\n")
+    (second,) = batch_validator.validate_file_ids(client, ["bad"])
+
+    updated = checkpoint.load_checkpoint(
+        checkpoint.checkpoint_path(checkpoint_dir, "bad")
+    )
+    assert updated.row_count == saved.row_count + 1
+    assert second.errors[: len(first.errors)] == first.errors
+    assert second.errors[-1]["location"]["line"] == len(rows)
+
+
+def test_validate_file_ids_extensionless_file():
+    file_entry = make_file_entry("readme", "README", ASSETS / "test_input_valid.csv")
+    file_entry.mimetype = None
+    client = MagicMock()
+    client.get_file.return_value = file_entry
+    client.get_session.return_value = flywheel.Session(label="ses")
+
+    batch_validator = BatchValidator(
+        {"type": "object", "properties": {"file": {"required": ["name"]}}},
+        validation_level="flywheel",
+        container_cache=ContainerCache(),
+    )
+    results = batch_validator.validate_file_ids(client, ["readme", "readme"])
+
+    assert [(r.file_id, r.valid) for r in results] == [
+        ("readme", True),
+        ("readme", True),
+    ]
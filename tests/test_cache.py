@@ -0,0 +1,164 @@
+import json
+from unittest.mock import MagicMock
+
+from flywheel import FileEntry, Session
+
+from fw_gear_file_validator import validator
+from fw_gear_file_validator.cache import (
+    ContainerCache,
+    LRUCache,
+    artifact_path,
+    load_artifact,
+    schema_hash,
+    validator_cache,
+)
+from fw_gear_file_validator.loader import FwLoader
+from fw_gear_file_validator.utils import FwReference
+
+SCHEMA = {
+    "type": "object",
+    "properties": {"a": {"type": "string"}, "b": {"type": "integer"}},
+}
+
+REF_SCHEMA = {
+    "type": "object",
+    "definitions": {"count": {"type": "integer", "minimum": 0}},
+    "properties": {"a": {"type": "string"}, "b": {"$ref": "#/definitions/count"}},
+    "required": ["a"],
+}
+
+
+def test_schema_hash_ignores_key_order():
+    reordered = {
+        "properties": {"b": {"type": "integer"}, "a": {"type": "string"}},
+        "type": "object",
+    }
+    assert schema_hash(SCHEMA) == schema_hash(reordered)
+    assert schema_hash(SCHEMA) != schema_hash({**SCHEMA, "required": ["a"]})
+
+
+def test_lru_cache_counts_and_evicts():
+    cache = LRUCache(maxsize=2)
+    calls = []
+
+    def factory(value):
+        calls.append(value)
+        return value
+
+    assert cache.get_or_create("a", lambda: factory(1)) == 1
+    assert cache.get_or_create("a", lambda: factory(2)) == 1
+    cache.get_or_create("b", lambda: factory(3))
+    cache.get_or_create("a", lambda: factory(4))
+    cache.get_or_create("c", lambda: factory(5))
+    # "b" was the least recently used entry
+    assert cache.get_or_create("b", lambda: factory(6)) == 6
+
+    assert calls == [1, 3, 5, 6]
+    info = cache.cache_info()
+    assert (info.hits, info.misses, info.maxsize, info.currsize) == (2, 4, 2, 2)
+
+    cache.cache_clear()
+    assert cache.cache_info() == (0, 0, 2, 0)
+
+
+def test_initialize_validator_uses_cache(tmp_path):
+    validator_cache.cache_clear()
+    schema_path = tmp_path / "schema.json"
+    schema_path.write_text(json.dumps(SCHEMA))
+
+    first = validator.initialize_validator("csv", SCHEMA)
+    second = validator.initialize_validator("csv", schema_path)
+    json_validator = validator.initialize_validator("json", SCHEMA)
+
+    assert first is second
+    assert isinstance(json_validator, validator.JsonValidator)
+    assert json_validator is not first
+    info = validator_cache.cache_info()
+    assert (info.hits, info.misses) == (1, 2)
+
+
+def test_column_dtypes_resolved_once():
+    csv_validator = validator.CsvValidator(SCHEMA)
+    dtypes = csv_validator.get_column_dtypes()
+    dtypes["a"] = int
+    assert csv_validator.get_column_dtypes() == {"a": str, "b": int}
+
+
+def test_schema_artifact_round_trip(tmp_path, mocker):
+    validator_cache.cache_clear()
+    built = validator.initialize_validator("csv", REF_SCHEMA, artifact_dir=tmp_path)
+    digest = schema_hash(REF_SCHEMA)
+    path = artifact_path(tmp_path, validator.CsvValidator, digest)
+    state = load_artifact(path, digest)
+    assert state == {
+        "properties": {"a": {"type": "string"}, "b": {"type": "integer", "minimum": 0}},
+        "header": ["a", "b"],
+        "column_dtypes": {"a": "string", "b": "integer"},
+    }
+
+    # A new process only has the artifact: nothing is resolved again.
+    validator_cache.cache_clear()
+    resolve = mocker.spy(validator.CsvValidator, "resolve_properties")
+    loaded = validator.initialize_validator("csv", REF_SCHEMA, artifact_dir=tmp_path)
+    assert loaded is not built
+    assert loaded.get_column_dtypes() == {"a": str, "b": int}
+    rows = [{"a": "x", "b": "-1"}, {"b": "2"}]
+    assert loaded.validate(rows) == built.validate(rows)
+    assert resolve.call_count == 1  # once, returning the restored properties
+    assert loaded._properties == state["properties"]
+
+
+def test_schema_artifact_ignored_when_stale(tmp_path):
+    digest = schema_hash(SCHEMA)
+    path = artifact_path(tmp_path, validator.CsvValidator, digest)
+    assert load_artifact(path, digest) is None
+
+    path.write_text("not json")
+    assert load_artifact(path, digest) is None
+
+    validator_cache.cache_clear()
+    validator.initialize_validator("csv", SCHEMA, artifact_dir=tmp_path)
+    artifact = json.loads(path.read_text())
+    assert load_artifact(path, digest) == artifact["state"]
+    assert load_artifact(path, schema_hash(REF_SCHEMA)) is None
+
+    artifact["format_version"] += 1
+    path.write_text(json.dumps(artifact))
+    assert load_artifact(path, digest) is None
+
+
+def test_lru_cache_expires_entries():
+    now = [0.0]
+    cache = LRUCache(maxsize=2, ttl=10, timer=lambda: now[0])
+    assert cache.get_or_create("a", lambda: 1) == 1
+    now[0] = 9
+    assert cache.get_or_create("a", lambda: 2) == 1
+    now[0] = 10
+    assert cache.get_or_create("a", lambda: 3) == 3
+    assert cache.cache_info() == (1, 2, 2, 1)
+
+
+def test_container_cache_shares_parents():
+    container_cache = ContainerCache(maxsize=8, ttl=60)
+    session = Session(id="ses", label="session")
+    client = MagicMock()
+    client.get_session.return_value = session
+    loader = FwLoader({"add_parents": True, "container_cache": container_cache})
+
+    for file_id in ["f1", "f2", "f3"]:
+        file = FileEntry(
+            name=f"{file_id}.csv", file_id=file_id, parents={"session": "ses"}
+        )
+        client.get_file.return_value = file
+        ref = FwReference.init_from_gear_input(
+            client, file, content="flywheel", container_cache=container_cache
+        )
+        loaded, _ = loader.load_object(ref.loc)
+        assert loaded["session"]["label"] == "session"
+        assert loaded["file"]["name"] == f"{file_id}.csv"
+
+    # One fetch for the three files, and one cache miss overall. Filtering a
+    # container just fetched is not counted as a hit.
+    client.get_session.assert_called_once_with("ses")
+    info = container_cache.cache_info()
+    assert (info.hits, info.misses, info.currsize) == (2, 1, 1)
@@ -0,0 +1,113 @@
+"""Module to test checkpoint.py"""
+
+import pytest
+
+from fw_gear_file_validator import checkpoint, errors, validator
+from fw_gear_file_validator.loader import CsvLoader
+
+SCHEMA = {
+    "type": "object",
+    "properties": {
+        "a": {"type": "integer"},
+        "b": {"type": "string", "maxLength": 2},
+    },
+}
+
+
+@pytest.fixture
+def csv_validator():
+    return validator.CsvValidator(SCHEMA)
+
+
+def full_errors(csv_validator, csv_path):
+    with CsvLoader.stream_object(csv_path) as stream:
+        return csv_validator.validate(stream)[1]
+
+
+def test_appended_rows_match_full_validation(tmp_path, csv_validator, mocker):
+    csv_path = tmp_path / "log.csv"
+    csv_path.write_text('a,b\n1,ok\n2,"too\nlong"\n')
+    valid, row_errors, first = checkpoint.validate_csv_with_checkpoint(
+        csv_path, csv_validator
+    )
+    assert valid is False
+    assert first.row_count == 2
+    assert first.byte_offset == csv_path.stat().st_size
+
+    path = checkpoint.checkpoint_path(tmp_path / "checkpoints", "file-id")
+    checkpoint.save_checkpoint(path, first)
+    loaded = checkpoint.load_checkpoint(path)
+    assert loaded == first
+
+    with open(csv_path, "a") as fp:
+        fp.write("x,ok\n4,long\n")
+    stream_object = mocker.spy(CsvLoader, "stream_object")
+    valid, row_errors, second = checkpoint.validate_csv_with_checkpoint(
+        csv_path, csv_validator, loaded
+    )
+    # Only the appended rows were parsed.
+    stream_object.assert_not_called()
+    assert valid is False
+    assert row_errors == full_errors(csv_validator, csv_path)
+    assert [e["location"]["line"] for e in row_errors] == [2, 3, 4]
+    assert second.row_count == 4
+    assert second.byte_offset == csv_path.stat().st_size
+
+
+def test_changed_prefix_validates_whole_file(tmp_path, csv_validator):
+    csv_path = tmp_path / "log.csv"
+    csv_path.write_text("a,b\n1,long\n")
+    _, _, first = checkpoint.validate_csv_with_checkpoint(csv_path, csv_validator)
+
+    csv_path.write_text("a,b\n1,ok\n2,ok\n")
+    valid, row_errors, second = checkpoint.validate_csv_with_checkpoint(
+        csv_path, csv_validator, first
+    )
+    assert valid is True
+    assert row_errors == []
+    assert second.row_count == 2
+
+
+def test_changed_settings_validate_whole_file(tmp_path, csv_validator):
+    csv_path = tmp_path / "log.csv"
+    csv_path.write_text("a,b\n1,long\n")
+    _, _, first = checkpoint.validate_csv_with_checkpoint(csv_path, csv_validator)
+
+    errors.set_error_detail("keyword")
+    try:
+        _, row_errors, second = checkpoint.validate_csv_with_checkpoint(
+            csv_path, csv_validator, first
+        )
+    finally:
+        errors.set_error_detail("full")
+    assert row_errors[0]["expected"] == "2"
+    assert second.options["error_detail"] == "keyword"
+
+
+@pytest.mark.parametrize(
+    "content",
+    ["a,b\n", "a,b,c\n1,ok,3\n", "a,b\n1,ok\n2,ok", "a,b\n1,ok\n2\n"],
+    ids=["no-rows", "invalid-header", "no-final-newline", "malformed"],
+)
+def test_no_checkpoint(tmp_path, csv_validator, content):
+    csv_path = tmp_path / "log.csv"
+    csv_path.write_text(content)
+    _, _, new_checkpoint = checkpoint.validate_csv_with_checkpoint(
+        csv_path, csv_validator
+    )
+    assert new_checkpoint is None
+
+
+def test_malformed_appended_rows(tmp_path, csv_validator):
+    csv_path = tmp_path / "log.csv"
+    csv_path.write_text("a,b\n1,ok\n")
+    _, _, first = checkpoint.validate_csv_with_checkpoint(csv_path, csv_validator)
+
+    with open(csv_path, "a") as fp:
+        fp.write("2\n")
+    valid, row_errors, second = checkpoint.validate_csv_with_checkpoint(
+        csv_path, csv_validator, first
+    )
+    assert valid is False
+    assert [e["code"] for e in row_errors] == ["malformed-file"]
+    assert second is None
@@ -0,0 +1,112 @@
+"""Module to test cli.py"""
+
+import json
+
+import pytest
+
+from fw_gear_file_validator import cli, errors
+
+SCHEMA = {
+    "type": "object",
+    "properties": {"a": {"type": "integer"}, "b": {"type": "string", "maxLength": 3}},
+    "required": ["a"],
+}
+
+
+@pytest.fixture
+def corpus(tmp_path):
+    (tmp_path / "schema.json").write_text(json.dumps(SCHEMA))
+    (tmp_path / "data" / "sub").mkdir(parents=True)
+    (tmp_path / "data" / "bad.csv").write_text("a,b\n1,ok\n2,toolong\n")
+    (tmp_path / "data" / "sub" / "good.csv").write_text("a,b\n1,ok\n")
+    (tmp_path / "data" / "records.ndjson").write_text('{"a": 1}\n{"a": 2}\n')
+    (tmp_path / "data" / "notes.txt").write_text("not validated")
+    yield tmp_path
+    errors.set_error_detail("full")
+
+
+def run(corpus, capsys, *args):
+    status = cli.main(["validate", "--schema", str(corpus / "schema.json"), *args])
+    return status, capsys.readouterr().out
+
+
+def test_expand_paths(corpus):
+    data = corpus / "data"
+    paths = cli.expand_paths(
+        [str(data / "**" / "*.csv"), str(data), str(data / "missing.csv")]
+    )
+    assert [p.relative_to(data).as_posix() for p in paths] == [
+        "bad.csv",
+        "sub/good.csv",
+        "records.ndjson",
+        "missing.csv",
+    ]
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_validate_ndjson_report(corpus, capsys, workers):
+    status, out = run(
+        corpus,
+        capsys,
+        str(corpus / "data"),
+        "--format",
+        "ndjson",
+        "--workers",
+        str(workers),
+    )
+    results = [json.loads(line) for line in out.splitlines()]
+
+    assert status == cli.EXIT_INVALID
+    assert [(r["file"].rsplit("/", 1)[-1], r["state"]) for r in results] == [
+        ("bad.csv", "FAIL"),
+        ("records.ndjson", "PASS"),
+        ("good.csv", "PASS"),
+    ]
+    assert results[0]["errors"][0]["location"] == {"line": 2, "column_name": "b"}
+    assert results[0]["records"] == 2
+    assert results[0]["mb_per_sec"] > 0
+
+
+def test_validate_json_report(corpus, capsys, tmp_path):
+    output = tmp_path / "report.json"
+    status, out = run(
+        corpus,
+        capsys,
+        str(corpus / "data" / "sub" / "good.csv"),
+        "--format",
+        "json",
+        "--output",
+        str(output),
+    )
+    report = json.loads(output.read_text())
+
+    assert status == cli.EXIT_VALID
+    assert out == ""
+    assert report["summary"]["valid"] == 1
+    assert report["files"][0]["state"] == "PASS"
+
+
+def test_validate_exit_errors(corpus, capsys):
+    status, out = run(corpus, capsys, str(corpus / "data" / "notes.txt"))
+    assert status == cli.EXIT_ERROR
+    assert "ERROR" in out and "not supported" in out
+
+    status, out = run(corpus, capsys, str(corpus / "data" / "missing.csv"))
+    assert status == cli.EXIT_ERROR
+
+    assert cli.main(["validate", "--schema", "missing.json", "x.csv"]) == cli.EXIT_ERROR
+
+
+def test_validate_columnar_engine(corpus, capsys):
+    pytest.importorskip("numpy")
+    bad_csv = str(corpus / "data" / "bad.csv")
+    _, row_out = run(corpus, capsys, bad_csv, "--format", "ndjson")
+    status, out = run(
+        corpus, capsys, bad_csv, "--format", "ndjson", "--engine", "columnar"
+    )
+
+    errors, row_errors = json.loads(out)["errors"], json.loads(row_out)["errors"]
+    for error in errors + row_errors:
+        error.pop("timestamp")
+    assert status == cli.EXIT_INVALID
+    assert errors == row_errors
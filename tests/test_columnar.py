@@ -0,0 +1,71 @@
+import copy
+
+import pytest
+
+from fw_gear_file_validator import validator
+
+pytest.importorskip("numpy")
+
+from fw_gear_file_validator.columnar import ColumnarCsvValidator
+
+
+@pytest.mark.parametrize("drop_empty", [True, False])
+def test_columnar_matches_row_validator(drop_empty, flat_schema, flat_rows):
+    rows = flat_rows
+    row_validator = validator.CsvValidator(flat_schema)
+    columnar_validator = ColumnarCsvValidator(flat_schema, chunk_size=64)
+
+    expected = row_validator.validate(copy.deepcopy(rows), drop_empty=drop_empty)
+    result = columnar_validator.validate(copy.deepcopy(rows), drop_empty=drop_empty)
+
+    assert not result[0]
+    assert result == expected
+
+
+def test_columnar_handles_uncast_and_non_string_cells():
+    schema = {
+        "required": ["a"],
+        "properties": {
+            "a": {"type": "integer", "maximum": 10, "enum": [1, 2, 99]},
+            "b": {"type": "string", "pattern": "^x", "maxLength": 2},
+            "c": {"type": "boolean", "enum": ["yes"]},
+            "d": {"type": "number", "minimum": 0},
+        },
+    }
+    rows = [
+        {"a": "1", "b": "xy", "c": "yes", "d": "1e3"},
+        {"a": "99999999999999999999", "b": 5, "c": "no", "d": "-inf"},
+        {"a": "99", "b": "xyz", "d": "nan"},
+        {"a": 7.5, "b": "y", "c": "", "d": "one"},
+        {"b": "x"},
+    ]
+    expected = validator.CsvValidator(schema).validate(copy.deepcopy(rows))
+    result = ColumnarCsvValidator(schema).validate(copy.deepcopy(rows))
+    assert result == expected
+
+
+def test_columnar_string_enum_keeps_nul_characters():
+    schema = {"properties": {"a": {"type": "string", "enum": ["a"]}}}
+    rows = [{"a": "a\x00"}, {"a": "a"}]
+    expected = validator.CsvValidator(schema).validate(copy.deepcopy(rows))
+    result = ColumnarCsvValidator(schema).validate(copy.deepcopy(rows))
+    assert [e["code"] for e in result[1]] == ["enum"]
+    assert result == expected
+
+
+def test_columnar_falls_back_for_non_flat_schema():
+    schema = {"properties": {"a": {"anyOf": [{"type": "string"}]}}}
+    columnar_validator = ColumnarCsvValidator(schema)
+    assert columnar_validator.flat_schema is None
+    valid, errors = columnar_validator.validate([{"a": "1"}])
+    assert valid
+    assert errors == []
+
+
+def test_initialize_columnar_validator(flat_schema):
+    csv_validator = validator.initialize_validator(
+        "csv", flat_schema, engine="columnar"
+    )
+    assert isinstance(csv_validator, ColumnarCsvValidator)
+    with pytest.raises(ValueError):
+        validator.initialize_validator("csv", flat_schema, engine="unknown")
@@ -0,0 +1,64 @@
+import copy
+
+import pytest
+
+from fw_gear_file_validator import validator
+from fw_gear_file_validator.compiler import compile_flat_schema
+
+
+def test_flat_schema_is_compiled(flat_schema):
+    csv_validator = validator.CsvValidator(flat_schema)
+    assert csv_validator.flat_schema is not None
+    assert [c for c, _ in csv_validator.flat_schema.columns] == sorted(
+        flat_schema["properties"]
+    )
+
+
+def test_flat_schema_matches_jsonschema(flat_schema, flat_rows):
+    compiled = validator.CsvValidator(flat_schema)
+    generic = validator.CsvValidator(flat_schema)
+    generic.flat_schema = None
+
+    rows = flat_rows
+    valid, errors = compiled.validate(copy.deepcopy(rows))
+    expected_valid, expected_errors = generic.validate(copy.deepcopy(rows))
+
+    assert not valid
+    assert valid == expected_valid
+    assert errors == expected_errors
+    assert {e["code"] for e in errors} == {
+        "required",
+        "type",
+        "minimum",
+        "maximum",
+        "pattern",
+        "enum",
+        "maxLength",
+        "minLength",
+    }
+
+
+@pytest.mark.parametrize(
+    "schema",
+    [
+        {"properties": {"a": {"type": "string"}}, "additionalProperties": False},
+        {"properties": {"a": {"type": "string", "format": "date"}}},
+        {"properties": {"a": {"anyOf": [{"type": "string"}]}}},
+        {"properties": {"a": {"enum": [True, 1]}}},
+        {"properties": {"a": True}},
+        {"properties": {"a": {"type": "string"}}, "allOf": [{"required": ["a"]}]},
+    ],
+)
+def test_unsupported_schema_falls_back(schema):
+    assert compile_flat_schema(schema, schema["properties"]) is None
+    csv_validator = validator.CsvValidator(schema)
+    assert csv_validator.flat_schema is None
+
+
+def test_enum_does_not_match_bools():
+    schema = {"properties": {"a": {"enum": [1, 0]}}}
+    compiled = compile_flat_schema(schema, schema["properties"])
+    generic = validator.JsonValidator(schema)
+    for value in [True, False, 1, 0.0, "1"]:
+        expected = [e.message for e in generic.validator.iter_errors({"a": value})]
+        assert [e.message for e in compiled.iter_errors({"a": value})] == expected
@@ -2,6 +2,7 @@ from pathlib import Path
 from unittest.mock import MagicMock
 
 import flywheel
+import pytest
 from jsonschema.exceptions import ValidationError
 
 from fw_gear_file_validator import errors, utils, validator
@@ -121,3 +122,107 @@ def test_add_flywheel_location_to_errors_flywheel_metadata():
 
     assert result[0]["container_id"] == "acq123"
     assert "flywheel_path" in result[0]
+
+
+def test_fast_errors_match_file_error_model():
+    schema_errors = [
+        errors.make_empty_file_error(),
+        errors.make_incorrect_header_error("Col4"),
+        ValidationError(
+            message="'missing_field' is a required property",
+            schema_path=["properties", "test_field", "required"],
+            validator="required",
+        ),
+    ]
+    test_validator = validator.JsonValidator(test_allOf)
+    for instance in [{"required_key1": 1}, {"required_key1": "a", "required_key2": 2}]:
+        schema_errors.extend(test_validator.validator.iter_errors(instance))
+
+    fast = [errors.validator_error_to_standard(e) for e in schema_errors]
+    errors.set_strict_errors(True)
+    try:
+        strict = [errors.validator_error_to_standard(e) for e in schema_errors]
+    finally:
+        errors.set_strict_errors(False)
+
+    assert fast == strict
+    assert [list(error) for error in fast] == [list(error) for error in strict]
+
+
+@pytest.mark.parametrize("mode", errors.ERROR_DETAIL_MODES)
+def test_error_detail_modes(mode):
+    schema = {
+        "type": "object",
+        "properties": {"rows": {"type": "array", "maxItems": 2}},
+        "required": ["rows", "name"],
+    }
+    document = {"rows": [{"key": "x" * 50, "index": i} for i in range(2000)]}
+    schema_errors = list(
+        validator.JsonValidator(schema).validator.iter_errors(document)
+    )
+
+    full = [errors.validator_error_to_standard(e) for e in schema_errors]
+    errors.set_error_detail(mode, max_length=40)
+    try:
+        detailed = [errors.validator_error_to_standard(e) for e in schema_errors]
+        errors.set_strict_errors(True)
+        strict = [errors.validator_error_to_standard(e) for e in schema_errors]
+    finally:
+        errors.set_strict_errors(False)
+        errors.set_error_detail("full")
+
+    assert detailed == strict
+    max_items = next(e for e in detailed if e["code"] == "maxItems")
+    required = next(e for e in detailed if e["code"] == "required")
+    assert required["location"] == {"key_path": ".name"}
+    if mode == "full":
+        assert detailed == full
+        return
+
+    assert len(str(detailed)) * 100 < len(str(full))
+    assert len(max_items["value"]) <= 40
+    assert len(max_items["message"]) <= 40
+    expected = {
+        "truncated": "{'maxItems': 2, 'type': 'array'}",
+        "keyword": "2",
+        "schema_path": "#/properties/rows/maxItems",
+    }
+    assert max_items["expected"] == expected[mode]
+
+
+def test_error_detail_rejects_unknown_mode():
+    with pytest.raises(ValueError):
+        errors.set_error_detail("everything")
+
+
+def test_aggregate_errors():
+    schema = {
+        "type": "object",
+        "properties": {"a": {"type": "integer"}, "b": {"maxLength": 2}},
+        "required": ["a"],
+    }
+    rows = [{"a": "x", "b": "long" if i % 2 else "ok"} for i in range(100)]
+    rows.append({"b": "ok"})
+    _, row_errors = validator.CsvValidator(schema).validate(rows)
+    for error in row_errors:
+        error["container_id"] = "file-id"
+
+    groups = errors.aggregate_errors(row_errors, max_examples=3)
+
+    assert [(g["code"], g["column_name"], g["count"]) for g in groups] == [
+        ("type", "a", 100),
+        ("maxLength", "b", 50),
+        ("required", "a", 1),
+    ]
+    max_length = groups[1]
+    assert (max_length["first_line"], max_length["last_line"]) == (2, 100)
+    assert max_length["examples"] == [
+        {"line": 2, "value": "long"},
+        {"line": 4, "value": "long"},
+        {"line": 6, "value": "long"},
+    ]
+    assert max_length["container_id"] == "file-id"
+    assert errors.make_report(row_errors, "errors") is row_errors
+    assert errors.make_report(row_errors, "aggregate") == errors.aggregate_errors(
+        row_errors
+    )
@@ -0,0 +1,158 @@
+"""Module to test fileio.py"""
+
+import functools
+import io
+
+import pytest
+
+from fw_gear_file_validator import fileio
+from fw_gear_file_validator.loader import CsvLoader, JsonLoader
+
+CONTENT = b'a,b\r\n1,"multi\nline"\r\n2,x\r\n3,y'
+
+
+@pytest.mark.parametrize("mmap_threshold", [1, None])
+def test_file_buffer(tmp_path, mmap_threshold):
+    file_path = tmp_path / "rows.csv"
+    file_path.write_bytes(CONTENT)
+    with fileio.FileBuffer(file_path, mmap_threshold=mmap_threshold) as buffer:
+        assert buffer.mapped is (mmap_threshold is not None)
+        assert buffer.size == len(CONTENT)
+        assert buffer.data[:3] == b"a,b"
+        assert buffer.text_stream("UTF-8").read() == CONTENT.decode()
+        lines = fileio.LineReader(buffer, start=5, encoding="UTF-8")
+        assert next(iter(lines)) == '1,"multi\n'
+        assert lines.offset == 14
+        assert not buffer.has_cr_newlines()
+
+
+def test_map_text_file(tmp_path):
+    file_path = tmp_path / "rows.csv"
+    file_path.write_bytes(CONTENT)
+    with open(file_path, newline="") as text_file:
+        buffer = fileio.map_text_file(text_file, mmap_threshold=1)
+        assert buffer.mapped
+        assert buffer.data[:] == CONTENT
+        buffer.close()
+        assert fileio.map_text_file(text_file) is None
+    assert fileio.map_text_file(io.StringIO("a,b\n")) is None
+
+
+@pytest.mark.parametrize("mmap_threshold", [1, fileio.MMAP_THRESHOLD])
+def test_stream_mapped_and_read_files(tmp_path, mocker, mmap_threshold):
+    mocker.patch(
+        "fw_gear_file_validator.loader.map_text_file",
+        functools.partial(fileio.map_text_file, mmap_threshold=mmap_threshold),
+    )
+    csv_path = tmp_path / "rows.csv"
+    csv_path.write_bytes(CONTENT)
+    stream = CsvLoader.stream_object(csv_path)
+
+    assert (stream._buffer is not None) is (mmap_threshold == 1)
+    assert list(stream) == [
+        {"a": "1", "b": "multi\nline"},
+        {"a": "2", "b": "x"},
+        {"a": "3", "b": "y"},
+    ]
+    assert stream.errors is None
+    assert stream._buffer is None and stream._reader is None
+
+
+@pytest.mark.parametrize("mmap_threshold", [1, None])
+def test_stream_row_offsets(tmp_path, mocker, mmap_threshold):
+    mocker.patch(
+        "fw_gear_file_validator.loader.FileBuffer",
+        functools.partial(fileio.FileBuffer, mmap_threshold=mmap_threshold),
+    )
+    csv_path = tmp_path / "rows.csv"
+    csv_path.write_bytes(CONTENT)
+    stream = CsvLoader({"byte_ranges": True}).open_object(csv_path)[0]
+    rows = list(stream)
+
+    assert rows[0] == {"a": "1", "b": "multi\nline"}
+    assert stream.header_end == 5
+    assert [CONTENT[slice(*stream.byte_range(line))] for line in (1, 2, 3)] == [
+        b'1,"multi\nline"\r\n',
+        b"2,x\r\n",
+        b"3,y",
+    ]
+    assert stream._buffer is None and stream._reader is None
+
+
+def test_stream_cr_newlines(tmp_path):
+    csv_path = tmp_path / "rows.csv"
+    csv_path.write_bytes(b"a,b\r1,2\r")
+    stream = CsvLoader.stream_object(csv_path, track_offsets=True)
+    assert list(stream) == [{"a": "1", "b": "2"}]
+    assert stream.errors is None
+    assert stream.row_offsets is None
+
+
+def test_json_loader_reads_once(tmp_path, mocker):
+    json_path = tmp_path / "data.json"
+    json_path.write_bytes(b'{"a": [1, 2]}')
+    mock_open = mocker.patch("fw_gear_file_validator.fileio.open", wraps=open)
+    content, errors = JsonLoader().load_object(json_path)
+    assert content == {"a": [1, 2]}
+    assert errors is None
+    assert mock_open.call_count == 1
+
+    mocker.patch(
+        "fw_gear_file_validator.loader.FileBuffer",
+        functools.partial(fileio.FileBuffer, mmap_threshold=1),
+    )
+    content, errors = JsonLoader().load_object(json_path)
+    assert content == {"a": [1, 2]}
+
+    json_path.write_bytes(b"")
+    content, errors = JsonLoader().load_object(json_path)
+    assert content is None
+    assert errors[0]["code"] == "empty-file"
+
+
+@pytest.mark.parametrize(
+    "content",
+    [
+        '{"a": 1}'.encode("UTF-16"),
+        '{"a": 1}'.encode("UTF-32-LE"),
+        b'\xef\xbb\xbf{"a": 1}',
+        b'{"a": "\xff"}',
+    ],
+    ids=["utf-16", "utf-32", "bom", "latin-1"],
+)
+def test_json_loader_decodes_utf8_strictly(tmp_path, content):
+    json_path = tmp_path / "data.json"
+    json_path.write_bytes(content)
+    content, errors = JsonLoader().load_object(json_path)
+    assert content is None
+    assert [e["code"] for e in errors] == ["malformed-file"]
+
+
+def test_stream_closes_file_on_mapping_failure(tmp_path, mocker):
+    opened = []
+
+    def tracking_open(*args, **kwargs):
+        opened.append(open(*args, **kwargs))
+        return opened[-1]
+
+    mocker.patch("fw_gear_file_validator.loader.open", tracking_open, create=True)
+    mocker.patch(
+        "fw_gear_file_validator.loader.map_text_file", side_effect=OSError("no map")
+    )
+    csv_path = tmp_path / "rows.csv"
+    csv_path.write_bytes(CONTENT)
+    stream = CsvLoader.stream_object(csv_path)
+
+    assert list(stream) == []
+    assert [e["code"] for e in stream.errors] == ["malformed-file"]
+    assert len(opened) == 1 and opened[0].closed
+
+
+@pytest.mark.parametrize("track_offsets", [False, True])
+def test_stream_encoding(tmp_path, track_offsets):
+    csv_path = tmp_path / "rows.csv"
+    csv_path.write_bytes("a\ncafé\n".encode("latin-1"))
+    loader = CsvLoader({"encoding": "latin-1", "byte_ranges": track_offsets})
+    stream, _ = loader.open_object(csv_path)
+    assert list(stream) == [{"a": "café"}]
+    assert (stream.row_offsets is not None) is track_offsets
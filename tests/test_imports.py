@@ -0,0 +1,61 @@
+"""Module to test the modules the validation core imports."""
+
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+# Only needed to talk to Flywheel, or to build strict errors.
+FLYWHEEL_STACK = ("flywheel", "flywheel_gear_toolkit", "pydantic", "numpy")
+
+
+def imported_packages(statement: str) -> list:
+    """Returns the packages of the Flywheel stack a statement imports."""
+    code = (
+        f"import sys; {statement}; "
+        f"print(*sorted({{m.split('.')[0] for m in sys.modules}} & {set(FLYWHEEL_STACK)}))"
+    )
+    env = {**os.environ, "PYTHONPATH": str(BASE_DIR)}
+    result = subprocess.run(
+        [sys.executable, "-c", code],
+        capture_output=True,
+        text=True,
+        check=True,
+        env=env,
+        cwd=BASE_DIR,
+    )
+    return result.stdout.split()
+
+
+@pytest.mark.parametrize(
+    "module",
+    [
+        "validator",
+        "loader",
+        "errors",
+        "parser",
+        "sinks",
+        "checkpoint",
+        "incremental",
+        "parallel",
+        "cli",
+        "service",
+        "aio",
+    ],
+)
+def test_core_modules_do_not_import_flywheel(module):
+    assert imported_packages(f"import fw_gear_file_validator.{module}") == []
+
+
+def test_strict_errors_import_pydantic():
+    statement = (
+        "from fw_gear_file_validator import errors; "
+        "errors.set_strict_errors(True); "
+        "from jsonschema import Draft7Validator; "
+        "errors.validator_error_to_standard("
+        "next(Draft7Validator({'type': 'string'}).iter_errors(1)))"
+    )
+    assert imported_packages(statement) == ["pydantic"]
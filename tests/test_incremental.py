@@ -0,0 +1,124 @@
+"""Module to test incremental.py"""
+
+import json
+
+from fw_gear_file_validator import incremental
+from fw_gear_file_validator.cache import schema_hash
+from fw_gear_file_validator.limits import ErrorLimits
+
+
+def test_content_hash_of_files(tmp_path):
+    file_path = tmp_path / "rows.csv"
+    file_path.write_text("a,b\n1,2\n")
+    digest = incremental.content_hash(None, file_path)
+    assert digest == incremental.content_hash(None, file_path)
+
+    file_path.write_text("a,b\n1,3\n")
+    assert incremental.content_hash(None, file_path) != digest
+
+
+def test_content_hash_of_hierarchies_ignores_own_qc_results():
+    hierarchy = {
+        "file": {
+            "name": "a.csv",
+            "modified": "2024-01-01",
+            "info": {"qc": {"other-gear": {"state": "PASS"}}, "age": 3},
+        }
+    }
+    digest = incremental.content_hash(hierarchy, hierarchy, "file-validator")
+
+    hierarchy["file"]["modified"] = "2024-02-01"
+    hierarchy["file"]["info"]["qc"]["file-validator"] = {"state": "FAIL"}
+    assert incremental.content_hash(hierarchy, hierarchy, "file-validator") == digest
+    # The QC result saved by the gear is left untouched.
+    assert "file-validator" in hierarchy["file"]["info"]["qc"]
+
+    hierarchy["file"]["info"]["qc"]["other-gear"]["state"] = "FAIL"
+    assert incremental.content_hash(hierarchy, hierarchy, "file-validator") != digest
+
+
+def test_validation_hash_depends_on_schema_and_options():
+    options = incremental.result_options(
+        {"report_mode": "errors", "error_limits": ErrorLimits()}
+    )
+    digest = incremental.validation_hash("content", schema_hash({"type": "object"}))
+    assert digest == incremental.validation_hash(
+        "content", schema_hash({"type": "object"})
+    )
+    assert digest != incremental.validation_hash(
+        "content", schema_hash({"type": "array"})
+    )
+    with_options = incremental.validation_hash("content", "schema", options)
+    options["error_limits"]["max_errors"] = 10
+    assert with_options != incremental.validation_hash("content", "schema", options)
+
+
+def test_local_state_store(tmp_path):
+    state_file = tmp_path / "state" / "results.json"
+    store = incremental.LocalStateStore(state_file)
+    assert store.get("file-1", "hash-1") is None
+
+    store.put("file-1", "hash-1", "FAIL", {"data": [{"code": "type"}]})
+    reopened = incremental.LocalStateStore(state_file)
+    assert reopened.get("file-1", "hash-1") == (
+        "FAIL",
+        {"error_count": 1, "validation_hash": "hash-1"},
+    )
+    assert reopened.get("file-1", "hash-2") is None
+    assert reopened.get("file-2", "hash-1") is None
+
+    state_file.write_text(json.dumps({"format_version": 0, "results": {}}))
+    assert incremental.LocalStateStore(state_file).get("file-1", "hash-1") is None
+
+
+def test_local_state_store_appends_and_compacts(tmp_path):
+    state_file = tmp_path / "results.json"
+    store = incremental.LocalStateStore(state_file)
+    store.put("file-1", "hash-1", "FAIL", {"error_file": "a.ndjson.gz"})
+    store.put("file-2", "hash-2", "PASS", {})
+    store.put("file-1", "hash-3", "PASS", {})
+    with open(state_file, "a") as fp:
+        fp.write('{"file_id": "file-3", "sta')
+    assert len(state_file.read_text().splitlines()) == 5
+
+    reopened = incremental.LocalStateStore(state_file)
+    assert reopened.get("file-1", "hash-3") == ("PASS", {"validation_hash": "hash-3"})
+    assert reopened.get("file-2", "hash-2") == ("PASS", {"validation_hash": "hash-2"})
+    lines = [json.loads(line) for line in state_file.read_text().splitlines()]
+    assert lines[0] == {"format_version": incremental.STATE_FILE_VERSION}
+    assert [line["file_id"] for line in lines[1:]] == ["file-1", "file-2"]
+
+
+def test_result_summary():
+    data = {
+        "data": [{"code": "type"}, {"code": "maxLength"}],
+        "truncated": True,
+        "total_errors": 10,
+    }
+    assert incremental.result_summary(data) == {
+        "truncated": True,
+        "total_errors": 10,
+        "error_count": 2,
+    }
+
+
+def test_qc_result_store():
+    file_info = {
+        "qc": {
+            "file-validator": {
+                "validation": {"state": "PASS", "validation_hash": "hash-1"}
+            }
+        }
+    }
+    store = incremental.open_result_store(None, file_info, "file-validator")
+    assert store.get("file-1", "hash-1") == ("PASS", {"validation_hash": "hash-1"})
+    assert store.get("file-1", "hash-2") is None
+
+    file_info["qc"]["file-validator"]["validation"]["state"] = "NA"
+    assert store.get("file-1", "hash-1") is None
+    assert (
+        incremental.open_result_store(None, None, "file-validator").get(
+            "file-1", "hash-1"
+        )
+        is None
+    )
@@ -0,0 +1,75 @@
+"""Module to test jsonio.py"""
+
+import gc
+import json
+
+import pytest
+
+from fw_gear_file_validator import jsonio
+from fw_gear_file_validator.loader import JsonLoader
+
+DOCUMENTS = [
+    b'{"a": [1, 2.5, -0.0, "x"], "b": {"c": null, "d": true}}',
+    b'{"a": 1, "a": 2}',
+    b"[123456789012345678901234567890, -9223372036854775809]",
+    b'{"a": NaN, "b": Infinity}',
+    b"1e400",
+    '﻿{"a": 1}'.encode(),
+    b'"\\ud800"',
+]
+INVALID = [b"", b"{", b'{"a": 1,}', b'"\x01"', b"[1] 2"]
+
+
+@pytest.fixture(params=jsonio.available_backends())
+def backend(request):
+    jsonio.set_json_backend(request.param)
+    yield request.param
+    jsonio.set_json_backend("auto")
+
+
+@pytest.mark.parametrize("document", DOCUMENTS)
+def test_loads_matches_json(backend, document):
+    assert repr(jsonio.loads(document)) == repr(json.loads(document))
+    assert repr(jsonio.loads(document.decode("utf-8-sig"))) == repr(
+        json.loads(document.decode("utf-8-sig"))
+    )
+
+
+@pytest.mark.parametrize("document", INVALID)
+def test_loads_errors_match_json(backend, document):
+    with pytest.raises(json.JSONDecodeError) as expected:
+        json.loads(document)
+    with pytest.raises(json.JSONDecodeError) as error:
+        jsonio.loads(document)
+    assert type(error.value) is type(expected.value)
+    assert str(error.value) == str(expected.value)
+    assert gc.isenabled()
+
+
+def test_loader_errors(backend, tmp_path):
+    json_path = tmp_path / "data.json"
+    json_path.write_bytes(b'{"a": 1,}')
+    content, errors = JsonLoader().load_object(json_path)
+    assert content is None
+    assert errors[0]["message"].startswith("JSON parsing error: Expecting")
+
+
+def test_set_json_backend(mocker):
+    mocker.patch.object(jsonio, "JSON_BACKEND", jsonio.JSON_BACKEND)
+    with pytest.raises(ValueError):
+        jsonio.set_json_backend("simdjson")
+
+    mocker.patch.object(jsonio, "orjson", None)
+    jsonio.set_json_backend("auto")
+    assert jsonio.JSON_BACKEND == "stdlib"
+    with pytest.raises(ImportError, match=r"\[orjson\]"):
+        jsonio.set_json_backend("orjson")
+
+
+def test_wide_integers_found_across_chunks(mocker):
+    mocker.patch.object(jsonio, "SCAN_SIZE", 8)
+    document = b'{"a": 1, "b": 1234567890123456789}'
+    with memoryview(document) as view:
+        assert jsonio._may_hold_wide_integers(view)
+    assert not jsonio._may_hold_wide_integers(b'{"a": 1, "b": 123456789012345678}')
+    assert repr(jsonio.loads(memoryview(document))) == repr(json.loads(document))
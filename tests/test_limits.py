@@ -0,0 +1,113 @@
+"""Module to test limits.py"""
+
+import pytest
+
+from fw_gear_file_validator import errors, validator
+from fw_gear_file_validator.limits import ErrorLimits, ErrorSummary
+from fw_gear_file_validator.loader import CsvLoader
+
+SCHEMA = {
+    "type": "object",
+    "properties": {
+        "a": {"type": "integer"},
+        "b": {"type": "string", "maxLength": 2},
+    },
+}
+
+
+def make_error(code, column):
+    return {"code": code, "location": {"line": 1, "column_name": column}}
+
+
+def test_collect_stops_at_max_errors():
+    consumed = []
+
+    def error_stream():
+        for i in range(100):
+            consumed.append(i)
+            yield make_error("type", "a")
+
+    kept, summary = ErrorLimits(max_errors=3).collect(error_stream())
+    assert len(kept) == 3
+    # One more error is read to know the report was truncated.
+    assert len(consumed) == 4
+    assert summary == ErrorSummary(total=4, kept=3, truncated=True)
+
+    kept, summary = ErrorLimits(max_errors=3).collect([make_error("type", "a")] * 3)
+    assert summary == ErrorSummary(total=3, kept=3, truncated=False)
+
+    kept, summary = ErrorLimits(fail_fast=True).collect(error_stream())
+    assert len(kept) == 1 and summary.truncated
+
+
+def test_collect_caps_per_column_and_code():
+    stream = [
+        make_error("type", "a"),
+        make_error("type", "a"),
+        make_error("maxLength", "b"),
+        make_error("type", "b"),
+        make_error("maxLength", "b"),
+    ]
+    kept, summary = ErrorLimits(max_per_column=1).collect(stream)
+    assert kept == [stream[0], stream[2]]
+    assert (summary.total, summary.kept, summary.truncated) == (5, 2, True)
+
+    kept, _ = ErrorLimits(max_per_code=1).collect(stream)
+    assert kept == [stream[0], stream[2]]
+
+
+def test_samplers():
+    stride = ErrorLimits(sample_fraction=0.25).sampler()
+    assert [row for row in range(10) if stride(row)] == [0, 4, 8]
+
+    sampled = [
+        [row for row in range(1000) if sampler(row)]
+        for sampler in (
+            ErrorLimits(sample_fraction=0.1, sample_mode="random").sampler()
+            for _ in range(2)
+        )
+    ]
+    assert sampled[0] == sampled[1]
+    assert 50 < len(sampled[0]) < 150
+    assert ErrorLimits().sampler() is None
+
+
+@pytest.mark.parametrize(
+    "kwargs",
+    [{"max_errors": -1}, {"sample_fraction": 0}, {"sample_mode": "every-other"}],
+)
+def test_invalid_limits(kwargs):
+    with pytest.raises(ValueError):
+        ErrorLimits(**kwargs)
+
+
+def test_validate_object_within_limits(tmp_path):
+    csv_path = tmp_path / "rows.csv"
+    csv_path.write_text("a,b\n" + "x,long\n" * 1000)
+    csv_validator = validator.CsvValidator(SCHEMA)
+
+    stream = CsvLoader.stream_object(csv_path)
+    valid, row_errors, summary = validator.validate_object(
+        csv_validator, stream, csv_path, limits=ErrorLimits(max_errors=5)
+    )
+    assert valid is False
+    assert len(row_errors) == 5
+    assert summary.truncated and summary.total == 6
+    # Validation stopped after the third row.
+    assert stream.row_count == 3
+
+    stream = CsvLoader.stream_object(csv_path)
+    _, row_errors, summary = validator.validate_object(
+        csv_validator,
+        stream,
+        csv_path,
+        limits=ErrorLimits(sample_fraction=0.1, max_per_code=1000),
+    )
+    assert sorted({e["location"]["line"] for e in row_errors})[:3] == [1, 11, 21]
+    assert (summary.total, summary.truncated) == (200, False)
+
+    state, data = errors.make_qc_result(row_errors, summary)
+    assert state == "FAIL"
+    assert data["truncated"] is False
+    assert data["total_errors"] == 200
+    assert data["sample_fraction"] == 0.1
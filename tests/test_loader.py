@@ -4,11 +4,15 @@ import tempfile
 from pathlib import Path
 from unittest.mock import MagicMock, patch
 
+import pytest
+
 from fw_gear_file_validator.loader import (
     PARENT_INCLUDE,
     CsvLoader,
     FwLoader,
     JsonLoader,
+    JsonRecordStream,
+    Loader,
 )
 from fw_gear_file_validator.utils import FwReference
 
@@ -211,3 +215,116 @@ def test_fw_loader_filter_container():
     assert "modified" in result
     assert "zip_member_count" in result
     assert "unwanted_field" not in result
+
+
+def write_csv(tmp_path, content):
+    csv_path = tmp_path / "test.csv"
+    csv_path.write_text(content)
+    return csv_path
+
+
+def test_stream_csv_rows(tmp_path):
+    csv_path = write_csv(
+        tmp_path, 'header1,header2\nvalue1,"multi\nline"\nvalue3,value4\n'
+    )
+    stream = CsvLoader.stream_object(csv_path)
+    assert stream.header == ["header1", "header2"]
+
+    rows = iter(stream)
+    assert next(rows) == {"header1": "value1", "header2": "multi\nline"}
+    assert next(rows) == {"header1": "value3", "header2": "value4"}
+    assert list(rows) == []
+    assert stream.errors is None
+    assert stream.row_count == 2
+
+
+def test_stream_csv_field_count_error(tmp_path):
+    csv_path = write_csv(tmp_path, "header1,header2\nvalue1,value2\nvalue3\nv4,v5\n")
+    stream = CsvLoader.stream_object(csv_path)
+    rows = list(stream)
+
+    assert rows == [{"header1": "value1", "header2": "value2"}]
+    assert len(stream.errors) == 1
+    assert stream.errors[0]["code"] == "malformed-file"
+    assert (
+        stream.errors[0]["message"]
+        == "Row 2 has 1 fields while the header has 2 fields."
+    )
+
+
+def test_stream_csv_duplicate_header(tmp_path):
+    csv_path = write_csv(tmp_path, "header1,header1\nvalue1\n")
+    stream = CsvLoader.stream_object(csv_path)
+
+    assert list(stream) == []
+    codes = [e["code"] for e in stream.errors]
+    assert codes == ["malformed-file", "invalid-header"]
+
+
+def test_load_csv_single_pass(tmp_path):
+    csv_path = write_csv(tmp_path, "header1,header2\nvalue1,value2\n")
+    with patch("fw_gear_file_validator.loader.open", wraps=open) as mock_open:
+        rows, errors = CsvLoader().load_object(csv_path)
+
+    assert mock_open.call_count == 1
+    assert rows == [{"header1": "value1", "header2": "value2"}]
+    assert errors is None
+
+
+def test_json_array_is_streamed(tmp_path):
+    records = [{"a": i, "b": "x" * i} for i in range(50)] + [1.5, None, "[,]"]
+    json_path = tmp_path / "records.json"
+    json_path.write_text(" \n" + json.dumps(records, indent=2) + "\n")
+    # Items straddle the chunks read from the file.
+    with patch("fw_gear_file_validator.loader.READ_SIZE", 7):
+        stream, errors = JsonLoader().open_object(json_path)
+        assert errors is None
+        assert isinstance(stream, JsonRecordStream)
+        assert list(stream) == records
+    assert stream.errors is None
+    assert stream.record_count == len(records)
+
+    json_path.write_text("[]")
+    stream, _ = JsonLoader().open_object(json_path)
+    assert list(stream) == []
+    assert stream.errors is None
+
+    json_path.write_text('{"a": [1]}')
+    assert JsonLoader().open_object(json_path) == ({"a": [1]}, None)
+
+
+@pytest.mark.parametrize(
+    "content", ['[{"a": 1}, {"a": 2}', '[{"a": 1} {"a": 2}]', "[1, 2,]", "[1] 2"]
+)
+def test_malformed_json_array(tmp_path, content):
+    json_path = tmp_path / "records.json"
+    json_path.write_text(content)
+    stream = JsonRecordStream(json_path)
+    list(stream)
+    assert stream.errors[0]["code"] == "malformed-file"
+
+
+@pytest.mark.parametrize(
+    "content", ['{"a": [1, 2}', '{"a": 1} {"a": 2}', '{"a": 1,}', "[1, 2,]"]
+)
+def test_malformed_json_file(tmp_path, content):
+    json_path = tmp_path / "data.json"
+    json_path.write_text(content)
+    d, errors = JsonLoader().open_object(json_path)
+    if errors is None:
+        list(d)
+        errors = d.errors
+    assert [e["code"] for e in errors] == ["malformed-file"]
+    assert errors[0]["message"].startswith("JSON parsing error: ")
+
+
+def test_ndjson_loader(tmp_path):
+    ndjson_path = tmp_path / "records.ndjson"
+    ndjson_path.write_text('{"a": 1}\n\n[2]\n')
+    loader = Loader.factory("ndjson")
+    assert loader.load_object(ndjson_path) == ([{"a": 1}, [2]], None)
+
+    ndjson_path.write_text('{"a": 1}\n{"a": \n')
+    stream, _ = loader.open_object(ndjson_path)
+    assert list(stream) == [{"a": 1}]
+    assert "line 2" in stream.errors[0]["message"]
@@ -0,0 +1,105 @@
+import csv
+
+import pytest
+
+from fw_gear_file_validator import parallel, validator
+from fw_gear_file_validator.loader import CsvLoader
+
+SCHEMA = {
+    "required": ["id", "value"],
+    "properties": {
+        "id": {"type": "integer", "minimum": 0},
+        "value": {"type": "number", "maximum": 50},
+        "note": {"type": "string", "maxLength": 12},
+    },
+}
+
+
+def write_rows(tmp_path, rows, header=("id", "value", "note")):
+    csv_path = tmp_path / "input.csv"
+    with open(csv_path, "w", newline="") as fp:
+        writer = csv.writer(fp)
+        writer.writerow(header)
+        writer.writerows(rows)
+    return csv_path
+
+
+def make_rows(n_rows):
+    rows = []
+    for i in range(n_rows):
+        note = f'multi\n"line"\n{i}' if i % 7 == 0 else f"note {i}"
+        value = "" if i % 11 == 0 else str(i % 60)
+        rows.append([str(i) if i % 13 else "x", value, note])
+    return rows
+
+
+def serial_result(csv_path, csv_validator):
+    with CsvLoader.stream_object(csv_path) as stream:
+        valid, errors = csv_validator.validate(stream)
+    if stream.errors:
+        return False, stream.errors
+    return valid, errors
+
+
+def test_shard_csv_respects_quoted_newlines(tmp_path):
+    csv_path = write_rows(tmp_path, make_rows(200))
+    header_end, shards = parallel.shard_csv(csv_path, 8)
+    data = csv_path.read_bytes()
+
+    assert data[:header_end] == b"id,value,note\r\n"
+    assert shards[0][0] == header_end
+    assert shards[-1][1] == len(data)
+    assert len(shards) == 8
+    rows = []
+    for start, end in shards:
+        text = data[start:end].decode()
+        shard_rows = list(csv.reader(text.splitlines(keepends=True)))
+        assert all(len(row) == 3 for row in shard_rows)
+        rows.extend(shard_rows)
+    assert rows == make_rows(200)
+
+
+@pytest.mark.parametrize("workers", [1, 3])
+def test_validate_csv_file_matches_serial(tmp_path, monkeypatch, workers):
+    monkeypatch.setattr(parallel, "MIN_PARALLEL_SIZE", 0)
+    csv_path = write_rows(tmp_path, make_rows(500))
+    csv_validator = validator.CsvValidator(SCHEMA)
+
+    expected = serial_result(csv_path, csv_validator)
+    result = parallel.validate_csv_file(
+        csv_path, csv_validator, workers, shard_size=1024
+    )
+
+    assert not expected[0]
+    assert result == expected
+    lines = [e["location"]["line"] for e in result[1]]
+    assert lines == sorted(lines)
+    assert max(lines) > 400
+
+
+def test_validate_csv_file_malformed(tmp_path):
+    rows = make_rows(50)
+    rows[30] = ["1", "2"]
+    csv_path = write_rows(tmp_path, rows)
+    csv_validator = validator.CsvValidator(SCHEMA)
+
+    result = parallel.validate_csv_file(csv_path, csv_validator, 2, shard_size=256)
+
+    assert result == serial_result(csv_path, csv_validator)
+    assert (
+        result[1][0]["message"] == "Row 31 has 2 fields while the header has 3 fields."
+    )
+
+
+def test_validate_csv_file_header_errors(tmp_path):
+    csv_validator = validator.CsvValidator(SCHEMA)
+
+    csv_path = write_rows(tmp_path, [["1", "2", "a"]], header=("id", "value", "x"))
+    valid, errors = parallel.validate_csv_file(csv_path, csv_validator, 2)
+    assert not valid
+    assert [e["code"] for e in errors] == ["unknown-field"]
+
+    csv_path = write_rows(tmp_path, [])
+    valid, errors = parallel.validate_csv_file(csv_path, csv_validator, 2)
+    assert not valid
+    assert [e["code"] for e in errors] == ["empty-file"]
@@ -54,11 +54,23 @@ def test_parse_config():
     client.get_file = MagicMock(return_value=file)
     context.client = client
     context._client = client
-    (debug, tag, schema_file_path, fw_reference, loader_config) = parser.parse_config(
-        context
+    (debug, tag, schema_file_path, fw_reference, loader_config, validator_config) = (
+        parser.parse_config(context)
     )
 
     assert loader_config["add_parents"] is False
+    assert loader_config["byte_ranges"] is False
+    assert validator_config["workers"] == 1
+    assert validator_config["schema_cache_dir"] is None
+    assert validator_config["error_detail"] == "full"
+    assert not validator_config["error_limits"].active
+    assert validator_config["report_mode"] == "errors"
+    assert validator_config["error_output"] == "metadata"
+    assert validator_config["skip_unchanged"] is False
+    assert validator_config["state_file"] is None
+    assert validator_config["checkpoint_dir"] is None
+    assert validator_config["json_backend"] == "auto"
+    assert validator_config["engine"] == "row"
 
     assert fw_reference.id == "6442f29a9bb0718c0adfaf9f"
     assert fw_reference.type == "file"
@@ -136,3 +148,40 @@ def test_identify_unsupported_type():
     with pytest.raises(TypeError) as _:
         ext, mime = parser.get_filetype_data(bad_str)
         parser.validate_filetype(ext, mime)
+
+
+def test_read_batch_manifest(tmp_path):
+    text_manifest = tmp_path / "manifest.txt"
+    text_manifest.write_text("# nightly\nabc\n\n  def  \n")
+    assert parser.read_batch_manifest(text_manifest) == ["abc", "def"]
+
+    json_manifest = tmp_path / "manifest.json"
+    json_manifest.write_text(json.dumps(["abc", {"file_id": "def"}]))
+    assert parser.read_batch_manifest(json_manifest) == ["abc", "def"]
+
+    json_manifest.write_text(json.dumps([{"name": "a.csv"}]))
+    with pytest.raises(ValueError):
+        parser.read_batch_manifest(json_manifest)
+
+
+def test_get_batch_file_ids(tmp_path):
+    manifest = tmp_path / "manifest.txt"
+    manifest.write_text("ghi\nabc\n")
+    context = MagicMock()
+    context.config = {"batch_file_ids": "abc, def"}
+    context.get_input_path.return_value = manifest
+    assert parser.get_batch_file_ids(context) == ["abc", "def", "ghi"]
+
+    context.config = {}
+    context.get_input_path.return_value = None
+    assert parser.get_batch_file_ids(context) == []
+
+
+def test_parse_validator_config_engine():
+    context = MagicMock()
+    context.config = {"engine": "columnar"}
+    assert parser.parse_validator_config(context)["engine"] == "columnar"
+
+    context.config = {"engine": "vectorized"}
+    with pytest.raises(ValueError, match="csv engine vectorized not supported"):
+        parser.parse_validator_config(context)
@@ -0,0 +1,142 @@
+"""Module to test service.py"""
+
+import json
+import threading
+import urllib.error
+import urllib.request
+
+import pytest
+
+from fw_gear_file_validator import service
+
+SCHEMA = {
+    "type": "object",
+    "properties": {"a": {"type": "integer"}, "b": {"type": "string", "maxLength": 3}},
+    "required": ["a"],
+}
+
+
+@pytest.fixture(params=[False, True], ids=["threads", "processes"])
+def server(request):
+    validation_service = service.ValidationService(
+        {"ab": SCHEMA}, workers=2, max_queue=1, processes=request.param
+    )
+    server = service.ValidationServer(("127.0.0.1", 0), validation_service)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def call(server, path, body=None):
+    host, port = server.server_address
+    data = None if body is None else json.dumps(body).encode()
+    try:
+        with urllib.request.urlopen(f"http://{host}:{port}{path}", data) as response:
+            return response.status, json.loads(response.read()), response.headers
+    except urllib.error.HTTPError as e:
+        return e.code, json.loads(e.read()), e.headers
+
+
+def test_validate_path_and_content(server, tmp_path):
+    csv_file = tmp_path / "bad.csv"
+    csv_file.write_text("a,b\n1,ok\n2,toolong\n")
+
+    status, result, _ = call(server, "/validate", {"path": str(csv_file)})
+    assert status == 200
+    assert result["state"] == "FAIL"
+    assert result["file"] == str(csv_file)
+    assert result["errors"][0]["location"] == {"line": 2, "column_name": "b"}
+    assert result["errors"][0]["type"] == "error"
+
+    status, result, _ = call(
+        server,
+        "/validate",
+        {"content": {"a": 1}, "file_type": "json", "schema_name": "ab"},
+    )
+    assert status == 200
+    assert result["state"] == "PASS"
+    assert result["file"] is None
+
+    status, result, _ = call(
+        server,
+        "/validate",
+        {"content": '{"a": "x"}\n', "file_type": "ndjson", "schema": SCHEMA},
+    )
+    assert result["state"] == "FAIL"
+    assert result["errors"][0]["location"]["record"] == 0
+
+
+def test_bad_requests(server):
+    assert call(server, "/validate", {"content": "{}"})[0] == 400
+    assert call(server, "/validate", {"path": "x.csv", "schema_name": "no"})[0] == 400
+    assert call(server, "/validate", [])[0] == 400
+    assert call(server, "/unknown")[0] == 404
+    assert call(server, "/health")[:2] == (200, {"status": "ok"})
+
+    status, result, _ = call(server, "/validate", {"path": "missing.csv"})
+    assert status == 200
+    assert result["state"] == "ERROR"
+
+
+def test_backpressure_and_metrics(server):
+    validation_service = server.service
+    # Take every worker and queue slot, as long running validations would.
+    for _ in range(validation_service.workers + validation_service.max_queue):
+        validation_service._slots.acquire()
+    status, body, headers = call(
+        server, "/validate", {"content": "{}", "file_type": "json"}
+    )
+    assert status == 503
+    assert body == {"error": "every worker is busy and the queue is full"}
+    assert headers["Retry-After"] == str(service.RETRY_AFTER)
+    for _ in range(validation_service.workers + validation_service.max_queue):
+        validation_service._slots.release()
+
+    call(server, "/validate", {"content": "{}", "file_type": "json"})
+    status, metrics, _ = call(server, "/metrics")
+    assert status == 200
+    assert metrics["rejected"] == 1
+    assert metrics["failed"] == 0
+    assert metrics["completed"] == 1
+    assert metrics["queue_depth"] == 0
+    assert metrics["latency_ms"]["count"] == 1
+    assert metrics["latency_ms"]["p99"] >= metrics["latency_ms"]["p50"] > 0
+
+
+def test_percentile():
+    values = [1.0, 2.0, 3.0, 4.0]
+    assert service._percentile(values, 0.5) == 2.0
+    assert service._percentile(values, 0.99) == 4.0
+    assert service._percentile([5.0], 0.5) == 5.0
+
+
+def test_content_is_read_as_utf8(mocker):
+    validate_file = mocker.patch.object(
+        service, "validate_file", wraps=service.validate_file
+    )
+    validation_service = service.ValidationService(
+        {"ab": SCHEMA}, workers=1, processes=False
+    )
+    try:
+        result = validation_service.validate(
+            {"content": "a,b\n1,caf\u00e9\n", "file_type": "csv", "schema_name": "ab"}
+        )
+    finally:
+        validation_service.close()
+    assert result["state"] == "FAIL"
+    assert result["errors"][0]["value"] == "caf\u00e9"
+    assert validate_file.call_args.kwargs["encoding"] == "UTF-8"
+
+
+def test_server_refuses_remote_hosts(mocker):
+    validation_service = mocker.MagicMock()
+    with pytest.raises(ValueError, match="allow_remote"):
+        service.ValidationServer(("0.0.0.0", 0), validation_service)
+    validation_service.close.assert_called_once()
+
+    assert service.is_loopback("localhost")
+    assert service.is_loopback("::1")
+    assert not service.is_loopback("")
+    assert not service.is_loopback("example.com")
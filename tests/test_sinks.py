@@ -0,0 +1,151 @@
+"""Module to test sinks.py"""
+
+import gzip
+import io
+import json
+
+import pytest
+
+from fw_gear_file_validator import validator
+from fw_gear_file_validator.limits import ErrorLimits
+from fw_gear_file_validator.loader import CsvLoader
+from fw_gear_file_validator.sinks import (
+    MemoryErrorSink,
+    NdjsonErrorSink,
+    open_error_sink,
+)
+
+SCHEMA = {
+    "type": "object",
+    "properties": {
+        "a": {"type": "integer"},
+        "b": {"type": "string", "maxLength": 2},
+    },
+}
+
+
+def write_csv(tmp_path, content):
+    csv_path = tmp_path / "rows.csv"
+    csv_path.write_text(content)
+    return csv_path
+
+
+def read_ndjson(path):
+    with gzip.open(path, "rt", encoding="UTF-8") as fp:
+        return [json.loads(line) for line in fp]
+
+
+def test_validate_to_ndjson_matches_validate_object(tmp_path):
+    csv_path = write_csv(tmp_path, "a,b\n" + "x,long\n1,ok\n" * 50)
+    csv_validator = validator.CsvValidator(SCHEMA)
+    _, expected, _ = validator.validate_object(
+        csv_validator, CsvLoader.stream_object(csv_path), csv_path
+    )
+
+    error_path = tmp_path / "errors.ndjson.gz"
+    with NdjsonErrorSink(error_path) as sink:
+        valid, summary = validator.validate_object_to_sink(
+            csv_validator, CsvLoader.stream_object(csv_path), csv_path, sink
+        )
+
+    assert valid is False
+    assert summary is None
+    assert read_ndjson(error_path) == expected
+    state, data = sink.qc_result()
+    assert state == "FAIL"
+    assert data == {
+        "error_file": "errors.ndjson.gz",
+        "error_format": "ndjson+gzip",
+        "error_count": 100,
+    }
+
+
+def test_validate_to_memory_sink_within_limits(tmp_path):
+    csv_path = write_csv(tmp_path, "a,b\n" + "x,long\n" * 1000)
+    csv_validator = validator.CsvValidator(SCHEMA)
+
+    stream = CsvLoader.stream_object(csv_path)
+    with MemoryErrorSink() as sink:
+        valid, summary = validator.validate_object_to_sink(
+            csv_validator,
+            stream,
+            csv_path,
+            sink,
+            transform=lambda errors: ({**e, "seen": True} for e in errors),
+            limits=ErrorLimits(max_errors=5),
+        )
+    assert valid is False
+    assert len(sink.errors) == 5
+    assert all(e["seen"] for e in sink.errors)
+    assert summary.truncated and summary.total == 6
+    assert stream.row_count == 3
+
+    state, data = sink.qc_result(summary)
+    assert state == "FAIL"
+    assert data["data"] == sink.errors
+    assert data["total_errors"] == 6
+
+
+def test_malformed_file_discards_row_errors(tmp_path):
+    csv_path = write_csv(tmp_path, "a,b\nx,long\nx,long\n1\n")
+    csv_validator = validator.CsvValidator(SCHEMA)
+
+    error_path = tmp_path / "errors.ndjson.gz"
+    with NdjsonErrorSink(error_path) as sink:
+        valid, _ = validator.validate_object_to_sink(
+            csv_validator, CsvLoader.stream_object(csv_path), csv_path, sink
+        )
+    assert valid is False
+    assert [e["code"] for e in read_ndjson(error_path)] == ["malformed-file"]
+    assert sink.count == 1
+
+
+def test_valid_file_writes_empty_error_file(tmp_path):
+    csv_path = write_csv(tmp_path, "a,b\n1,ok\n")
+    sink = open_error_sink("ndjson-gzip", tmp_path, "rows.csv")
+    with sink:
+        valid, _ = validator.validate_object_to_sink(
+            validator.CsvValidator(SCHEMA),
+            CsvLoader.stream_object(csv_path),
+            csv_path,
+            sink,
+        )
+    assert valid is True
+    assert read_ndjson(tmp_path / "rows.csv.validation-errors.ndjson.gz") == []
+    assert sink.qc_result()[0] == "PASS"
+
+
+def test_open_error_sink():
+    assert isinstance(open_error_sink("metadata", None, "f.csv"), MemoryErrorSink)
+    with pytest.raises(ValueError):
+        open_error_sink("ndjson", None, "f.csv")
+
+
+def test_zstd_sink(tmp_path):
+    zstandard = pytest.importorskip("zstandard")
+    error_path = tmp_path / "errors.ndjson.zst"
+    with NdjsonErrorSink(error_path, compression="zstd") as sink:
+        sink.write_all([{"code": "type"}, {"code": "maxLength"}])
+
+    with open(error_path, "rb") as fp:
+        reader = zstandard.ZstdDecompressor().stream_reader(fp)
+        lines = io.TextIOWrapper(reader, encoding="UTF-8").read().splitlines()
+    assert [json.loads(line) for line in lines] == [
+        {"code": "type"},
+        {"code": "maxLength"},
+    ]
+
+
+def test_zstd_sink_closes_file_on_setup_failure(tmp_path, mocker):
+    opened = []
+
+    def tracking_open(*args, **kwargs):
+        opened.append(open(*args, **kwargs))
+        return opened[-1]
+
+    zstandard = mocker.patch("fw_gear_file_validator.sinks.zstandard")
+    zstandard.ZstdCompressor.side_effect = MemoryError("no memory")
+    mocker.patch("fw_gear_file_validator.sinks.open", tracking_open, create=True)
+    with pytest.raises(MemoryError):
+        NdjsonErrorSink(tmp_path / "errors.ndjson.zst", compression="zstd")
+    assert len(opened) == 1 and opened[0].closed
@@ -5,6 +5,7 @@ from pathlib import Path
 import pytest
 
 from fw_gear_file_validator import validator
+from fw_gear_file_validator.loader import CsvLoader
 
 # from fw_gear_{{gear_package}}.parser import parse_config
 BASE_DIR = Path(__file__).resolve().parents[1]
@@ -125,3 +126,72 @@ def test_missing_value():
     cvalidator = validator.CsvValidator(schema)
     valid, errors = cvalidator.validate([{"list": "ab"}])
     assert not valid
+
+
+def test_iter_errors_consumes_rows_lazily():
+    schema = {
+        "properties": {
+            "list": {"type": "string", "maxLength": 3},
+            "num": {"type": "number"},
+        }
+    }
+    consumed = []
+
+    def rows():
+        for i in range(5):
+            consumed.append(i)
+            yield {"list": "abcd" if i == 1 else "ab", "num": str(i)}
+
+    cvalidator = validator.CsvValidator(schema)
+    errors = cvalidator.iter_errors(rows())
+    error = next(errors)
+
+    assert consumed == [0, 1]
+    assert error["code"] == "maxLength"
+    assert error["location"] == {"line": 2, "column_name": "list"}
+    assert list(errors) == []
+    assert consumed == [0, 1, 2, 3, 4]
+
+
+def test_validate_csv_stream():
+    set_csv_path("test_input_invalid.csv")
+    csv_path = CONFIG_JSON["inputs"]["input_file"]["location"]["path"]
+    schema_path = CONFIG_JSON["inputs"]["validation_schema"]["location"]["path"]
+    csv_validator = validator.CsvValidator(schema_path)
+
+    with open(csv_path) as csv_file:
+        expected = csv_validator.validate(list(csv.DictReader(csv_file)))
+    stream = CsvLoader.stream_object(csv_path)
+    valid, errors = csv_validator.validate(stream)
+
+    assert (valid, errors) == expected
+    assert stream.errors is None
+
+
+def test_iter_errors_empty_stream():
+    schema = {"properties": {"num": {"type": "number"}}}
+    cvalidator = validator.CsvValidator(schema)
+    errors = list(cvalidator.iter_errors(iter([])))
+    assert len(errors) == 1
+    assert errors[0]["code"] == "empty-file"
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_errors_hold_row_byte_ranges(tmp_path, workers):
+    content = b"num,name\n1,a\nx,b\n3,c\ny,d"
+    csv_path = tmp_path / "rows.csv"
+    csv_path.write_bytes(content)
+    schema = {"properties": {"num": {"type": "number"}, "name": {"type": "string"}}}
+    cvalidator = validator.CsvValidator(schema)
+    stream = CsvLoader.stream_object(csv_path, track_offsets=True)
+
+    valid, errors, _ = validator.validate_object(
+        cvalidator, stream, csv_path, workers=workers
+    )
+
+    assert not valid
+    assert [e["location"]["line"] for e in errors] == [2, 4]
+    assert [content[slice(*e["location"]["byte_range"])] for e in errors] == [
+        b"x,b\n",
+        b"y,d",
+    ]
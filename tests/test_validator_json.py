@@ -1,4 +1,9 @@
+import json
+
+import pytest
+
 from fw_gear_file_validator import validator
+from fw_gear_file_validator.loader import JsonLoader, JsonRecordStream
 
 
 def test_process_json():
@@ -58,3 +63,98 @@ def test_empty_json():
     assert valid is False
     assert len(errors) == 1
     assert errors[0]["code"] == "empty-file"
+
+
+ITEMS_SCHEMA = {
+    "type": "array",
+    "minItems": 4,
+    "items": {
+        "type": "object",
+        "required": ["a"],
+        "properties": {"b": {"type": "string"}},
+    },
+}
+
+
+def write_records(tmp_path, records):
+    json_path = tmp_path / "records.json"
+    json_path.write_text(json.dumps(records))
+    return json_path
+
+
+def test_stream_json_array(tmp_path):
+    records = [{"a": 1}, {}, {"a": 1, "b": 2}]
+    json_path = write_records(tmp_path, records)
+    jvalidator = validator.JsonValidator(ITEMS_SCHEMA)
+    stream, _ = JsonLoader().open_object(json_path)
+    valid, errors, _ = validator.validate_object(jvalidator, stream, json_path)
+
+    assert not valid
+    assert [(e["code"], e["location"].get("record")) for e in errors] == [
+        ("required", 1),
+        ("type", 2),
+        ("minItems", None),
+    ]
+    # The record errors are the ones of the array validated as a whole.
+    _, whole = validator.JsonValidator({"items": ITEMS_SCHEMA["items"]}).validate(
+        records
+    )
+    assert [
+        {**e, "location": {"key_path": e["location"]["key_path"]}} for e in errors[:2]
+    ] == whole
+
+
+def test_stream_json_array_count_errors(tmp_path):
+    records = [{"a": 1}, {"a": 2}]
+    json_path = write_records(tmp_path, records)
+    jvalidator = validator.JsonValidator({**ITEMS_SCHEMA, "maxItems": 1})
+    errors = list(jvalidator.iter_errors(JsonRecordStream(json_path)))
+    _, whole = jvalidator.validate(records)
+
+    # The array is not kept: the count is reported instead of the array.
+    for code, bound in (("minItems", "at least 4"), ("maxItems", "at most 1")):
+        error = next(e for e in errors if e["code"] == code)
+        whole_error = next(e for e in whole if e["code"] == code)
+        assert error["message"] == f"The array has 2 items, expected {bound}"
+        assert whole_error["message"] == f"{records!r} is too " + (
+            "short" if code == "minItems" else "long"
+        )
+        assert error["value"] == "2"
+        assert whole_error["value"] == str(records)
+        assert error["location"] == whole_error["location"] == {"key_path": ""}
+        assert error["expected"] == whole_error["expected"]
+
+
+def test_stream_json_array_unstreamable_schema(tmp_path):
+    schema = {"type": "array", "uniqueItems": True}
+    json_path = write_records(tmp_path, [1, 1])
+    jvalidator = validator.JsonValidator(schema)
+    assert jvalidator.items_schema is None
+    valid, errors = jvalidator.validate(JsonRecordStream(json_path))
+    assert not valid
+    assert [e["code"] for e in errors] == ["uniqueItems"]
+
+
+@pytest.mark.parametrize("content", ["", "\n\n"])
+def test_stream_ndjson_empty(tmp_path, content):
+    ndjson_path = tmp_path / "records.ndjson"
+    ndjson_path.write_text(content)
+    jvalidator = validator.initialize_validator("ndjson", {"type": "object"})
+    valid, errors = jvalidator.validate(JsonRecordStream(ndjson_path, ndjson=True))
+    assert not valid
+    assert [e["code"] for e in errors] == ["empty-file"]
+
+
+def test_stream_ndjson(tmp_path):
+    ndjson_path = tmp_path / "records.ndjson"
+    ndjson_path.write_text('{"a": 1}\n{"b": 2}\n[]\n')
+    jvalidator = validator.initialize_validator(
+        "ndjson", {"type": "object", "required": ["a"]}
+    )
+    stream = JsonRecordStream(ndjson_path, ndjson=True)
+    valid, errors, _ = validator.validate_object(jvalidator, stream, ndjson_path)
+    assert not valid
+    assert [(e["code"], e["location"]["record"]) for e in errors] == [
+        ("required", 1),
+        ("type", 2),
+    ]